@@ -0,0 +1,299 @@
+"""Benchmark runner for runenv parser, API and CLI hot paths.
+
+Generates fixtures in a temporary directory, times every case (best of `--repeat`) and
+writes machine readable JSON, which can be compared with results of another commit:
+
+    python benchmarks/run.py --output before.json
+    git checkout my-branch
+    python benchmarks/run.py --output after.json --compare before.json
+
+Cases can be selected with `--only` (substring match, repeatable) and sizes with
+`--sizes`, e.g. `--sizes 10,1000,1000000` for the 1M keys fixtures.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, Iterator, List, Optional, Tuple, Union
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from runenv.__about__ import __version__  # noqa: E402
+from runenv.api import EnvIndex, find_env_file  # noqa: E402
+from runenv.parser import EnvParser, ParseOptions  # noqa: E402
+
+DEFAULT_SIZES = (10, 1_000, 100_000)
+FORMATS = (".env", ".json", ".toml", ".yaml")
+
+Bench = Callable[[], object]
+# a setup returns the timed callable, or a context manager yielding it when the case needs teardown
+Setup = Callable[[], Union[Bench, ContextManager[Bench]]]
+Case = Tuple[str, Dict[str, object], Setup]
+
+
+def write_fixture(path: Path, environ: Dict[str, str]) -> Path:
+    """Write `environ` to `path` in the format given by its suffix."""
+    suffix = path.suffix
+    if suffix == ".json":
+        path.write_text(json.dumps(environ, indent=1))
+    elif suffix == ".toml":
+        path.write_text("".join(f"{key} = {json.dumps(value)}\n" for key, value in environ.items()))
+    elif suffix == ".yaml":
+        path.write_text("".join(f"{key}: {json.dumps(value)}\n" for key, value in environ.items()))
+    else:
+        path.write_text("".join(f"{key}={value}\n" for key, value in environ.items()))
+    return path
+
+
+def generate_environ(size: int, density: float = 0.1, prefixes: int = 1, seed: int = 0) -> Dict[str, str]:
+    """Return `size` variables where about `density` of values reference earlier variables."""
+    rng = random.Random(seed)
+    environ: Dict[str, str] = {}
+    keys: List[str] = []
+    for index in range(size):
+        key = f"SVC{index % prefixes}_KEY_{index}" if prefixes > 1 else f"KEY_{index}"
+        if keys and rng.random() < density:
+            value = f"http://${{{rng.choice(keys)}}}:{index}/path"
+        else:
+            value = f"value-{index}-" + "x" * rng.randint(0, 40)
+        environ[key] = value
+        keys.append(key)
+    return environ
+
+
+def generate_cycles(size: int) -> Dict[str, str]:
+    """Return `size` variables forming 2-cycles, short chains into them and one long cycle."""
+    environ: Dict[str, str] = {}
+    quarter = max(size // 4, 1)
+    for index in range(0, quarter, 2):
+        environ[f"PAIR_{index}"] = f"${{PAIR_{index + 1}}}"
+        environ[f"PAIR_{index + 1}"] = f"${{PAIR_{index}}}"
+    for index in range(quarter):
+        environ[f"LONG_{index}"] = f"${{LONG_{(index + 1) % quarter}}}"
+    for index in range(size - len(environ)):
+        environ[f"CHAIN_{index}"] = f"${{PAIR_{(index * 2) % quarter}}}-{index}"
+    return environ
+
+
+def yaml_available() -> bool:
+    try:
+        import yaml  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parse(path: Path, prefix: Optional[str] = None) -> Callable[[], object]:
+    options = ParseOptions(prefix=prefix, strip_prefix=True)
+    return lambda: EnvParser(options).parse(path)
+
+
+def parse_case(path: Path, environ: Callable[[], Dict[str, str]], prefix: Optional[str] = None) -> Setup:
+    return lambda: parse(write_fixture(path, environ()), prefix=prefix)
+
+
+def index_case(path: Path, environ: Callable[[], Dict[str, str]], prefixes: List[str]) -> Setup:
+    def setup() -> Callable[[], object]:
+        write_fixture(path, environ())
+
+        def bench() -> object:
+            index = EnvIndex.load(path)
+            return [index.slice(prefix) for prefix in prefixes]
+
+        return bench
+
+    return setup
+
+
+def separate_case(path: Path, environ: Callable[[], Dict[str, str]], prefixes: List[str]) -> Setup:
+    def setup() -> Callable[[], object]:
+        write_fixture(path, environ())
+        return lambda: [EnvParser(ParseOptions(prefix=prefix)).parse(path) for prefix in prefixes]
+
+    return setup
+
+
+def find_env_file_case(directory: Path, depth: int) -> Setup:
+    def setup() -> Callable[[], object]:
+        leaf = directory.joinpath(*[f"d{level}" for level in range(depth)])
+        leaf.mkdir(parents=True, exist_ok=True)
+        (directory / ".env").write_text("A=1\n")
+        return lambda: find_env_file(leaf, search_parent=depth)
+
+    return setup
+
+
+def cli_run_case(env_file: Path, executable: str) -> Setup:
+    def setup() -> Callable[[], object]:
+        write_fixture(env_file, generate_environ(100))
+        pythonpath = os.pathsep.join([str(ROOT_DIR / "src"), os.environ.get("PYTHONPATH", "")])
+        env = {**os.environ, "PYTHONPATH": pythonpath}
+        cmd = [sys.executable, "-c", "import sys; from runenv.cli import run; sys.exit(run())"]
+        cmd += ["run", "--env-file", str(env_file), "--", executable]
+        return lambda: subprocess.run(cmd, env=env, check=True)  # noqa: S603
+
+    return setup
+
+
+def daemon_run_case(directory: Path, executable: str) -> Setup:
+    @contextlib.contextmanager
+    def setup() -> Iterator[Bench]:
+        import threading
+
+        from runenv.daemon import DaemonClient, LaunchDaemon
+
+        write_fixture(directory / ".env", generate_environ(100))
+        socket_path = str(directory / "daemon.sock")
+        daemon = LaunchDaemon(socket_path)
+        threading.Thread(target=daemon.serve_forever, daemon=True).start()
+        try:
+            client = DaemonClient(socket_path)
+            yield lambda: client.run([executable], cwd=str(directory))
+        finally:
+            daemon.shutdown()
+            daemon.close()
+
+    return setup
+
+
+def iter_cases(workdir: Path, sizes: List[int]) -> Iterator[Case]:
+    """Yield `(name, params, setup)`; `setup()` writes the fixture and returns the timed callable, see `Setup`."""
+    for suffix in FORMATS:
+        if suffix == ".yaml" and not yaml_available():
+            continue
+        for size in sizes:
+            path = workdir / f"parse-{size}{suffix}"
+            params = {"format": suffix, "keys": size}
+            yield f"parse/{suffix.lstrip('.')}/{size}", params, parse_case(path, lambda size=size: generate_environ(size))
+
+    size = max(min(sizes[-1], 100_000), 10)
+    for density in (0.0, 0.5, 1.0):
+        path = workdir / f"interpolation-{density}.env"
+        environ = lambda density=density: generate_environ(size, density=density)  # noqa: E731
+        yield f"interpolation/{density}/{size}", {"keys": size, "density": density}, parse_case(path, environ)
+
+    path = workdir / "prefix.env"
+    environ = lambda: generate_environ(size, prefixes=10)  # noqa: E731
+    prefixes = [f"SVC{i}_" for i in range(10)]
+    params = {"keys": size, "prefixes": 10}
+    yield f"prefix/one-of-10/{size}", params, parse_case(path, environ, prefix="SVC3_")
+    yield f"prefix/index-all-10/{size}", params, index_case(path, environ, prefixes)
+    yield f"prefix/parse-all-10/{size}", params, separate_case(path, environ, prefixes)
+
+    yield f"cycles/{size}", {"keys": size}, parse_case(workdir / "cycles.env", lambda: generate_cycles(size))
+
+    for depth in (0, 5, 20):
+        directory = workdir / "tree" / f"depth-{depth}"
+        yield f"find_env_file/depth-{depth}", {"depth": depth}, find_env_file_case(directory, depth)
+
+    true = shutil.which("true")
+    if true:
+        yield "cli/run-true", {"keys": 100}, cli_run_case(workdir / "run.env", true)
+        if hasattr(socket, "AF_UNIX"):
+            yield "daemon/run-true", {"keys": 100}, daemon_run_case(workdir, true)
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"best": min(timings), "mean": sum(timings) / len(timings)}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True  # noqa: S607
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run_benchmarks(sizes: List[int], repeat: int, only: List[str]) -> Dict[str, object]:
+    results: Dict[str, object] = {}
+    with tempfile.TemporaryDirectory(prefix="runenv-bench-") as tmp:
+        for name, params, setup in iter_cases(Path(tmp), sizes):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            bench = setup()
+            context = bench if isinstance(bench, contextlib.AbstractContextManager) else contextlib.nullcontext(bench)
+            with context as func:
+                timing = measure(func, repeat)
+            results[name] = {**params, **timing, "repeat": repeat}
+            sys.stderr.write(f"{name:<40} {timing['best'] * 1000:>12.3f} ms\n")
+    return {
+        "meta": {
+            "runenv": __version__,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object], threshold: float) -> int:
+    """Print best time ratios against `baseline`; return 1 if any case is slower than `threshold`."""
+    rc = 0
+    base_results = baseline["results"]
+    for name, result in current["results"].items():
+        if name not in base_results:
+            continue
+        ratio = result["best"] / base_results[name]["best"]
+        marker = "SLOWER" if ratio > threshold else ""
+        sys.stdout.write(f"{name:<40} {ratio:>8.2f}x {marker}\n")
+        if marker:
+            rc = 1
+    return rc
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma separated numbers of keys of generated fixtures (default: %(default)s)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case, the best is reported (default: 5)")
+    parser.add_argument("--only", action="append", default=[], help="Run only cases containing given text")
+    parser.add_argument("-o", "--output", help="Write JSON results to file instead of stdout")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="With --compare exit with 1 when a case is slower by this factor (default: 1.25)",
+    )
+    args = parser.parse_args(argv)
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    results = run_benchmarks(sizes, args.repeat, args.only)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+    else:
+        sys.stdout.write(json.dumps(results, indent=2) + "\n")
+    if args.compare:
+        return compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
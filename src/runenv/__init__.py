@@ -1,6 +1,19 @@
 # SPDX-FileCopyrightText: 2015-present Marek Wywiał <onjinx@gmail.com>
 #
 # SPDX-License-Identifier: MIT
-from runenv.api import create_env, load_env
+# `typing.TYPE_CHECKING` without importing `typing`, see `__getattr__`
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from runenv.api import create_env, load_env
 
 __all__ = ["create_env", "load_env"]
+
+
+def __getattr__(name: str) -> object:
+    # `runenv.api` and the parser are imported on first use, so submodules such as the
+    # `runenv.daemon` client do not pay for them
+    if name in __all__:
+        from runenv import api
+
+        return getattr(api, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
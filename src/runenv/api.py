@@ -5,43 +5,118 @@ from __future__ import annotations
 
 import logging
 import os
+from bisect import bisect_left
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
-from runenv.parser import ParseMessage, ParseOptions, lint_env_file, parse_env_file
+from runenv.parser import (
+    EnvEntry,
+    EnvParser,
+    ParseMessage,
+    ParseOptions,
+    lint_env_file,
+    parse_and_lint_env_file,
+    parse_and_lint_env_files,
+    parse_env_file,
+    parse_env_files,
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    from runenv.watch import EnvDiff, EnvWatcher
 
 logger = logging.getLogger(__name__)
 
 
-def find_env_file(path: Path, search_parent: int = 0, filename: Union[str, Path, None] = None) -> Union[Path, None]:
-    search_names: List[str] = [".env", ".env.json", ".env.toml", ".env.yaml"]
+ENV_FILE_NAMES = (".env", ".env.json", ".env.toml", ".env.yaml")
 
-    names = [filename] if filename else search_names[:]
+# `find_env_file(..., cache=True)` results keyed by (path, search_parent, filename)
+_env_file_cache: Dict[Tuple[str, int, Union[str, None]], Union[Path, None]] = {}
 
-    for name in names:
-        logger.debug("Searching for %s files at %s with search_parent=%s", name, path, search_parent)
-        if (path / name).is_file():
-            file = path / name
-            logger.debug("Found env file: %s", file)
-            return file
-    if search_parent > 0:
-        env_file = find_env_file(path.parent, search_parent - 1, filename=filename)
-        if env_file:
-            return env_file
+
+def _find_in_directory(path: Path, filename: Union[str, Path, None]) -> Union[Path, None]:
+    if filename:
+        # explicit name costs a single stat
+        return path / filename if (path / filename).is_file() else None
+    try:
+        with os.scandir(path) as entries:
+            candidates = {entry.name: entry for entry in entries if entry.name in ENV_FILE_NAMES}
+    except OSError:
+        return None
+    for name in ENV_FILE_NAMES:
+        entry = candidates.get(name)
+        if entry is not None and entry.is_file():
+            return path / name
     return None
 
 
+def find_env_file(
+    path: Path,
+    search_parent: int = 0,
+    filename: Union[str, Path, None] = None,
+    cache: bool = False,  # noqa: FBT001,FBT002
+) -> Union[Path, None]:
+    """Find `filename` (or the first of `ENV_FILE_NAMES`) in `path` or up to `search_parent` parent dirs.
+
+    Each directory is checked with one `os.scandir` listing, or a single stat when `filename`
+    is given. With `cache` results are memoized for the process, see `clear_env_file_cache`.
+    """
+    key = (str(path), search_parent, str(filename) if filename else None)
+    if cache and key in _env_file_cache:
+        return _env_file_cache[key]
+
+    found = None
+    directory = path
+    for _ in range(max(search_parent, 0) + 1):
+        logger.debug("Searching for %s files at %s", filename or "env", directory)
+        found = _find_in_directory(directory, filename)
+        if found:
+            logger.debug("Found env file: %s", found)
+            break
+        directory = directory.parent
+
+    if cache:
+        _env_file_cache[key] = found
+    return found
+
+
+def clear_env_file_cache() -> None:
+    """Forget results memoized by `find_env_file(..., cache=True)`."""
+    _env_file_cache.clear()
+
+
 def create_env(
     env_file: Union[str, Path, None] = None,
     prefix: Union[str, None] = None,
     strip_prefix: bool = True,  # noqa: FBT001,FBT002
     search_parent: int = 0,
+    cache_dir: Union[str, Path, None] = None,
+    jobs: int = 1,
+    source: Union[str, None] = None,
 ) -> Dict[str, str]:
-    """Create environ dictionary from current variables got from given `env_file`."""
+    """Create environ dictionary from current variables got from given `env_file`.
+
+    With `cache_dir` the resolved environ is cached on disk, see `runenv.cache`.
+    A `*.snapshot` file written by `runenv compile` is loaded as is, see `runenv.snapshot`.
+    With `jobs` above 1 very large files are parsed in that many worker processes.
+    With `source="shm://NAME"` variables published by `runenv serve` are read instead of
+    any file, see `runenv.shm`.
+    """
+    # only the environ is returned, do not collect lint messages
+    options = ParseOptions(prefix=prefix, strip_prefix=strip_prefix, diagnostics="none", jobs=jobs)
+    if source is not None:
+        from runenv.shm import load_shared_env
+
+        return load_shared_env(source, options)
     env_file = find_env_file(Path.cwd(), search_parent, filename=env_file)
     if not env_file:
         raise ValueError("No env file found")
-    return parse_env_file(env_file, ParseOptions(prefix=prefix, strip_prefix=strip_prefix))
+    if str(env_file).endswith(".snapshot"):
+        from runenv.snapshot import load_snapshot
+
+        return load_snapshot(env_file, options)
+    return parse_env_file(env_file, options, cache_dir=cache_dir)
 
 
 def load_env(
@@ -51,7 +126,14 @@ def load_env(
     force: bool = False,  # noqa: FBT001,FBT002
     search_parent: int = 0,
     require_env_file: bool = False,
+    cache_dir: Union[str, Path, None] = None,
+    source: Union[str, None] = None,
 ) -> None:
+    if source is not None:
+        if "_RUNENV_WRAPPED" not in os.environ or force:
+            os.environ.update(create_env(prefix=prefix, strip_prefix=strip_prefix, source=source))
+            logger.info("env loaded from %s", source)
+        return
 
     env_file = find_env_file(Path.cwd(), search_parent, filename=env_file)
 
@@ -64,11 +146,146 @@ def load_env(
     if "_RUNENV_WRAPPED" in os.environ and not force:
         return
 
-    os.environ.update(create_env(env_file, prefix=prefix, strip_prefix=strip_prefix))
+    os.environ.update(create_env(env_file, prefix=prefix, strip_prefix=strip_prefix, cache_dir=cache_dir))
     logger.info("env file %s loaded", getattr(env_file, "name", str(env_file)))
     return
 
 
+# YAML and TOML files of at least this size are parsed in a process pool by the async API,
+# their parsing is CPU bound and would hold the GIL against the event loop thread
+ASYNC_PROCESS_MIN_BYTES = 1024 * 1024
+
+_process_pool: Optional[Executor] = None
+
+
+def _get_process_pool() -> Executor:
+    global _process_pool  # noqa: PLW0603
+    if _process_pool is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # "spawn" does not fork the threads of a running event loop application
+        _process_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    return _process_pool
+
+
+def _locate_env_file(
+    env_file: Union[str, Path, None], search_parent: int, cwd: Path
+) -> Tuple[Union[Path, None], int]:
+    found = find_env_file(cwd, search_parent, filename=env_file)
+    return found, os.stat(found).st_size if found else 0
+
+
+def _create_env_in_process(
+    env_file: str,
+    prefix: Union[str, None],
+    strip_prefix: bool,  # noqa: FBT001
+    cache_dir: Union[str, Path, None],
+    environ: Dict[str, str],
+) -> Dict[str, str]:
+    # `${VAR}` missing from the file must resolve against the caller's environment
+    os.environ.clear()
+    os.environ.update(environ)
+    return create_env(env_file, prefix=prefix, strip_prefix=strip_prefix, cache_dir=cache_dir)
+
+
+async def async_create_env(
+    env_file: Union[str, Path, None] = None,
+    prefix: Union[str, None] = None,
+    strip_prefix: bool = True,  # noqa: FBT001,FBT002
+    search_parent: int = 0,
+    cache_dir: Union[str, Path, None] = None,
+    executor: Optional[Executor] = None,
+) -> Dict[str, str]:
+    """Coroutine variant of `create_env` which never blocks the event loop.
+
+    Looking up, reading and parsing the file run in `executor`, by default the loop's
+    thread pool, or a shared process pool for YAML/TOML files of at least
+    `ASYNC_PROCESS_MIN_BYTES`.
+    """
+    import asyncio
+    from functools import partial
+
+    loop = asyncio.get_running_loop()
+    found, size = await loop.run_in_executor(executor, _locate_env_file, env_file, search_parent, Path.cwd())
+    if not found:
+        raise ValueError("No env file found")
+    if executor is None and size >= ASYNC_PROCESS_MIN_BYTES and found.suffix in (".yaml", ".toml"):
+        return await loop.run_in_executor(
+            _get_process_pool(),
+            _create_env_in_process,
+            str(found),
+            prefix,
+            strip_prefix,
+            cache_dir,
+            dict(os.environ),
+        )
+    create = partial(create_env, str(found), prefix=prefix, strip_prefix=strip_prefix, cache_dir=cache_dir)
+    return await loop.run_in_executor(executor, create)
+
+
+async def async_load_env(
+    env_file: Union[str, Path, None] = None,
+    prefix: Union[str, None] = None,
+    strip_prefix: bool = True,  # noqa: FBT001,FBT002
+    force: bool = False,  # noqa: FBT001,FBT002
+    search_parent: int = 0,
+    require_env_file: bool = False,  # noqa: FBT001,FBT002
+    cache_dir: Union[str, Path, None] = None,
+    executor: Optional[Executor] = None,
+) -> None:
+    """Coroutine variant of `load_env`, see `async_create_env`."""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    found, _ = await loop.run_in_executor(executor, _locate_env_file, env_file, search_parent, Path.cwd())
+
+    # In `load_env` we will not fail if file does not exists
+    if not found:
+        if require_env_file:
+            raise ValueError("No env file found")
+        return
+
+    if "_RUNENV_WRAPPED" in os.environ and not force:
+        return
+
+    environ = await async_create_env(
+        found, prefix=prefix, strip_prefix=strip_prefix, cache_dir=cache_dir, executor=executor
+    )
+    os.environ.update(environ)
+    logger.info("env file %s loaded", found.name)
+
+
+async def async_create_envs(
+    env_files: Sequence[Union[str, Path]],
+    prefix: Union[str, None] = None,
+    strip_prefix: bool = True,  # noqa: FBT001,FBT002
+    search_parent: int = 0,
+    cache_dir: Union[str, Path, None] = None,
+    return_exceptions: bool = False,  # noqa: FBT001,FBT002
+) -> List[Union[Dict[str, str], BaseException]]:
+    """Create environ dictionaries of many `env_files` concurrently, in the order given.
+
+    Usage:
+        dev, prod = await async_create_envs([".env.dev", ".env.prod"])
+    """
+    import asyncio
+
+    return await asyncio.gather(
+        *(
+            async_create_env(
+                env_file,
+                prefix=prefix,
+                strip_prefix=strip_prefix,
+                search_parent=search_parent,
+                cache_dir=cache_dir,
+            )
+            for env_file in env_files
+        ),
+        return_exceptions=return_exceptions,
+    )
+
+
 def lint_env(
     env_file: Union[str, Path, None] = None,
     prefix: Union[str, None] = None,
@@ -80,3 +297,167 @@ def lint_env(
     if not env_file:
         raise ValueError("No env file found")
     return lint_env_file(env_file, ParseOptions(prefix=prefix, strip_prefix=strip_prefix))
+
+
+def create_env_and_lint(
+    env_file: Union[str, Path, None] = None,
+    prefix: Union[str, None] = None,
+    strip_prefix: bool = True,  # noqa: FBT001,FBT002
+    search_parent: int = 0,
+) -> Tuple[Dict[str, str], List[ParseMessage]]:
+    """Create environ dictionary and lint messages for `env_file` with a single parse.
+
+    Errors which would make `create_env` raise are returned as `error` messages instead.
+    """
+    env_file = find_env_file(Path.cwd(), search_parent, filename=env_file)
+    if not env_file:
+        raise ValueError("No env file found")
+    options = ParseOptions(prefix=prefix, strip_prefix=strip_prefix)
+    if str(env_file).endswith(".snapshot"):
+        from runenv.snapshot import load_snapshot
+
+        return load_snapshot(env_file, options), []
+    return parse_and_lint_env_file(env_file, options)
+
+
+def watch_env(
+    env_file: Union[str, Path, None],
+    callback: Callable[[EnvDiff], None],
+    prefix: Union[str, None] = None,
+    strip_prefix: bool = True,  # noqa: FBT001,FBT002
+    search_parent: int = 0,
+    interval: float = 1.0,
+    update_environ: bool = False,  # noqa: FBT001,FBT002
+) -> EnvWatcher:
+    """Start watching `env_file` and call `callback` with an `EnvDiff` of changed variables.
+
+    With `update_environ` each diff is applied to `os.environ` before `callback` runs.
+    Returns the started `EnvWatcher`; call its `stop()` to stop watching.
+    """
+    from runenv.watch import EnvWatcher
+
+    env_file = find_env_file(Path.cwd(), search_parent, filename=env_file)
+    if not env_file:
+        raise ValueError("No env file found")
+
+    on_change: Callable[[EnvDiff], None]
+    if update_environ:
+
+        def apply_and_call(diff: EnvDiff) -> None:
+            diff.apply(os.environ)
+            callback(diff)
+
+        on_change = apply_and_call
+    else:
+        on_change = callback
+
+    options = ParseOptions(prefix=prefix, strip_prefix=strip_prefix, diagnostics="none")
+    return EnvWatcher(env_file, on_change, options=options, interval=interval).start()
+
+
+def find_env_files(
+    env_files: Sequence[Union[str, Path]],
+    search_parent: int = 0,
+    ignore_missing: bool = False,  # noqa: FBT001,FBT002
+) -> List[Path]:
+    """Locate each of `env_files` like `find_env_file`, keeping their order."""
+    found: List[Path] = []
+    for name in env_files:
+        env_file = find_env_file(Path.cwd(), search_parent, filename=name)
+        if env_file:
+            found.append(env_file)
+        elif not ignore_missing:
+            raise ValueError(f"No env file found: {name}")
+    if not found:
+        raise ValueError("No env file found")
+    return found
+
+
+def create_layered_env(
+    env_files: Sequence[Union[str, Path]],
+    prefix: Union[str, None] = None,
+    strip_prefix: bool = True,  # noqa: FBT001,FBT002
+    search_parent: int = 0,
+    ignore_missing: bool = False,  # noqa: FBT001,FBT002
+    max_workers: int = 1,
+) -> Dict[str, str]:
+    """Create environ dictionary from layered `env_files`, later files taking precedence.
+
+    `${VAR}` references are resolved once over the merged variables. With `max_workers`
+    above 1 the files are parsed in a thread pool.
+    """
+    found = find_env_files(env_files, search_parent, ignore_missing=ignore_missing)
+    options = ParseOptions(prefix=prefix, strip_prefix=strip_prefix, diagnostics="none")
+    return parse_env_files(found, options, max_workers=max_workers)
+
+
+def create_layered_env_and_lint(
+    env_files: Sequence[Union[str, Path]],
+    prefix: Union[str, None] = None,
+    strip_prefix: bool = True,  # noqa: FBT001,FBT002
+    search_parent: int = 0,
+    ignore_missing: bool = False,  # noqa: FBT001,FBT002
+    max_workers: int = 1,
+) -> Tuple[Dict[str, str], List[ParseMessage]]:
+    """Like `create_layered_env`, also returning lint messages tagged with their `source` file."""
+    found = find_env_files(env_files, search_parent, ignore_missing=ignore_missing)
+    return parse_and_lint_env_files(
+        found, ParseOptions(prefix=prefix, strip_prefix=strip_prefix), max_workers=max_workers
+    )
+
+
+class EnvIndex:
+    """Env file parsed once and indexed by key, for slicing out many prefixes.
+
+    Usage:
+        index = EnvIndex.load(".env.shared")
+        svc_a = index.slice("SVC_A_")
+        svc_b = index.slice("SVC_B_", strip_prefix=False)
+
+    Each slice gives the same result as `create_env` with the same `prefix` and
+    `strip_prefix`, reading only the entries whose key matches the prefix.
+    """
+
+    def __init__(self, entries: List[EnvEntry]) -> None:
+        self.entries = entries
+        order = sorted(range(len(entries)), key=lambda position: entries[position][1])
+        self._positions = order
+        self._keys = [entries[position][1] for position in order]
+
+    @classmethod
+    def load(cls, env_file: Union[str, Path, None] = None, search_parent: int = 0) -> EnvIndex:
+        env_file = find_env_file(Path.cwd(), search_parent, filename=env_file)
+        if not env_file:
+            raise ValueError("No env file found")
+        return cls(list(EnvParser(ParseOptions(diagnostics="none")).load(env_file)))
+
+    def keys(self, prefix: str = "") -> List[str]:
+        """Return sorted distinct raw keys starting with `prefix`."""
+        start = bisect_left(self._keys, prefix)
+        result: List[str] = []
+        for key in self._keys[start:]:
+            if not key.startswith(prefix):
+                break
+            if not result or result[-1] != key:
+                result.append(key)
+        return result
+
+    def slice(
+        self,
+        prefix: Union[str, None] = None,
+        strip_prefix: bool = True,  # noqa: FBT001,FBT002
+    ) -> Dict[str, str]:
+        """Return environ of variables with `prefix`, like `create_env(prefix=..., strip_prefix=...)`."""
+        if prefix:
+            start = bisect_left(self._keys, prefix)
+            positions: List[int] = []
+            for index in range(start, len(self._keys)):
+                if not self._keys[index].startswith(prefix):
+                    break
+                positions.append(self._positions[index])
+            # keep file order so the last value of a duplicated key wins
+            entries = [self.entries[position] for position in sorted(positions)]
+        else:
+            entries = self.entries
+        parser = EnvParser(ParseOptions(prefix=prefix, strip_prefix=strip_prefix, diagnostics="none"))
+        return parser.parse_entries(parser.filter_entries(entries)).final_environ
@@ -0,0 +1,105 @@
+# SPDX-FileCopyrightText: 2015-present Marek Wywiał <onjinx@gmail.com>
+#
+# SPDX-License-Identifier: MIT
+"""Persistent on-disk cache of resolved environments.
+
+Entries are keyed by the absolute env file path and `ParseOptions`, and are valid only
+while the file's `mtime_ns`, size and inode are unchanged and every `${VAR}` that was
+resolved from `os.environ` still has the same value. A cache hit costs one `stat()` of
+the env file plus a read of a small JSON file, without importing any format parser.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from runenv.parser import EnvParser, ParseMessage, ParseOptions
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+# Files modified within this many seconds are not cached: another write within the same
+# mtime tick that keeps size and inode would otherwise go unnoticed.
+RACY_WINDOW_SECONDS = 2.0
+
+
+def _fingerprint(st: os.stat_result) -> List[int]:
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+def cache_file_path(cache_dir: Union[str, Path], env_file: Union[str, Path], options: ParseOptions) -> Path:
+    key = json.dumps([os.path.abspath(env_file), asdict(options)], sort_keys=True)
+    return Path(cache_dir) / (hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ".json")
+
+
+def load_cached(
+    cache_file: Path, st: os.stat_result
+) -> Optional[Tuple[Dict[str, str], List[ParseMessage]]]:
+    """Return cached environ and messages from `cache_file` if it is still valid for `st`."""
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or entry.get("version") != CACHE_VERSION:
+        return None
+    if entry.get("fingerprint") != _fingerprint(st):
+        logger.debug("cache %s is outdated", cache_file)
+        return None
+    for name, value in entry.get("external", {}).items():
+        if os.environ.get(name) != value:
+            logger.debug("cache %s is outdated, external variable %s changed", cache_file, name)
+            return None
+    messages = [ParseMessage(**message) for message in entry["messages"]]
+    return entry["environ"], messages
+
+
+def store_cached(cache_file: Path, st: os.stat_result, parser: EnvParser) -> None:
+    """Write `parser` results to `cache_file`; failures are logged and ignored."""
+    if time.time() - st.st_mtime < RACY_WINDOW_SECONDS:
+        logger.debug("skip caching recently modified file")
+        return
+    entry = {
+        "version": CACHE_VERSION,
+        "fingerprint": _fingerprint(st),
+        "external": {name: os.environ.get(name) for name in sorted(parser.external_references)},
+        "environ": parser.final_environ,
+        "messages": [asdict(message) for message in parser.messages],
+    }
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=cache_file.parent, prefix=".tmp-", suffix=".json")
+        tmp_file = Path(tmp_name)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            tmp_file.replace(cache_file)
+        except BaseException:
+            tmp_file.unlink()
+            raise
+    except OSError as e:
+        logger.debug("cannot write cache %s: %s", cache_file, e)
+
+
+def cached_parse_env_file(
+    env_file: Union[str, Path], options: ParseOptions, cache_dir: Union[str, Path]
+) -> Tuple[Dict[str, str], List[ParseMessage]]:
+    """Parse `env_file` like `EnvParser.parse`, reusing a valid entry from `cache_dir`."""
+    st = os.stat(env_file)
+    cache_file = cache_file_path(cache_dir, env_file, options)
+    cached = load_cached(cache_file, st)
+    if cached is not None:
+        logger.debug("env file %s loaded from cache %s", env_file, cache_file)
+        return cached
+    parser = EnvParser(options).parse(env_file)
+    store_cached(cache_file, st, parser)
+    return parser.final_environ, parser.messages
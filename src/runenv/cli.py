@@ -4,26 +4,69 @@
 from __future__ import annotations
 
 import argparse
-import json
 import logging
 import os
-import shutil
 import stat
-import subprocess
 import sys
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 from pathlib import Path
-from textwrap import dedent
-from typing import List, Optional, Sequence, Union, cast
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple, Union, cast
 
 from runenv.__about__ import __version__
-from runenv.api import create_env, find_env_file, lint_env
-from runenv.legacy import run_legacy, run_legacy_parser
-from runenv.parser import ParseMessage
+from runenv.api import create_env, create_env_and_lint, find_env_file, lint_env
+from runenv.parser import EnvParser, ParseMessage, ParseOptions
+
+if TYPE_CHECKING:
+    from runenv.watch import EnvWatcher
 
 logger = logging.getLogger(__name__)
 
 LEVEL_ORDER = {"none": 0, "info": 1, "warning": 2, "error": 3}
+SUBCOMMANDS = ("run", "list", "lint", "compile", "serve", "daemon")
+
+# options of the main and the legacy parser, used to find the first positional argument
+# without constructing the (legacy) argparse parsers
+MAIN_FLAG_OPTIONS = ("-h", "--help", "-V", "--version", "--help-legacy")
+MAIN_VALUE_OPTIONS = ("-v", "--verbosity")
+LEGACY_FLAG_OPTIONS = ("-h", "--help", "-V", "--version", "-s", "--strip-prefix", "--dry-run", "--exec")
+LEGACY_VALUE_OPTIONS = ("-v", "--verbosity", "-p", "--prefix", "--search-parent")
+
+
+def _first_positional(
+    argv: Sequence[str], flag_options: Sequence[str], value_options: Sequence[str]
+) -> Optional[str]:
+    """Return the first argument argparse would not consume as a known option.
+
+    Mirrors `parse_known_args` for the given options, including `--opt=value`, `-oVALUE`,
+    grouped short flags and unambiguous long option abbreviations.
+    """
+    long_options = [o for o in (*flag_options, *value_options) if o.startswith("--")]
+    args = iter(argv)
+    for arg in args:
+        if arg == "--" or not arg.startswith("-") or len(arg) == 1:
+            return arg
+        if arg.startswith("--"):
+            name = arg.split("=", 1)[0]
+            matches = [o for o in long_options if o.startswith(name)]
+            if name not in long_options and len(matches) != 1:
+                return arg
+            name = name if name in long_options else matches[0]
+            if name in value_options and "=" not in arg:
+                next(args, None)
+            continue
+        for pos, char in enumerate(arg[1:], start=1):
+            if f"-{char}" in value_options:
+                if pos == len(arg) - 1:
+                    next(args, None)
+                break
+            if f"-{char}" not in flag_options:
+                return arg
+    return None
+
+
+def _detect_subcommand(argv: Sequence[str]) -> Optional[str]:
+    subcommand = _first_positional(argv, MAIN_FLAG_OPTIONS, MAIN_VALUE_OPTIONS)
+    return subcommand if subcommand in SUBCOMMANDS else None
 
 
 def add_stdout_handler(verbosity: int) -> None:
@@ -59,6 +102,12 @@ class RunCMDOptions(CLIOptions):
     command: List[str]
     lint_level: str
     fail_on: str
+    exec_process: bool = False
+    reload: bool = False
+    reload_signal: str = "TERM"
+    reload_grace: float = 10.0
+    reload_interval: float = 1.0
+    daemon: Union[str, None] = None
 
 
 @dataclass
@@ -82,6 +131,32 @@ class LintCMDOptions(CLIOptions):
     fail_on: str
 
 
+@dataclass
+class CompileCMDOptions(CLIOptions):
+    env_file: str
+    output: str
+    prefix: Union[str, None]
+    strip_prefix: bool
+    search_parent: int
+    lint_level: str
+    fail_on: str
+
+
+@dataclass
+class ServeCMDOptions(CLIOptions):
+    env_file: str
+    name: str
+    prefix: Union[str, None]
+    strip_prefix: bool
+    search_parent: int
+    interval: float
+
+
+@dataclass
+class DaemonCMDOptions(CLIOptions):
+    socket: str
+
+
 def fail(msg: str, returncode: int = 1) -> None:
     sys.stdout.write(f"{msg}\n")
     sys.exit(returncode)
@@ -99,7 +174,12 @@ def apply_lint_policy(
     to_show = [m for m in messages if LEVEL_ORDER.get(m.level, 0) >= min_print] if min_print > 0 else []
     if to_show:
         if as_json:
-            sys.stdout.write(json.dumps([asdict(m) for m in to_show]))
+            import json
+            from dataclasses import asdict
+
+            # `source` is only set by the layered API, keep it out of single-file output
+            items = [{k: v for k, v in asdict(m).items() if k != "source" or v is not None} for m in to_show]
+            sys.stdout.write(json.dumps(items))
         else:
             for msg in to_show:
                 sys.stderr.write(f"[{msg.level}] (line {msg.line_number}) '{msg.message}'\n")
@@ -109,26 +189,151 @@ def apply_lint_policy(
     return 0
 
 
-def handle_run_subcommand(options: RunCMDOptions) -> Union[int, None]:
+def create_env_with_lint_policy(options: Union[RunCMDOptions, ListCMDOptions]) -> Tuple[Dict[str, str], int]:
+    """Create environ for `options`, applying the lint policy to the same single parse."""
+    if options.lint_level == "none" and options.fail_on == "none":
+        loaded_env = create_env(
+            options.env_file, prefix=options.prefix, strip_prefix=options.strip_prefix, search_parent=options.search_parent
+        )
+        return loaded_env, 0
+
+    loaded_env, messages = create_env_and_lint(
+        options.env_file, prefix=options.prefix, strip_prefix=options.strip_prefix, search_parent=options.search_parent
+    )
+    rc = apply_lint_policy(messages, options.lint_level, options.fail_on)
+    if rc != 0:
+        return loaded_env, rc
+    errors = [m.message for m in messages if m.level == "error"]
+    if errors:
+        # same outcome as `create_env` raising on a structurally invalid file
+        raise ValueError(errors[0])
+    return loaded_env, 0
+
+
+def watch_env_with_lint_policy(options: RunCMDOptions) -> Tuple[EnvWatcher, int]:
+    """Like `create_env_with_lint_policy`, parsing once into the `EnvWatcher` used by `--reload`."""
+    from runenv.watch import EnvWatcher
+
+    env_file = find_env_file(Path.cwd(), options.search_parent, filename=options.env_file)
+    if not env_file:
+        raise ValueError("No env file found")
+    diagnostics = "none" if options.lint_level == "none" and options.fail_on == "none" else "full"
+    watcher = EnvWatcher(
+        env_file,
+        lambda _diff: None,
+        options=ParseOptions(prefix=options.prefix, strip_prefix=options.strip_prefix, diagnostics=diagnostics),
+    )
+    return watcher, apply_lint_policy(watcher.parser.messages, options.lint_level, options.fail_on)
+
+
+def exec_command(executable: str, params: List[str]) -> None:
+    """Replace the current process with `executable`, passing the current `os.environ`."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.execve(executable, [executable, *params], os.environ)  # noqa: S606
+
+
+def signal_number(name: str) -> int:
+    """Return signal number for `name` given as `TERM`, `SIGTERM` or a number."""
+    import signal
+
+    if name.isdigit():
+        return int(name)
+    name = name.upper()
+    try:
+        return int(getattr(signal, name if name.startswith("SIG") else f"SIG{name}"))
+    except AttributeError:
+        raise ValueError(f"Unknown signal `{name}`") from None
+
+
+def supervise_command(executable: str, params: List[str], options: RunCMDOptions, watcher: EnvWatcher) -> int:
+    """Run `executable` as a child and restart it whenever resolved variables of `watcher` change.
+
+    The env file is polled every `reload_interval` seconds and compared by resolved values, so
+    edits of whitespace, comments or raw `${VAR}` text which resolve to the same values do not
+    restart the child. The child is stopped with `reload_signal` and killed after `reload_grace`
+    seconds. Returns the exit code of the child once it exits on its own.
+    """
+    import signal
+    import subprocess
+
+    reload_signal = signal_number(options.reload_signal)
+    # `os.environ` already holds the variables of the watcher's initial parse
+    child_env = dict(os.environ)
+    process = subprocess.Popen([executable, *params], env=child_env)  # noqa: S603
+
+    def forward_signal(signum: int, _frame: object) -> None:
+        process.send_signal(signum)
+
+    def stop(signum: int) -> None:
+        process.send_signal(signum)
+        try:
+            process.wait(timeout=options.reload_grace)
+        except subprocess.TimeoutExpired:
+            logger.warning("command did not stop within %ss, killing it", options.reload_grace)
+            process.kill()
+            process.wait()
+
+    previous_handler = signal.signal(signal.SIGTERM, forward_signal)
+    try:
+        while True:
+            try:
+                return process.wait(timeout=options.reload_interval)
+            except subprocess.TimeoutExpired:
+                pass
+            diff = watcher.poll()
+            if not diff:
+                continue
+            logger.info(
+                "%s changed (%s added, %s removed, %s changed), restarting command",
+                options.env_file,
+                len(diff.added),
+                len(diff.removed),
+                len(diff.changed),
+            )
+            diff.apply(child_env)
+            stop(reload_signal)
+            process = subprocess.Popen([executable, *params], env=child_env)  # noqa: S603
+    except BaseException:
+        # e.g. KeyboardInterrupt, do not leave the child running without its supervisor
+        if process.poll() is None:
+            stop(signal.SIGTERM)
+        raise
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+
+
+def handle_run_subcommand(options: RunCMDOptions) -> Union[int, None]:  # noqa: PLR0911
     cmd = options.command[1:] if options.command and options.command[0] == "--" else options.command[:]
     if not cmd:
         sys.stdout.write("Missing command to execute after 'runenv run -- <command> [params]'\n")
         sys.exit(1)
 
-    if options.lint_level != "none" or options.fail_on != "none":
-        messages = lint_env(
-            options.env_file, prefix=options.prefix, strip_prefix=options.strip_prefix, search_parent=options.search_parent
+    if options.daemon:
+        from runenv.daemon import DaemonClient
+
+        # the daemon finds and loads the env file, relative to the current directory
+        return DaemonClient(options.daemon).run(
+            cmd,
+            env_file=options.env_file or None,
+            prefix=options.prefix,
+            strip_prefix=options.strip_prefix,
+            search_parent=options.search_parent,
         )
-        rc = apply_lint_policy(messages, options.lint_level, options.fail_on)
-        if rc != 0:
-            return rc
 
-    loaded_env = create_env(
-        options.env_file, prefix=options.prefix, strip_prefix=options.strip_prefix, search_parent=options.search_parent
-    )
+    if options.reload:
+        watcher, rc = watch_env_with_lint_policy(options)
+        loaded_env = dict(watcher.environ)
+    else:
+        loaded_env, rc = create_env_with_lint_policy(options)
+    if rc != 0:
+        return rc
     loaded_env["_RUNENV_WRAPPED"] = "1"
     os.environ.update(loaded_env)
 
+    import shutil
+    import subprocess
+
     executable = shutil.which(cmd[0])
     params = cmd[1:]
 
@@ -139,63 +344,101 @@ def handle_run_subcommand(options: RunCMDOptions) -> Union[int, None]:
         if not (os.stat(executable).st_mode & stat.S_IXUSR):
             fail(f"File `{executable}` is not executable")
             return 1
+        if options.exec_process:
+            exec_command(executable, params)
+        if options.reload:
+            return supervise_command(executable, params, options, watcher)
         return subprocess.check_call([executable, *params], env=os.environ)  # noqa: S603
     except subprocess.CalledProcessError as e:
         return e.returncode
 
 
 def handle_list_subcommand(options: ListCMDOptions) -> int:
-    if options.lint_level != "none" or options.fail_on != "none":
-        messages = lint_env(
-            options.env_file, prefix=options.prefix, strip_prefix=options.strip_prefix, search_parent=options.search_parent
-        )
-        rc = apply_lint_policy(messages, options.lint_level, options.fail_on)
-        if rc != 0:
-            return rc
-
-    loaded_env = create_env(
-        options.env_file, prefix=options.prefix, strip_prefix=options.strip_prefix, search_parent=options.search_parent
-    )
+    loaded_env, rc = create_env_with_lint_policy(options)
+    if rc != 0:
+        return rc
     for key, value in sorted(loaded_env.items()):
         sys.stdout.write(f"{key}={value}\n")
     return 0
 
 
 def handle_lint_subcommand(options: LintCMDOptions) -> int:
+    from runenv.snapshot import is_snapshot
+
+    if is_snapshot(options.env_file):
+        raise ValueError(f"{options.env_file} is a snapshot, lint the file it was compiled from")
     messages = lint_env(
         options.env_file, prefix=options.prefix, strip_prefix=options.strip_prefix, search_parent=options.search_parent
     )
     return apply_lint_policy(messages, options.lint_level, options.fail_on, as_json=options.as_json)
 
 
-def run(argv: Optional[Sequence[str]] = None) -> Union[int, None]:
-    """Run CLI.
+def handle_compile_subcommand(options: CompileCMDOptions) -> int:
+    from runenv.snapshot import compile_snapshot, is_snapshot
 
-    Args:
-        argv: list of CLI arguments
-    """
-    if argv is None:
-        argv = sys.argv[1:]
-    # do not pass `-h` | `--help` to legacy
-    params = (" ".join(argv).split(" -- ", 1))[0].split(" ")
-    if "-h" not in params and "--help" not in params:
-        _, l_argv = run_legacy_parser(argv, only_params=True)
-        if len(l_argv) > 0 and Path(l_argv[0]).is_file():
-            # Legacy usage detected
-            return run_legacy()
+    if is_snapshot(options.env_file):
+        raise ValueError(f"{options.env_file} is already a snapshot")
+    parser = EnvParser(ParseOptions(prefix=options.prefix, strip_prefix=options.strip_prefix)).parse(options.env_file)
+    rc = apply_lint_policy(parser.messages, options.lint_level, options.fail_on)
+    if rc != 0:
+        return rc
+    snapshot = compile_snapshot(options.env_file, options.output, parser)
+    logger.info("%s variables from %s written to %s", len(snapshot.environ), options.env_file, options.output)
+    return 0
+
+
+def handle_serve_subcommand(options: ServeCMDOptions) -> int:
+    """Publish variables of `env_file` to shared memory until interrupted or terminated."""
+    import signal
+
+    from runenv.shm import SHM_SCHEME, EnvPublisher
+
+    parse_options = ParseOptions(prefix=options.prefix, strip_prefix=options.strip_prefix, diagnostics="none")
+    publisher = EnvPublisher(options.env_file, options.name, parse_options, interval=options.interval)
+    logger.info("serving %s as %s%s", options.env_file, SHM_SCHEME, options.name)
+    # leave through `finally` on SIGTERM too, so the segment is removed
+    previous_handler = signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        publisher.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        publisher.close()
+    return 0
 
+
+def handle_daemon_subcommand(options: DaemonCMDOptions) -> int:
+    """Serve `runenv run --daemon` clients until interrupted or terminated."""
+    import signal
+
+    from runenv.daemon import LaunchDaemon
+
+    with LaunchDaemon(options.socket) as daemon:
+        logger.info("runenv daemon listening on %s", options.socket)
+        # leave through `close` on SIGTERM too, so the socket file is removed
+        previous_handler = signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+    return 0
+
+
+def build_parser(subcommand: Optional[str] = None) -> argparse.ArgumentParser:  # noqa: PLR0915
+    """Build CLI parser; with known `subcommand` only its subparser is constructed."""
     prog = "runenv"
     description = "Run program with given environment file loaded"
-    epilog = dedent(
-        """
-    NOTES:
-        v1.3.0:
-          The `runenv .env <command> <params>` still works but the new separate subcommand as introduced:
+    epilog = """
+NOTES:
+    v1.3.0:
+      The `runenv .env <command> <params>` still works but the new separate subcommand as introduced:
 
-              $ runenv run [--env-file .env] -- command --with --params
+          $ runenv run [--env-file .env] -- command --with --params
 
-    """
-    )
+"""
 
     parser = argparse.ArgumentParser(
         prog=prog, description=description, epilog=epilog, formatter_class=argparse.RawTextHelpFormatter
@@ -218,129 +461,281 @@ def run(argv: Optional[Sequence[str]] = None) -> Union[int, None]:
 
     subparsers = parser.add_subparsers(dest="subcommand", required=False)
 
-    # --- run command ---
-    run_parser = subparsers.add_parser("run", help="Run a command with .env loaded")
-    run_parser.add_argument("command", help="Command to run with loaded environment", nargs=argparse.REMAINDER)
-    run_parser.add_argument(
-        "--env-file",
-        help="Environment file to load",
-        type=str,
-    )
-    run_parser.add_argument(
-        "-p",
-        "--prefix",
-        action="store",
-        type=str,
-        help="Load only variables with given prefix",
-    )
-    run_parser.add_argument(
-        "-s",
-        "--strip-prefix",
-        action="store_true",
-        help="Strip prefix given with --prefix from environment variables names",
-    )
-    run_parser.add_argument(
-        "--search-parent",
-        type=int,
-        default=0,
-        help="How many parent dirs search for .env[.json,.toml,.yaml] files; default 0",
-    )
-    run_parser.add_argument(
-        "--lint-level",
-        choices=["none", "info", "warning", "error"],
-        default="none",
-        help="Minimum message level to print to stderr (default: none)",
-    )
-    run_parser.add_argument(
-        "--fail-on",
-        choices=["none", "info", "warning", "error"],
-        default="none",
-        help="Minimum message level that causes a non-zero exit before running the command (default: none)",
-    )
+    if subcommand in (None, "run"):
+        # --- run command ---
+        run_parser = subparsers.add_parser("run", help="Run a command with .env loaded")
+        run_parser.add_argument("command", help="Command to run with loaded environment", nargs=argparse.REMAINDER)
+        run_parser.add_argument(
+            "--env-file",
+            help="Environment file to load",
+            type=str,
+        )
+        run_parser.add_argument(
+            "-p",
+            "--prefix",
+            action="store",
+            type=str,
+            help="Load only variables with given prefix",
+        )
+        run_parser.add_argument(
+            "-s",
+            "--strip-prefix",
+            action="store_true",
+            help="Strip prefix given with --prefix from environment variables names",
+        )
+        run_parser.add_argument(
+            "--search-parent",
+            type=int,
+            default=0,
+            help="How many parent dirs search for .env[.json,.toml,.yaml] files; default 0",
+        )
+        run_parser.add_argument(
+            "--exec",
+            dest="exec_process",
+            action="store_true",
+            help="Replace runenv process with the command (os.execve) instead of running it as a child process",
+        )
+        run_parser.add_argument(
+            "--reload",
+            action="store_true",
+            help="Restart the command when resolved variables of the env file change",
+        )
+        run_parser.add_argument(
+            "--reload-signal",
+            default="TERM",
+            help="Signal sent to stop the command on reload (default: TERM)",
+        )
+        run_parser.add_argument(
+            "--reload-grace",
+            type=float,
+            default=10.0,
+            help="Seconds to wait for the command to stop before killing it (default: 10)",
+        )
+        run_parser.add_argument(
+            "--reload-interval",
+            type=float,
+            default=1.0,
+            help="Seconds between env file checks (default: 1)",
+        )
+        run_parser.add_argument(
+            "--daemon",
+            metavar="SOCKET",
+            help="Let the `runenv daemon` listening on SOCKET load the env file and start the command",
+        )
+        run_parser.add_argument(
+            "--lint-level",
+            choices=["none", "info", "warning", "error"],
+            default="none",
+            help="Minimum message level to print to stderr (default: none)",
+        )
+        run_parser.add_argument(
+            "--fail-on",
+            choices=["none", "info", "warning", "error"],
+            default="none",
+            help="Minimum message level that causes a non-zero exit before running the command (default: none)",
+        )
 
-    # --- list command ---
-    list_parser = subparsers.add_parser("list", help="List parsed variables")
-    list_parser.add_argument(
-        "--env-file",
-        help="Environment file to load",
-        type=str,
-    )
-    list_parser.add_argument(
-        "-p",
-        "--prefix",
-        action="store",
-        type=str,
-        help="Load only variables with given prefix",
-    )
-    list_parser.add_argument(
-        "-s",
-        "--strip-prefix",
-        action="store_true",
-        help="Strip prefix given with --prefix from environment variables names",
-    )
-    list_parser.add_argument(
-        "--search-parent",
-        type=int,
-        default=0,
-        help="How many parent dirs search for .env[.json,.toml,.yaml] files; default 0",
-    )
-    list_parser.add_argument(
-        "--lint-level",
-        choices=["none", "info", "warning", "error"],
-        default="none",
-        help="Minimum message level to print to stderr (default: none)",
-    )
-    list_parser.add_argument(
-        "--fail-on",
-        choices=["none", "info", "warning", "error"],
-        default="none",
-        help="Minimum message level that causes a non-zero exit before listing (default: none)",
-    )
+    if subcommand in (None, "list"):
+        # --- list command ---
+        list_parser = subparsers.add_parser("list", help="List parsed variables")
+        list_parser.add_argument(
+            "--env-file",
+            help="Environment file to load",
+            type=str,
+        )
+        list_parser.add_argument(
+            "-p",
+            "--prefix",
+            action="store",
+            type=str,
+            help="Load only variables with given prefix",
+        )
+        list_parser.add_argument(
+            "-s",
+            "--strip-prefix",
+            action="store_true",
+            help="Strip prefix given with --prefix from environment variables names",
+        )
+        list_parser.add_argument(
+            "--search-parent",
+            type=int,
+            default=0,
+            help="How many parent dirs search for .env[.json,.toml,.yaml] files; default 0",
+        )
+        list_parser.add_argument(
+            "--lint-level",
+            choices=["none", "info", "warning", "error"],
+            default="none",
+            help="Minimum message level to print to stderr (default: none)",
+        )
+        list_parser.add_argument(
+            "--fail-on",
+            choices=["none", "info", "warning", "error"],
+            default="none",
+            help="Minimum message level that causes a non-zero exit before listing (default: none)",
+        )
 
-    # --- lint command ---
-    lint_parser = subparsers.add_parser("lint", help="Lint env file")
-    lint_parser.add_argument(
-        "--env-file",
-        help="Environment file to lint",
-        type=str,
-    )
-    lint_parser.add_argument(
-        "-p",
-        "--prefix",
-        action="store",
-        type=str,
-        help="Load only variables with given prefix",
-    )
-    lint_parser.add_argument(
-        "-s",
-        "--strip-prefix",
-        action="store_true",
-        help="Strip prefix given with --prefix from environment variables names",
-    )
-    lint_parser.add_argument(
-        "--search-parent",
-        type=int,
-        default=0,
-        help="How many parent dirs search for .env[.json,.toml,.yaml] files; default 0",
-    )
-    lint_parser.add_argument(
-        "--as-json",
-        action="store_true",
-        help="Return json instead log lines",
-    )
-    lint_parser.add_argument(
-        "--lint-level",
-        choices=["none", "info", "warning", "error"],
-        default="info",
-        help="Minimum message level to print (default: info)",
-    )
-    lint_parser.add_argument(
-        "--fail-on",
-        choices=["none", "info", "warning", "error"],
-        default="error",
-        help="Minimum message level that causes a non-zero exit (default: error)",
-    )
+    if subcommand in (None, "lint"):
+        # --- lint command ---
+        lint_parser = subparsers.add_parser("lint", help="Lint env file")
+        lint_parser.add_argument(
+            "--env-file",
+            help="Environment file to lint",
+            type=str,
+        )
+        lint_parser.add_argument(
+            "-p",
+            "--prefix",
+            action="store",
+            type=str,
+            help="Load only variables with given prefix",
+        )
+        lint_parser.add_argument(
+            "-s",
+            "--strip-prefix",
+            action="store_true",
+            help="Strip prefix given with --prefix from environment variables names",
+        )
+        lint_parser.add_argument(
+            "--search-parent",
+            type=int,
+            default=0,
+            help="How many parent dirs search for .env[.json,.toml,.yaml] files; default 0",
+        )
+        lint_parser.add_argument(
+            "--as-json",
+            action="store_true",
+            help="Return json instead log lines",
+        )
+        lint_parser.add_argument(
+            "--lint-level",
+            choices=["none", "info", "warning", "error"],
+            default="info",
+            help="Minimum message level to print (default: info)",
+        )
+        lint_parser.add_argument(
+            "--fail-on",
+            choices=["none", "info", "warning", "error"],
+            default="error",
+            help="Minimum message level that causes a non-zero exit (default: error)",
+        )
+
+    if subcommand in (None, "compile"):
+        # --- compile command ---
+        compile_parser = subparsers.add_parser("compile", help="Write resolved variables to a snapshot file")
+        compile_parser.add_argument(
+            "--env-file",
+            help="Environment file to compile",
+            type=str,
+        )
+        compile_parser.add_argument(
+            "-o",
+            "--output",
+            default="env.snapshot",
+            help="Snapshot file to write, loadable with `--env-file` (default: env.snapshot)",
+        )
+        compile_parser.add_argument(
+            "-p",
+            "--prefix",
+            action="store",
+            type=str,
+            help="Load only variables with given prefix",
+        )
+        compile_parser.add_argument(
+            "-s",
+            "--strip-prefix",
+            action="store_true",
+            help="Strip prefix given with --prefix from environment variables names",
+        )
+        compile_parser.add_argument(
+            "--search-parent",
+            type=int,
+            default=0,
+            help="How many parent dirs search for .env[.json,.toml,.yaml] files; default 0",
+        )
+        compile_parser.add_argument(
+            "--lint-level",
+            choices=["none", "info", "warning", "error"],
+            default="none",
+            help="Minimum message level to print to stderr (default: none)",
+        )
+        compile_parser.add_argument(
+            "--fail-on",
+            choices=["none", "info", "warning", "error"],
+            default="none",
+            help="Minimum message level that causes a non-zero exit before writing the snapshot (default: none)",
+        )
 
+    if subcommand in (None, "serve"):
+        # --- serve command ---
+        serve_parser = subparsers.add_parser("serve", help="Publish resolved variables in shared memory")
+        serve_parser.add_argument(
+            "--env-file",
+            help="Environment file to serve",
+            type=str,
+        )
+        serve_parser.add_argument(
+            "--name",
+            default="runenv",
+            help="Shared memory name, loadable with `load_env(source='shm://NAME')` (default: runenv)",
+        )
+        serve_parser.add_argument(
+            "-p",
+            "--prefix",
+            action="store",
+            type=str,
+            help="Load only variables with given prefix",
+        )
+        serve_parser.add_argument(
+            "-s",
+            "--strip-prefix",
+            action="store_true",
+            help="Strip prefix given with --prefix from environment variables names",
+        )
+        serve_parser.add_argument(
+            "--search-parent",
+            type=int,
+            default=0,
+            help="How many parent dirs search for .env[.json,.toml,.yaml] files; default 0",
+        )
+        serve_parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds between env file checks (default: 1)",
+        )
+
+    if subcommand in (None, "daemon"):
+        # --- daemon command ---
+        daemon_parser = subparsers.add_parser("daemon", help="Start commands of `run --daemon` with warm env files")
+        daemon_parser.add_argument(
+            "--socket",
+            required=True,
+            help="Unix socket path to listen on",
+        )
+
+    return parser
+
+
+def run(argv: Optional[Sequence[str]] = None) -> Union[int, None]:
+    """Run CLI.
+
+    Args:
+        argv: list of CLI arguments
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    # do not pass `-h` | `--help` to legacy
+    params = (" ".join(argv).split(" -- ", 1))[0].split(" ")
+    if "-h" not in params and "--help" not in params:
+        l_arg = _first_positional(argv, LEGACY_FLAG_OPTIONS, LEGACY_VALUE_OPTIONS)
+        if l_arg is not None and Path(l_arg).is_file():
+            # Legacy usage detected
+            from runenv.legacy import run_legacy
+
+            return run_legacy(argv)
+
+    parser = build_parser(subcommand=_detect_subcommand(argv))
     args = parser.parse_args(argv)
 
     add_stdout_handler(cast("int", args.verbosity))
@@ -352,23 +747,43 @@ def run(argv: Optional[Sequence[str]] = None) -> Union[int, None]:
         parser.print_help()
         return 0
 
+    handler: Callable[[Any], Union[int, None]]
+    opts: Union[RunCMDOptions, ListCMDOptions, LintCMDOptions, CompileCMDOptions, ServeCMDOptions, DaemonCMDOptions]
     if subcommand == "run":
         handler = handle_run_subcommand
-        env_file = find_env_file(Path.cwd(), args.search_parent, args.env_file)
-        if not env_file:
+        if args.reload and args.exec_process:
+            parser.error("--reload cannot be used with --exec")
+        if args.reload and (args.env_file or "").endswith(".snapshot"):
+            parser.error("--reload cannot be used with a snapshot")
+        try:
+            signal_number(args.reload_signal)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.daemon and (args.exec_process or args.reload):
+            parser.error("--daemon cannot be used with --exec or --reload")
+        if args.daemon and (args.lint_level != "none" or args.fail_on != "none"):
+            parser.error("--daemon cannot be used with --lint-level or --fail-on")
+        env_file = args.env_file or "" if args.daemon else find_env_file(Path.cwd(), args.search_parent, args.env_file)
+        if not env_file and not args.daemon:
             if args.env_file:
                 fail(f"ERROR!!! Environment file `{args.env_file}` does not exist", 1)
             else:
                 fail(f"No .env / .env.json / .env.toml / .env.yaml found in {Path.cwd()}", 1)
         opts = RunCMDOptions(
             verbosity=args.verbosity,
-            env_file=args.env_file,
+            env_file=str(env_file),
             prefix=args.prefix,
             strip_prefix=args.strip_prefix,
             search_parent=args.search_parent,
             command=args.command,
             lint_level=args.lint_level,
             fail_on=args.fail_on,
+            exec_process=args.exec_process,
+            reload=args.reload,
+            reload_signal=args.reload_signal,
+            reload_grace=args.reload_grace,
+            reload_interval=args.reload_interval,
+            daemon=args.daemon,
         )
     elif subcommand == "list":
         handler = handle_list_subcommand
@@ -380,7 +795,7 @@ def run(argv: Optional[Sequence[str]] = None) -> Union[int, None]:
                 fail(f"No .env / .env.json / .env.toml / .env.yaml found in {Path.cwd()}", 1)
         opts = ListCMDOptions(
             verbosity=args.verbosity,
-            env_file=args.env_file,
+            env_file=str(env_file),
             prefix=args.prefix,
             strip_prefix=args.strip_prefix,
             search_parent=args.search_parent,
@@ -397,7 +812,7 @@ def run(argv: Optional[Sequence[str]] = None) -> Union[int, None]:
                 fail(f"No .env / .env.json / .env.toml / .env.yaml found in {Path.cwd()}", 1)
         opts = LintCMDOptions(
             verbosity=args.verbosity,
-            env_file=args.env_file,
+            env_file=str(env_file),
             prefix=args.prefix,
             strip_prefix=args.strip_prefix,
             search_parent=args.search_parent,
@@ -405,10 +820,51 @@ def run(argv: Optional[Sequence[str]] = None) -> Union[int, None]:
             lint_level=args.lint_level,
             fail_on=args.fail_on,
         )
+    elif subcommand == "compile":
+        handler = handle_compile_subcommand
+        env_file = find_env_file(Path.cwd(), args.search_parent, args.env_file)
+        if not env_file:
+            if args.env_file:
+                fail(f"ERROR!!! Environment file `{args.env_file}` does not exist", 1)
+            else:
+                fail(f"No .env / .env.json / .env.toml / .env.yaml found in {Path.cwd()}", 1)
+        opts = CompileCMDOptions(
+            verbosity=args.verbosity,
+            env_file=str(env_file),
+            output=args.output,
+            prefix=args.prefix,
+            strip_prefix=args.strip_prefix,
+            search_parent=args.search_parent,
+            lint_level=args.lint_level,
+            fail_on=args.fail_on,
+        )
+    elif subcommand == "serve":
+        handler = handle_serve_subcommand
+        env_file = find_env_file(Path.cwd(), args.search_parent, args.env_file)
+        if not env_file:
+            if args.env_file:
+                fail(f"ERROR!!! Environment file `{args.env_file}` does not exist", 1)
+            else:
+                fail(f"No .env / .env.json / .env.toml / .env.yaml found in {Path.cwd()}", 1)
+        if str(env_file).endswith(".snapshot"):
+            parser.error("serve cannot be used with a snapshot")
+        opts = ServeCMDOptions(
+            verbosity=args.verbosity,
+            env_file=str(env_file),
+            name=args.name,
+            prefix=args.prefix,
+            strip_prefix=args.strip_prefix,
+            search_parent=args.search_parent,
+            interval=args.interval,
+        )
+    elif subcommand == "daemon":
+        handler = handle_daemon_subcommand
+        opts = DaemonCMDOptions(verbosity=args.verbosity, socket=args.socket)
     else:
         parser.error("Unknown subcommand")
     try:
-        return handler(opts)
+        # each branch pairs `handler` with its own options, which mypy cannot relate
+        return handler(cast("Any", opts))
     except ValueError as e:
         fail(str(e), 1)
         return 1
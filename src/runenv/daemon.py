@@ -0,0 +1,366 @@
+# SPDX-FileCopyrightText: 2015-present Marek Wywiał <onjinx@gmail.com>
+#
+# SPDX-License-Identifier: MIT
+"""Launcher daemon keeping parsed env files warm for `runenv run --daemon`.
+
+`runenv daemon --socket PATH` listens on a Unix socket. A client sends one request with
+the command, its working directory, environ and env file options, passing its stdin,
+stdout and stderr descriptors along (`SCM_RIGHTS`). The daemon finds the env file the way
+`runenv run` does, takes its variables from a profile parsed once and read again only
+when the file changes (see `runenv.watch`), spawns the command with the client's
+descriptors and replies with its pid and later its exit code. Signals received by the
+client are forwarded to the command, which is terminated if the client disconnects
+first. Messages are JSON lines:
+
+    client -> daemon    {"command": [...], "cwd": "...", "environ": {...}, "env_file": null,
+                         "prefix": null, "strip_prefix": false, "search_parent": 0} + 3 descriptors
+                        {"signal": 15}
+    daemon -> client    {"pid": 1234} or {"error": "..."}
+                        {"returncode": 0}
+
+Only the client side is imported up front, so the thin client
+`python -m runenv.daemon --socket PATH -- command` starts without the parser.
+"""
+
+from __future__ import annotations
+
+import array
+import json
+import os
+import socket
+import sys
+
+# `typing.TYPE_CHECKING` without importing `typing`, which would take a good part of the
+# thin client's start
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+    from runenv.watch import EnvWatcher
+
+# signals a client forwards to the command it launched
+FORWARDED_SIGNALS = ("SIGINT", "SIGTERM", "SIGHUP", "SIGQUIT", "SIGUSR1", "SIGUSR2")
+
+_FD_SIZE = array.array("i").itemsize
+
+
+def _check_support() -> None:
+    if not hasattr(socket, "AF_UNIX") or not hasattr(socket, "SCM_RIGHTS"):
+        raise ValueError("runenv daemon needs Unix sockets with descriptor passing")
+
+
+def _send_message(sock: socket.socket, message: Dict[str, Any], fds: Sequence[int] = ()) -> None:
+    data = json.dumps(message).encode("utf-8") + b"\n"
+    if fds:
+        sent = sock.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds).tobytes())])
+        data = data[sent:]
+    if data:
+        sock.sendall(data)
+
+
+def _recv_request(sock: socket.socket) -> Tuple[Dict[str, Any], List[int]]:
+    """Read the first JSON line of a connection and the descriptors sent along with it."""
+    fds = array.array("i")
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk, ancdata, _, _ = sock.recvmsg(65536, socket.CMSG_SPACE(3 * _FD_SIZE))
+        for level, kind, cmsg_data in ancdata:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                fds.frombytes(cmsg_data[: len(cmsg_data) - len(cmsg_data) % _FD_SIZE])
+        if not chunk:
+            for fd in fds:
+                os.close(fd)
+            raise EOFError("connection closed before a request was received")
+        data += chunk
+    return json.loads(data), list(fds)
+
+
+class DaemonClient:
+    """Run commands through the launcher daemon listening on `socket_path`."""
+
+    def __init__(self, socket_path: str) -> None:
+        self.socket_path = socket_path
+
+    def run(
+        self,
+        command: Sequence[str],
+        env_file: Optional[str] = None,
+        prefix: Optional[str] = None,
+        strip_prefix: bool = False,  # noqa: FBT001,FBT002
+        search_parent: int = 0,
+        cwd: Optional[str] = None,
+        environ: Optional[Dict[str, str]] = None,
+        stdio: Sequence[int] = (0, 1, 2),
+    ) -> int:
+        """Run `command` like `runenv run` would and return its exit code.
+
+        Raises ValueError when the daemon cannot be reached or refuses the request, e.g.
+        when the env file or the command does not exist.
+        """
+        _check_support()
+        request = {
+            "command": list(command),
+            # not `Path.cwd()`, importing `pathlib` would slow the thin client's start
+            "cwd": cwd or os.getcwd(),  # noqa: PTH109
+            "environ": dict(os.environ if environ is None else environ),
+            "env_file": env_file,
+            "prefix": prefix,
+            "strip_prefix": strip_prefix,
+            "search_parent": search_parent,
+        }
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.socket_path)
+            except OSError as e:
+                raise ValueError(f"Cannot connect to runenv daemon at {self.socket_path}: {e}") from None
+            _send_message(sock, request, stdio)
+            replies = sock.makefile("rb")
+            reply = json.loads(replies.readline() or b'{"error": "runenv daemon closed the connection"}')
+            if "error" in reply:
+                raise ValueError(reply["error"])
+            restore = self._forward_signals(sock)
+            try:
+                line = replies.readline()
+            finally:
+                restore()
+            if not line:
+                raise ValueError("runenv daemon closed the connection before the command exited")
+            return int(json.loads(line)["returncode"])
+
+    @staticmethod
+    def _forward_signals(sock: socket.socket) -> Callable[[], None]:
+        import signal
+        import threading
+
+        if threading.current_thread() is not threading.main_thread():
+            return lambda: None
+
+        def forward(signum: int, _frame: object) -> None:
+            _send_message(sock, {"signal": signum})
+
+        previous = {}
+        for name in FORWARDED_SIGNALS:
+            signum = getattr(signal, name, None)
+            if signum is not None:
+                previous[signum] = signal.signal(signum, forward)
+
+        def restore() -> None:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+        return restore
+
+
+class LaunchDaemon:
+    """Serve `DaemonClient` requests on the Unix socket `socket_path`.
+
+    Env files are parsed on first use and kept as profiles, keyed by path and prefix
+    options; every later request costs a `stat()` of the file, see `EnvWatcher.poll`.
+    Variables referencing names missing from the file are resolved against the client's
+    environ, as `runenv run` would. Only the daemon's user may connect: the socket is
+    created owner only and clients running as another uid are refused.
+    """
+
+    def __init__(self, socket_path: str) -> None:
+        import socketserver
+        import threading
+        from pathlib import Path
+
+        _check_support()
+        self.socket_path = socket_path
+        self._socket_file = Path(socket_path)
+        self._profiles: Dict[Tuple[str, Optional[str], bool], EnvWatcher] = {}
+        self._lock = threading.Lock()
+        self._remove_stale_socket()
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                daemon.handle(self.request)
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+            def server_bind(self) -> None:
+                super().server_bind()
+                # owner only, before `listen()` accepts the first connection
+                Path(socket_path).chmod(0o600)
+
+        self._server = Server(socket_path, Handler)
+
+    def _remove_stale_socket(self) -> None:
+        if not self._socket_file.exists():
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.socket_path)
+            except ConnectionRefusedError:
+                # left by a daemon which did not shut down cleanly
+                self._socket_file.unlink()
+                return
+        raise ValueError(f"Another runenv daemon is listening on {self.socket_path}")
+
+    @staticmethod
+    def _check_peer(conn: socket.socket) -> None:
+        """Refuse clients running as another user, whatever the socket's permissions."""
+        if not hasattr(socket, "SO_PEERCRED"):
+            # e.g. macOS, left to the owner only permissions of the socket
+            return
+        import struct
+
+        credentials = struct.Struct("3i")
+        _, uid, _ = credentials.unpack(conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, credentials.size))
+        if uid != os.getuid():
+            raise ValueError(f"runenv daemon only runs commands of uid {os.getuid()}, not {uid}")
+
+    def environ_for(self, request: Dict[str, Any]) -> Dict[str, str]:
+        """Return the environ to run the command of `request` with."""
+        from pathlib import Path
+
+        from runenv.api import find_env_file
+        from runenv.parser import ParseOptions
+        from runenv.watch import EnvWatcher
+
+        cwd = Path(request["cwd"])
+        env_file = find_env_file(cwd, request.get("search_parent", 0), request.get("env_file"))
+        if not env_file:
+            if request.get("env_file"):
+                raise ValueError(f"ERROR!!! Environment file `{request['env_file']}` does not exist")
+            raise ValueError(f"No .env / .env.json / .env.toml / .env.yaml found in {cwd}")
+        if str(env_file).endswith(".snapshot"):
+            raise ValueError("Snapshots load without parsing, run them without --daemon")
+        prefix = request.get("prefix")
+        strip_prefix = bool(request.get("strip_prefix"))
+        client_environ: Dict[str, str] = request["environ"]
+
+        key = (os.path.abspath(env_file), prefix, strip_prefix)
+        with self._lock:
+            watcher = self._profiles.get(key)
+            if watcher is None:
+                options = ParseOptions(prefix=prefix, strip_prefix=strip_prefix, diagnostics="none")
+                watcher = self._profiles[key] = EnvWatcher(env_file, lambda _diff: None, options=options)
+            else:
+                watcher.poll()
+            parser = watcher.parser
+            if any(client_environ.get(name) != os.environ.get(name) for name in parser.external_references):
+                loaded = parser.resolve_with(client_environ)
+            else:
+                loaded = dict(watcher.environ)
+        return {**client_environ, **loaded, "_RUNENV_WRAPPED": "1"}
+
+    def spawn(self, request: Dict[str, Any], fds: Sequence[int]) -> Any:
+        """Start the command of `request` with client descriptors `fds` as its stdio."""
+        import shutil
+        import subprocess
+
+        environ = self.environ_for(request)
+        command: List[str] = request["command"]
+        if not command:
+            raise ValueError("Missing command to execute after 'runenv run -- <command> [params]'")
+        cwd = request["cwd"]
+        name = command[0]
+        if os.path.dirname(name):
+            executable: Optional[str] = os.path.join(cwd, name)
+        else:
+            executable = shutil.which(name, path=environ.get("PATH", os.defpath))
+        if executable is None or not os.path.exists(executable):
+            raise ValueError(f"File `{executable or name}` does not exist")
+        if not os.access(executable, os.X_OK):
+            raise ValueError(f"File `{executable}` is not executable")
+        stdin, stdout, stderr = [*fds, None, None, None][:3]
+        return subprocess.Popen(  # noqa: S603
+            [executable, *command[1:]],
+            env=environ,
+            cwd=cwd,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr,
+            start_new_session=True,
+        )
+
+    def handle(self, conn: socket.socket) -> None:
+        """Serve one client connection until its command exits."""
+        import threading
+        from contextlib import suppress
+
+        try:
+            request, fds = _recv_request(conn)
+        except (EOFError, ValueError):
+            return
+        try:
+            self._check_peer(conn)
+            process = self.spawn(request, fds)
+        except (OSError, ValueError) as e:
+            with suppress(OSError):
+                _send_message(conn, {"error": str(e)})
+            return
+        finally:
+            for fd in fds:
+                os.close(fd)
+        _send_message(conn, {"pid": process.pid})
+
+        def read_signals() -> None:
+            for line in conn.makefile("rb"):
+                signum = json.loads(line).get("signal")
+                if signum is not None and process.poll() is None:
+                    process.send_signal(int(signum))
+            # client disconnected, do not leave its command running
+            if process.poll() is None:
+                process.terminate()
+
+        threading.Thread(target=read_signals, name="runenv-daemon-signals", daemon=True).start()
+        returncode = process.wait()
+        # the client may be gone, which is why the command was terminated
+        with suppress(OSError):
+            _send_message(conn, {"returncode": returncode})
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stop `serve_forever` running in another thread."""
+        self._server.shutdown()
+
+    def close(self) -> None:
+        """Close the socket and remove its file."""
+        self._server.server_close()
+        if self._socket_file.exists():
+            self._socket_file.unlink()
+
+    def __enter__(self) -> LaunchDaemon:  # noqa: PYI034
+        """Return the daemon, its socket is closed and removed on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the socket, see `close`."""
+        self.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Thin client, same as `runenv run --daemon SOCKET` but without importing the parser."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m runenv.daemon", description=main.__doc__)
+    parser.add_argument("--socket", required=True, help="Socket of `runenv daemon`")
+    parser.add_argument("--env-file", help="Environment file to load")
+    parser.add_argument("-p", "--prefix", help="Load only variables with given prefix")
+    parser.add_argument("-s", "--strip-prefix", action="store_true", help="Strip prefix given with --prefix")
+    parser.add_argument("--search-parent", type=int, default=0, help="How many parent dirs search for env files")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="Command to run with loaded environment")
+    args = parser.parse_args(argv)
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    try:
+        return DaemonClient(args.socket).run(
+            command,
+            env_file=args.env_file,
+            prefix=args.prefix,
+            strip_prefix=args.strip_prefix,
+            search_parent=args.search_parent,
+        )
+    except ValueError as e:
+        sys.stdout.write(f"{e}\n")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
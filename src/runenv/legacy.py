@@ -78,6 +78,12 @@ def run_legacy_parser(
         action="store_true",
         help="Return parsed .env instead of running command",
     )
+    parser.add_argument(
+        "--exec",
+        dest="exec_process",
+        action="store_true",
+        help="Replace runenv process with the command (os.execve) instead of running it as a child process",
+    )
     parser.add_argument(
         "--search-parent",
         type=int,
@@ -121,6 +127,10 @@ def run_legacy(argv: Optional[Sequence[str]] = None) -> int:
         if not (stat.S_IXUSR & os.stat(cmd)[stat.ST_MODE]):
             sys.stdout.write(f"[legacy] File `{args.command}` is not executable\n")
             sys.exit(1)
+        if args.exec_process:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.execve(cmd, [cmd, *argv], os.environ)  # noqa: S606
         return subprocess.check_call([cmd] + argv, env=os.environ)  # noqa: RUF005, S603
     except subprocess.CalledProcessError as e:
         return e.returncode
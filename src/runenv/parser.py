@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-import json
 import logging
 import os
 import re
 import sys
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
@@ -15,38 +15,156 @@ logger = logging.getLogger(__name__)
 VARIABLE_LINE_REGEX = re.compile(r'^\s*([\w.]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\n#]*?))\s*(?:#.*)?$')
 VARIABLE_REFERENCE_REGEX = re.compile(r"\$\{(\w+)\}")
 POSIX_NAME_REGEX = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+CACHE_DIR_ENV = "RUNENV_CACHE_DIR"
+
+# value split into literal and `${VAR}` reference parts, see `compile_value`
+CompiledValue = Tuple[str, ...]
+# (line_number, key, value) entry produced by loaders
+EnvEntry = Tuple[int, str, str]
+
+
+_JSON_STRING = r'"(?:[^"\\\n]|\\.)*"'
+# top-level object keys are strings followed by `:` at depth 1; newlines are matched to count lines
+_JSON_LINE_TOKEN_REGEX = re.compile(r"(" + _JSON_STRING + r")(?=\s*:)|" + _JSON_STRING + r"|([\[{])|([\]}])|(\n)")
+# `lastindex` of `_JSON_LINE_TOKEN_REGEX` matches
+_JSON_KEY, _JSON_OPEN, _JSON_CLOSE, _JSON_NEWLINE = range(1, 5)
+_TOML_KEY = r"""("(?:[^"\\]|\\.)*"|'[^']*'|[A-Za-z0-9_-]+)"""
+_TOML_KEY_LINE_REGEX = re.compile(r"\s*" + _TOML_KEY + r"\s*[.=]")
+_TOML_TABLE_LINE_REGEX = re.compile(r"\s*\[\[?\s*" + _TOML_KEY)
+
+
+def _default_encoding_is_utf8() -> bool:
+    """Return whether files opened in text mode without an explicit encoding are decoded as UTF-8."""
+    import codecs
+    import locale
+
+    return codecs.lookup(locale.getpreferredencoding(do_setlocale=False)).name == "utf-8"
+
+
+def _is_env_key(key: str) -> bool:
+    # same as `[\w.]+`: str.isalnum() accepts exactly the characters `\w` does besides `_`
+    if not key:
+        return False
+    rest = key.replace(".", "").replace("_", "")
+    return not rest or rest.isalnum()
+
+
+def _quoted_value(rest: str, quote: str) -> Optional[str]:
+    end = rest.find(quote, 1)
+    if end == -1:
+        return None
+    tail = rest[end + 1 :].lstrip()
+    if tail and not tail.startswith("#"):
+        return None
+    return rest[1:end]
+
+
+def lex_env_line(line: str) -> Optional[Tuple[str, str]]:
+    """Split a stripped, non-comment `.env` line into `(key, value)` in one forward scan.
+
+    Gives the same results as matching `VARIABLE_LINE_REGEX`: a value in matching quotes
+    followed only by an optional comment is unquoted, any other value ends at the first `#`
+    with trailing whitespace removed. Returns `None` when the line is not an assignment.
+    """
+    separator = line.find("=")
+    if separator == -1:
+        return None
+    key = line[:separator].rstrip()
+    if not _is_env_key(key):
+        return None
+    rest = line[separator + 1 :].lstrip()
+    if rest[:1] in ("'", '"'):
+        value = _quoted_value(rest, rest[0])
+        if value is not None:
+            return key, value
+    comment = rest.find("#")
+    if comment != -1:
+        rest = rest[:comment]
+    return key, rest.rstrip()
 
 
 def _json_line_numbers(content: str, keys: Iterable[str]) -> Dict[str, int]:
-    lines = content.splitlines()
-    result: Dict[str, int] = {}
-    for key in keys:
-        pattern = re.compile(r'"' + re.escape(key) + r'"\s*:')
-        for i, line in enumerate(lines, 1):
-            if pattern.search(line):
-                result[key] = i
-                break
-    return result
+    """Map top-level JSON object `keys` to their line numbers in a single scan of `content`."""
+    lines: Dict[str, int] = {}
+    line_number = 1
+    depth = 0
+    for match in _JSON_LINE_TOKEN_REGEX.finditer(content):
+        token_type = match.lastindex
+        if token_type == _JSON_KEY:
+            if depth == 1:
+                token = match.group(1)
+                if "\\" in token:
+                    import json
+
+                    key = json.loads(token)
+                else:
+                    key = token[1:-1]
+                lines.setdefault(key, line_number)
+        elif token_type == _JSON_OPEN:
+            depth += 1
+        elif token_type == _JSON_CLOSE:
+            depth -= 1
+        elif token_type == _JSON_NEWLINE:
+            line_number += 1
+    return {key: lines[key] for key in keys if key in lines}
+
+
+def _toml_key(token: str) -> str:
+    if token.startswith("'"):
+        return token[1:-1]
+    if token.startswith('"'):
+        if "\\" in token:
+            import json
+
+            return str(json.loads(token))
+        return token[1:-1]
+    return token
 
 
 def _toml_line_numbers(content: str, keys: Iterable[str]) -> Dict[str, int]:
-    lines = content.splitlines()
-    result: Dict[str, int] = {}
-    for key in keys:
-        pattern = re.compile(r'^\s*' + re.escape(key) + r'\s*=')
-        for i, line in enumerate(lines, 1):
-            if pattern.match(line):
-                result[key] = i
+    """Map top-level TOML `keys` to their line numbers in a single scan of `content`.
+
+    Keys defined before the first table header map to their `key = ...` line, tables map
+    to the line of their first `[table]` header.
+    """
+    lines: Dict[str, int] = {}
+    in_table = False
+    multiline_delimiter: Optional[str] = None
+    for line_number, line in enumerate(content.splitlines(), 1):
+        if multiline_delimiter is not None:
+            if line.count(multiline_delimiter) % 2 == 1:
+                multiline_delimiter = None
+            continue
+        stripped = line.lstrip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("["):
+            in_table = True
+            match = _TOML_TABLE_LINE_REGEX.match(stripped)
+            if match:
+                lines.setdefault(_toml_key(match.group(1)), line_number)
+            continue
+        if not in_table:
+            match = _TOML_KEY_LINE_REGEX.match(stripped)
+            if match:
+                lines.setdefault(_toml_key(match.group(1)), line_number)
+        for delimiter in ('"""', "'''"):
+            if line.count(delimiter) % 2 == 1:
+                multiline_delimiter = delimiter
                 break
-    return result
+    return {key: lines[key] for key in keys if key in lines}
 
 
-def _yaml_line_numbers(content: str) -> Dict[str, int]:
-    try:
-        import yaml
-    except ImportError:
-        return {}
-    node = yaml.compose(content)
+def _yaml_safe_loader() -> type:
+    """Return libyaml based `CSafeLoader` when available, pure Python `SafeLoader` otherwise."""
+    import yaml
+
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)  # type: ignore[no-any-return]
+
+
+def _yaml_node_line_numbers(node: object) -> Dict[str, int]:
+    import yaml
+
     if not isinstance(node, yaml.MappingNode):
         return {}
     result: Dict[str, int] = {}
@@ -55,23 +173,177 @@ def _yaml_line_numbers(content: str) -> Dict[str, int]:
     return result
 
 
+def _yaml_line_numbers(content: str) -> Dict[str, int]:
+    try:
+        import yaml
+    except ImportError:
+        return {}
+    return _yaml_node_line_numbers(yaml.compose(content, Loader=_yaml_safe_loader()))
+
+
+def _strongly_connected_components(graph: Dict[str, Set[str]]) -> List[List[str]]:
+    """Return strongly connected components of `graph` using iterative Tarjan's algorithm.
+
+    Components come in reverse topological order: every component is listed after all
+    components reachable from it, i.e. referenced keys come before keys referencing them.
+    """
+    index: Dict[str, int] = {}
+    lowlink: Dict[str, int] = {}
+    stack: List[str] = []
+    on_stack: Set[str] = set()
+    components: List[List[str]] = []
+    for root, references in graph.items():
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(references))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(graph[child])))
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component: List[str] = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def _is_cyclic(component: List[str], graph: Dict[str, Set[str]]) -> bool:
+    return len(component) > 1 or component[0] in graph[component[0]]
+
+
+# cycles reported per strongly connected component; a dense component has a back edge for
+# about every reference, and each reported cycle costs its length
+MAX_CYCLES_PER_COMPONENT = 10
+
+
+def _component_cycles(component: List[str], graph: Dict[str, Set[str]]) -> List[List[str]]:
+    """Return a cycle, e.g. `[A, B, A]`, for each of the first back edges of a DFS over a cyclic `component`.
+
+    The DFS starts at the smallest key and visits references in sorted order, so e.g.
+    `A=${B}`, `B=${A}${C}`, `C=${B}` gives both `[A, B, A]` and `[B, C, B]`. Cycles over
+    the same keys are reported once, and the DFS stops after `MAX_CYCLES_PER_COMPONENT`
+    back edges.
+    """
+    members = set(component)
+    start = min(component)
+    # DFS tree parents of keys on the current path, the start is its own
+    parents = {start: start}
+    done: Set[str] = set()
+    seen: Set[FrozenSet[str]] = set()
+    cycles: List[List[str]] = []
+    back_edges = 0
+    work = [(start, iter(sorted(graph[start] & members)))]
+    while work:
+        node, children = work[-1]
+        for child in children:
+            if child in parents:
+                cycle = [node]
+                while cycle[-1] != child:
+                    cycle.append(parents[cycle[-1]])
+                cycle.reverse()
+                keys = frozenset(cycle)
+                if keys not in seen:
+                    seen.add(keys)
+                    cycles.append([*cycle, child])
+                back_edges += 1
+                if back_edges == MAX_CYCLES_PER_COMPONENT:
+                    return cycles
+            elif child not in done:
+                parents[child] = node
+                work.append((child, iter(sorted(graph[child] & members))))
+                break
+        else:
+            work.pop()
+            del parents[node]
+            done.add(node)
+    return cycles
+
+
+def _weakly_connected_components(graph: Dict[str, Set[str]]) -> List[List[str]]:
+    """Return groups of keys of `graph` connected by edges in either direction, using union-find."""
+    roots: Dict[str, str] = {}
+
+    def find(key: str) -> str:
+        while roots[key] != key:
+            roots[key] = roots[roots[key]]
+            key = roots[key]
+        return key
+
+    for key, children in graph.items():
+        roots.setdefault(key, key)
+        for child in children:
+            roots.setdefault(child, child)
+            root, child_root = find(key), find(child)
+            if root != child_root:
+                roots[root] = child_root
+    groups: Dict[str, List[str]] = {}
+    for key in roots:
+        groups.setdefault(find(key), []).append(key)
+    return list(groups.values())
+
+
 def _normalize_structured_value(value: object) -> str:
     if isinstance(value, bool):
         return "true" if value else "false"
     return str(value)
 
 
+DIAGNOSTICS = ("none", "counts", "full")
+
+# with `ParseOptions.jobs` above 1, smaller `.env` files are lexed and smaller environs
+# resolved in the calling process, as starting workers would cost more than it saves
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+PARALLEL_MIN_KEYS = 200_000
+# chunks per worker, so a slow chunk does not leave the other workers idle
+PARALLEL_CHUNKS_PER_JOB = 4
+
+# per-instance `__dict__` is dropped where dataclasses support it (Python 3.10+)
+_SLOTS: Dict[str, bool] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
 @dataclass
 class ParseOptions:
     prefix: Union[str, None] = None
     strip_prefix: bool = True
+    # "full" collects `messages`, "counts" only `message_counts` per level, "none" skips diagnostics
+    diagnostics: str = "full"
+    # worker processes for lexing large `.env` files and resolving large environs, see `EnvParser.parse`
+    jobs: int = 1
 
+    def __post_init__(self) -> None:
+        """Validate `diagnostics` and `jobs`."""
+        if self.diagnostics not in DIAGNOSTICS:
+            raise ValueError(f"diagnostics must be one of {', '.join(DIAGNOSTICS)}, got {self.diagnostics!r}")
+        if self.jobs < 1:
+            raise ValueError(f"jobs must be at least 1, got {self.jobs!r}")
 
-@dataclass
+
+@dataclass(**_SLOTS)
 class ParseMessage:
     line_number: int
     level: str
     message: str
+    source: Optional[str] = None
 
 
 class EnvParser:
@@ -80,8 +352,28 @@ class EnvParser:
         self.raw_environ: Dict[str, str] = {}
         self.final_environ: Dict[str, str] = {}
         self.messages: List[ParseMessage] = []
+        self.message_counts: Dict[str, int] = {}
+        self.compiled_environ: Dict[str, CompiledValue] = {}
+        self.dependencies: Dict[str, Set[str]] = {}
+        self.components: List[List[str]] = []
+        self.external_references: Set[str] = set()
+        self.references: Dict[str, Set[str]] = {}
+        self.cycles: List[List[str]] = []
+        # reverse of `references` including names missing from the file, built on first `update`
+        self._referrers: Optional[Dict[str, Set[str]]] = None
 
-    def parse(self, env_file: Union[str, Path]) -> EnvParser:
+    def _report(self, line_number: int, level: str, template: str, *args: object) -> None:
+        """Record a diagnostic as `options.diagnostics` asks; its text is only built in "full" mode."""
+        diagnostics = self.options.diagnostics
+        if diagnostics == "none":
+            return
+        self.message_counts[level] = self.message_counts.get(level, 0) + 1
+        logger.debug(template, *args)
+        if diagnostics == "full":
+            message = template % args if args else template
+            self.messages.append(ParseMessage(line_number=line_number, level=level, message=message))
+
+    def _loader(self, env_file: Union[str, Path]) -> Callable[[Union[str, Path]], Iterator[EnvEntry]]:
         filename = env_file if isinstance(env_file, str) else env_file.name
         extension = Path(filename).suffix
 
@@ -90,128 +382,423 @@ class EnvParser:
             ".yaml": self.load_yaml_file,
             ".toml": self.load_toml_file,
         }
-        loader = LOADERS.get(extension, self.load_env_file)
-        environ = loader(env_file)
-        # skip not prefixed if prefix used
-        for line_number, key, value in environ:
-            if self.options.prefix and (not key.startswith(self.options.prefix) or key == self.options.prefix):
-                msg = f"skip {key} without prefix {self.options.prefix}"
-                logger.debug(msg)
-                self.messages.append(
-                    ParseMessage(
-                        line_number=line_number,
-                        level="info",
-                        message=msg,
-                    )
-                )
+        return LOADERS.get(extension, self.load_env_file)
+
+    def load(self, env_file: Union[str, Path]) -> Iterator[EnvEntry]:
+        """Yield raw `(line_number, key, value)` entries of `env_file` using loader matching its extension."""
+        return self._loader(env_file)(env_file)
+
+    def iter_entries(self, env_file: Union[str, Path]) -> Iterator[EnvEntry]:
+        """Yield `(line_number, key, value)` entries of `env_file` lazily.
+
+        Prefix filtering, prefix stripping and POSIX name checks are applied on the fly and
+        reported to `messages`; duplicated keys are yielded as they appear in the file.
+        With `options.jobs` above 1, large UTF-8 `.env` files are lexed and filtered in
+        worker processes, chunk by chunk, and yielded in the same order with the same
+        messages as a sequential read.
+        """
+        if self.options.jobs > 1 and self._loader(env_file) == self.load_env_file and _default_encoding_is_utf8():
+            chunks = _env_file_chunks(env_file, self.options.jobs * PARALLEL_CHUNKS_PER_JOB)
+            if len(chunks) > 1:
+                return self._iter_entries_parallel(env_file, chunks)
+        return self.filter_entries(self.load(env_file))
+
+    def _iter_entries_parallel(
+        self, env_file: Union[str, Path], chunks: List[Tuple[int, int, int]]
+    ) -> Iterator[EnvEntry]:
+        from concurrent.futures import ProcessPoolExecutor
+
+        options = replace(self.options, jobs=1)
+        with ProcessPoolExecutor(max_workers=self.options.jobs) as executor:
+            futures = [executor.submit(_lex_env_chunk, str(env_file), *chunk, options) for chunk in chunks]
+            for future in futures:
+                entries, messages, message_counts = future.result()
+                for level, count in message_counts.items():
+                    self.message_counts[level] = self.message_counts.get(level, 0) + count
+                if not messages:
+                    yield from entries
+                    continue
+                # keep messages of a line ahead of the duplicate warning `_collect` may add for it
+                pending = deque(messages)
+                for entry in entries:
+                    while pending and pending[0][0] <= entry[0]:
+                        self.messages.append(ParseMessage(*pending.popleft()))
+                    yield entry
+                self.messages.extend(ParseMessage(*message) for message in pending)
+
+    def filter_entries(self, entries: Iterable[EnvEntry]) -> Iterator[EnvEntry]:
+        """Apply prefix filtering, prefix stripping and POSIX name checks to raw `entries`."""
+        prefix = self.options.prefix
+        strip = len(prefix) if prefix and self.options.strip_prefix else 0
+        quiet = self.options.diagnostics == "none"
+        for line_number, raw_key, value in entries:
+            # skip not prefixed if prefix used
+            if prefix and (not raw_key.startswith(prefix) or raw_key == prefix):
+                if not quiet:
+                    self._report(line_number, "info", "skip %s without prefix %s", raw_key, prefix)
                 continue
-            if self.options.prefix and self.options.strip_prefix:
-                logger.debug("strip %s without prefix %s", key, self.options.prefix)
-                key = key[len(self.options.prefix) :]
-
-            if not POSIX_NAME_REGEX.match(key):
-                msg = f"'{key}' is not a valid POSIX env var name"
-                logger.debug(msg)
-                self.messages.append(
-                    ParseMessage(
-                        line_number=line_number,
-                        level="warning",
-                        message=msg,
-                    )
-                )
+            key = raw_key[strip:] if strip else raw_key
+
+            if not quiet and not POSIX_NAME_REGEX.match(key):
+                self._report(line_number, "warning", "'%s' is not a valid POSIX env var name", key)
+            yield line_number, key, value
+
+    def parse(self, env_file: Union[str, Path]) -> EnvParser:
+        return self.parse_entries(self.iter_entries(env_file))
+
+    def parse_entries(self, entries: Iterable[EnvEntry]) -> EnvParser:
+        """Collect filtered `entries` (last value wins), then detect cycles and resolve references."""
+        self._collect(entries)
+        self._finalize()
+        return self
+
+    def parse_files(self, env_files: Sequence[Union[str, Path]], max_workers: int = 1) -> EnvParser:
+        """Parse layered `env_files`, each file overriding variables of the files before it.
+
+        Files are read independently, in a thread pool when `max_workers` is above 1, and
+        merged by precedence; cycle detection and substitution then run once over the merged
+        variables, so `${VAR}` in one file may reference a variable set by another. Messages
+        carry the file they come from in `source`; duplicates are only reported within a file.
+        """
 
+        def read_layer(env_file: Union[str, Path]) -> Tuple[EnvParser, Optional[ValueError]]:
+            layer = EnvParser(self.options)
+            error = None
+            try:
+                layer._collect(layer.iter_entries(env_file))
+            except ValueError as e:
+                error = e
+                _report_failure(layer, e)
+            for message in layer.messages:
+                message.source = str(env_file)
+            return layer, error
+
+        if max_workers > 1 and len(env_files) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                layers = list(executor.map(read_layer, env_files))
+        else:
+            layers = [read_layer(env_file) for env_file in env_files]
+
+        for layer, error in layers:
+            self.messages.extend(layer.messages)
+            for level, count in layer.message_counts.items():
+                self.message_counts[level] = self.message_counts.get(level, 0) + count
+            if error is not None:
+                raise error
+            self.raw_environ.update(layer.raw_environ)
+        self._finalize()
+        return self
+
+    def _collect(self, entries: Iterable[EnvEntry]) -> None:
+        for line_number, key, value in entries:
             if key in self.raw_environ:
-                msg = f"duplicated '{key}' variable, last value wins"
-                logger.debug(msg)
-                self.messages.append(
-                    ParseMessage(
-                        line_number=line_number,
-                        level="warning",
-                        message=msg,
-                    )
-                )
+                self._report(line_number, "warning", "duplicated '%s' variable, last value wins", key)
             self.raw_environ[key] = value
 
+    def _finalize(self) -> None:
+        # tokenize every value once, both cycle detection and substitution reuse the parts
+        self.compiled_environ = {key: compile_value(value) for key, value in self.raw_environ.items()}
+        if self.options.jobs > 1 and len(self.raw_environ) >= PARALLEL_MIN_KEYS:
+            self._resolve_parallel()
+            return
         self._find_cycles()
-        for key, value in self.raw_environ.items():
-            self.final_environ[key] = substitute_variables(value, self.raw_environ)
-        return self
+        self._resolve()
+
+    def _resolve_parallel(self) -> None:
+        """Detect cycles and resolve references like `_find_cycles` and `_resolve`, in worker processes.
+
+        Keys referencing nothing keep their raw values; the others are split into weakly
+        connected components of the dependency graph, which resolve independently of each
+        other, and the components are shared out between `options.jobs` workers.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        self._build_dependencies()
+        referring = {key: deps for key, deps in self.dependencies.items() if self.references[key]}
+        groups = _weakly_connected_components(referring)
+        external = {name: os.environ.get(name, "") for name in self.external_references}
+
+        jobs = self.options.jobs
+        target = sum(len(group) for group in groups) / jobs
+        batches: List[List[str]] = [[]]
+        for group in sorted(groups, key=len, reverse=True):
+            if len(batches[-1]) >= target and len(batches) < jobs:
+                batches.append([])
+            batches[-1].extend(group)
+
+        grouped = {key for group in groups for key in group}
+        self.components = [[key] for key in self.raw_environ if key not in grouped]
+        final_environ: Dict[str, str] = {}
+        cycles: List[List[str]] = []
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(
+                    _resolve_keys,
+                    {key: self.compiled_environ[key] for key in batch},
+                    {key: self.dependencies[key] for key in batch},
+                    {key: self.raw_environ[key] for key in batch},
+                    external,
+                )
+                for batch in batches
+                if batch
+            ]
+            for future in futures:
+                resolved, components, batch_cycles = future.result()
+                final_environ.update(resolved)
+                self.components.extend(components)
+                cycles.extend(batch_cycles)
+        self.cycles = sorted(cycles)
+        self._report_cycles()
+        self.final_environ = {key: final_environ.get(key, value) for key, value in self.raw_environ.items()}
+
+    def _resolve(self) -> None:
+        """Expand references recursively, resolving every value exactly once.
+
+        Keys are rendered in topological order of the dependency graph built by
+        `_find_cycles`, so `A=${B}` with `B=${C}` expands to the final value of `C`.
+        Keys within a circular reference see each other's raw values.
+        """
+        # look up names missing from the env file in `os.environ` once, not per reference
+        self.final_environ = self._render(self.components, os.environ)
+
+    def _render(self, components: List[List[str]], environ: Mapping[str, str]) -> Dict[str, str]:
+        scope = {name: environ.get(name, "") for name in self.external_references}
+        scope.update(self.raw_environ)
+        for component in components:
+            if _is_cyclic(component, self.dependencies):
+                scope.update({key: render_value(self.compiled_environ[key], scope) for key in component})
+            else:
+                key = component[0]
+                scope[key] = render_value(self.compiled_environ[key], scope)
+        return {key: scope[key] for key in self.raw_environ}
+
+    def resolve_with(self, environ: Mapping[str, str]) -> Dict[str, str]:
+        """Return variables resolved again with names missing from the file looked up in `environ`.
+
+        Reuses parsed values and the dependency graph, e.g. to resolve one parsed file for
+        processes with different environments; `final_environ` is left as is.
+        """
+        return self._render(_strongly_connected_components(self.dependencies), environ)
+
+    def _build_dependencies(self) -> None:
+        references: Dict[str, Set[str]] = {key: set(parts[1::2]) for key, parts in self.compiled_environ.items()}
+        self.references = references
+        self.dependencies = {key: refs & self.raw_environ.keys() for key, refs in references.items()}
+        # names resolved from `os.environ` instead of the env file
+        self.external_references = set().union(*references.values()) - self.raw_environ.keys()
 
     def _find_cycles(self) -> None:
-        deps: Dict[str, Set[str]] = {
-            key: set(VARIABLE_REFERENCE_REGEX.findall(value)) & self.raw_environ.keys()
-            for key, value in self.raw_environ.items()
+        self._build_dependencies()
+        deps = self.dependencies
+        self.components = _strongly_connected_components(deps)
+        cycles = [component for component in self.components if _is_cyclic(component, deps)]
+        self.cycles = sorted(cycle for component in cycles for cycle in _component_cycles(component, deps))
+        self._report_cycles()
+
+    def _report_cycles(self) -> None:
+        for cycle in self.cycles:
+            self._report(0, "warning", "circular reference: %s", " -> ".join(cycle))
+
+    def _retract_cycles(self) -> None:
+        """Remove diagnostics added by `_report_cycles`, which always come last."""
+        if not self.cycles or self.options.diagnostics == "none":
+            return
+        self.message_counts["warning"] -= len(self.cycles)
+        if self.options.diagnostics == "full":
+            del self.messages[len(self.messages) - len(self.cycles) :]
+
+    def update(self, changes: Dict[str, Optional[str]]) -> Set[str]:
+        """Apply changed raw values (`None` removes a key) and re-resolve only the affected keys.
+
+        Only keys in the reverse-dependency closure of `changes` are re-checked for cycles and
+        substituted again, so the cost depends on what changed rather than on the file size.
+        The resulting `final_environ` and cycle warnings equal those of a full parse of the
+        updated variables; `components` keeps the order of the last full parse.
+        Returns keys whose resolved value may have changed, including removed ones.
+        """
+        referrers = self._build_referrers()
+        touched: Set[str] = set()
+        for key, value in changes.items():
+            old_refs = self.references.pop(key, set())
+            for name in old_refs:
+                referrers[name].discard(key)
+            touched |= old_refs
+            if value is None:
+                self.raw_environ.pop(key, None)
+                self.compiled_environ.pop(key, None)
+                self.dependencies.pop(key, None)
+                self.final_environ.pop(key, None)
+            else:
+                parts = compile_value(value)
+                self.raw_environ[key] = value
+                self.compiled_environ[key] = parts
+                self.references[key] = set(parts[1::2])
+                for name in self.references[key]:
+                    referrers.setdefault(name, set()).add(key)
+                touched |= self.references[key]
+            touched.add(key)
+
+        # every key referencing a changed key, directly or through other keys
+        affected = set(changes)
+        queue = deque(changes)
+        while queue:
+            for referrer in referrers.get(queue.popleft(), ()):
+                if referrer not in affected:
+                    affected.add(referrer)
+                    queue.append(referrer)
+
+        for name in touched:
+            if referrers.get(name) and name not in self.raw_environ:
+                self.external_references.add(name)
+            else:
+                self.external_references.discard(name)
+
+        affected &= self.raw_environ.keys()
+        for key in affected:
+            self.dependencies[key] = self.references[key] & self.raw_environ.keys()
+
+        # cycles through an affected key lie within `affected`, which is closed under referrers
+        subgraph = {key: self.dependencies[key] & affected for key in affected}
+        components = _strongly_connected_components(subgraph)
+        cycles = [cycle for cycle in self.cycles if not affected.intersection(cycle) and cycle[0] in self.raw_environ]
+        for component in components:
+            if _is_cyclic(component, subgraph):
+                cycles.extend(_component_cycles(component, subgraph))
+        cycles.sort()
+        self._retract_cycles()
+        self.cycles = cycles
+        self._report_cycles()
+
+        scope = {}
+        for key in affected:
+            for name in self.dependencies[key]:
+                scope[name] = self.raw_environ[name] if name in affected else self.final_environ[name]
+        for component in components:
+            if _is_cyclic(component, subgraph):
+                scope.update({key: render_value(self.compiled_environ[key], scope) for key in component})
+            else:
+                key = component[0]
+                scope[key] = render_value(self.compiled_environ[key], scope)
+        for key in affected:
+            self.final_environ[key] = scope[key]
+        return affected | {key for key, value in changes.items() if value is None}
+
+    def reparse(self, env_file: Union[str, Path]) -> Set[str]:
+        """Read `env_file` again and `update` only the variables whose raw value changed.
+
+        Line messages are replaced with those of the new read. Returns keys whose resolved
+        value may have changed.
+        """
+        fresh = EnvParser(self.options)
+        fresh._collect(fresh.iter_entries(env_file))
+        changes: Dict[str, Optional[str]] = {
+            key: value for key, value in fresh.raw_environ.items() if self.raw_environ.get(key) != value
         }
+        changes.update((key, None) for key in self.raw_environ.keys() - fresh.raw_environ.keys())
+        affected = self.update(changes)
+        self._retract_cycles()
+        self.messages = fresh.messages
+        self.message_counts = fresh.message_counts
+        self._report_cycles()
+        return affected
 
-        WHITE, GRAY, BLACK = 0, 1, 2
-        colors: Dict[str, int] = {k: WHITE for k in deps}
-        reported: Set[frozenset] = set()
-        path: List[str] = []
-
-        def dfs(node: str) -> None:
-            colors[node] = GRAY
-            path.append(node)
-            for neighbor in sorted(deps.get(node, set())):
-                if colors.get(neighbor) == GRAY:
-                    cycle = path[path.index(neighbor):]
-                    cycle_key: frozenset = frozenset(cycle)
-                    if cycle_key not in reported:
-                        reported.add(cycle_key)
-                        self.messages.append(ParseMessage(
-                            line_number=0,
-                            level="warning",
-                            message="circular reference: " + " -> ".join(cycle + [neighbor]),
-                        ))
-                elif colors.get(neighbor, WHITE) == WHITE:
-                    dfs(neighbor)
-            path.pop()
-            colors[node] = BLACK
-
-        for node in sorted(deps.keys()):
-            if colors[node] == WHITE:
-                dfs(node)
-
-    def load_env_file(self, env_file: Union[str, Path]) -> List[Tuple[int, str, str]]:
-        environ: List[Tuple[int, str, str]] = []
-        with open(env_file) as f:
+    def _build_referrers(self) -> Dict[str, Set[str]]:
+        if self._referrers is None:
+            referrers: Dict[str, Set[str]] = {}
+            for key, names in self.references.items():
+                for name in names:
+                    referrers.setdefault(name, set()).add(key)
+            self._referrers = referrers
+        return self._referrers
 
+    def load_env_file(self, env_file: Union[str, Path]) -> Iterator[EnvEntry]:
+        if self.options.prefix and _default_encoding_is_utf8():
+            yield from self._load_env_file_bytes(env_file, self.options.prefix)
+            return
+        with open(env_file) as f:
             for line_number, raw_line in enumerate(f, start=1):
-                line = raw_line.rstrip(os.linesep)
+                entry = self._lex_line(line_number, raw_line)
+                if entry is not None:
+                    yield entry
 
-                # Strip leading and trailing whitespace from the line
-                line = line.strip()
+    def _lex_line(self, line_number: int, raw_line: str) -> Optional[EnvEntry]:
+        # Strip leading and trailing whitespace (including the line separator)
+        line = raw_line.strip()
 
-                # Skip empty lines and comments
-                if not line or line.startswith("#"):
-                    continue
+        # Skip empty lines and comments
+        if not line or line.startswith("#"):
+            return None
 
-                # Match key-value pairs (supports inline comments and empty values)
-                match = re.match(VARIABLE_LINE_REGEX, line)
+        # Split key-value pairs (supports inline comments and empty values)
+        entry = lex_env_line(line)
 
-                if match:
-                    key = match.group(1)
-                    value = next(g for g in match.groups()[1:] if g is not None)
-                    environ.append((line_number, key, value))
+        if entry is not None:
+            return line_number, entry[0], entry[1]
 
-                else:
-                    msg = "line not matched"
-                    logger.debug("%s '%s'", msg, line)
-                    self.messages.append(
-                        ParseMessage(
-                            line_number=line_number,
-                            level="warning",
-                            message=msg,
-                        )
-                    )
-
-        return environ
+        self._report(line_number, "warning", "line not matched")
+        return None
+
+    def _load_env_file_bytes(self, env_file: Union[str, Path], prefix: str) -> Iterator[EnvEntry]:
+        """Memory-mapped variant of `load_env_file` for UTF-8 files filtered by `prefix`.
+
+        Lines are split on raw bytes. Only lines starting with `prefix` are decoded in full,
+        for the others only the key is decoded so `iter_entries` can report them as skipped;
+        their values are never decoded. Without diagnostics those lines are dropped undecoded,
+        as a key always starts the stripped line.
+        """
+        import mmap
+
+        encoded_prefix = prefix.encode("utf-8")
+        quiet = self.options.diagnostics == "none"
+        with open(env_file, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                line_number = 0
+                start = 0
+                while start < size:
+                    end = data.find(b"\n", start)
+                    if end == -1:
+                        end = size
+                    raw = data[start:end]
+                    start = end + 1
+                    # text mode also ends lines at a lone `\r`, a trailing one is part of `\r\n`
+                    lines = [raw]
+                    if b"\r" in raw:
+                        lines = raw.split(b"\r")
+                        if raw.endswith(b"\r"):
+                            lines.pop()
+                    for line in lines:
+                        line_number += 1
+                        stripped = line.lstrip()
+                        first = stripped[:1]
+                        # bytes.lstrip() misses non-ASCII and \x1c-\x1f whitespace, leave those to str.strip()
+                        if first and b"\x20" < first < b"\x80" and not stripped.startswith(encoded_prefix):
+                            if quiet or first == b"#":
+                                continue
+                            entry = self._lex_key(line_number, stripped)
+                        else:
+                            entry = self._lex_line(line_number, line.decode("utf-8"))
+                        if entry is not None:
+                            yield entry
+
+    def _lex_key(self, line_number: int, line: bytes) -> Optional[EnvEntry]:
+        """Return entry with the decoded key and an empty value, checking the line is an assignment."""
+        separator = line.find(b"=")
+        key = line[:separator].decode("utf-8").rstrip() if separator != -1 else ""
+        if not _is_env_key(key):
+            return self._lex_line(line_number, line.decode("utf-8"))
+        return line_number, key, ""
 
     def _check_structured_root(self, data: object, fmt: str) -> Dict[str, object]:
         if data is None:
             return {}
         if not isinstance(data, dict):
             msg = f"{fmt} root must be a mapping, got {type(data).__name__}"
-            self.messages.append(ParseMessage(line_number=1, level="error", message=msg))
+            self._report(1, "error", msg)
             raise ValueError(msg)
         return data  # type: ignore[return-value]
 
@@ -220,39 +807,47 @@ class EnvParser:
         data: Dict[str, object],
         fmt: str,
         line_numbers: Optional[Dict[str, int]] = None,
-    ) -> List[Tuple[int, str, str]]:
-        environ: List[Tuple[int, str, str]] = []
+    ) -> Iterator[EnvEntry]:
         for seq_num, (key, value) in enumerate(data.items(), start=1):
             ln = line_numbers.get(key, seq_num) if line_numbers is not None else seq_num
             if value is None:
-                msg = f"'{key}' has null value, using empty string"
-                self.messages.append(ParseMessage(line_number=ln, level="warning", message=msg))
+                self._report(ln, "warning", "'%s' has null value, using empty string", key)
                 value_str = ""
             else:
                 value_str = _normalize_structured_value(value)
-            environ.append((ln, key, value_str))
-        return environ
+            yield ln, key, value_str
+
+    def load_json_file(self, env_file: Union[str, Path]) -> Iterator[EnvEntry]:
+        import json
 
-    def load_json_file(self, env_file: Union[str, Path]) -> List[Tuple[int, str, str]]:
         with open(env_file) as f:
             content = f.read()
         data = json.loads(content)
         root = self._check_structured_root(data, "JSON")
+        if self.options.diagnostics == "none":
+            return self._iter_structured(root, "JSON")
         return self._iter_structured(root, "JSON", _json_line_numbers(content, root.keys()))
 
-    def load_yaml_file(self, env_file: Union[str, Path]) -> List[Tuple[int, str, str]]:
+    def load_yaml_file(self, env_file: Union[str, Path]) -> Iterator[EnvEntry]:
         try:
-            import yaml
+            loader_class = _yaml_safe_loader()
         except ImportError:
             sys.stderr.write("ERROR!!! To use YAML install runenv[yaml]\n")
             sys.exit(1)
         with open(env_file, "r") as f:
             content = f.read()
-        data = yaml.safe_load(content)
+        # compose the node graph once and build both the values and key line numbers from it
+        loader = loader_class(content)
+        try:
+            node = loader.get_single_node()
+            line_numbers = _yaml_node_line_numbers(node) if self.options.diagnostics != "none" else None
+            data = loader.construct_document(node) if node is not None else None
+        finally:
+            loader.dispose()
         root = self._check_structured_root(data, "YAML")
-        return self._iter_structured(root, "YAML", _yaml_line_numbers(content))
+        return self._iter_structured(root, "YAML", line_numbers)
 
-    def load_toml_file(self, env_file: Union[str, Path]) -> List[Tuple[int, str, str]]:
+    def load_toml_file(self, env_file: Union[str, Path]) -> Iterator[EnvEntry]:
         if sys.version_info >= (3, 11):
             import tomllib as tomli
         else:
@@ -266,9 +861,101 @@ class EnvParser:
         content = raw.decode("utf-8")
         data = tomli.loads(content)
         root = self._check_structured_root(data, "TOML")
+        if self.options.diagnostics == "none":
+            return self._iter_structured(root, "TOML")
         return self._iter_structured(root, "TOML", _toml_line_numbers(content, root.keys()))
 
 
+def _env_file_chunks(env_file: Union[str, Path], count: int) -> List[Tuple[int, int, int]]:
+    r"""Split `env_file` into about `count` newline-aligned `(start, end, first_line_number)` byte ranges.
+
+    Files below `PARALLEL_MIN_BYTES` are a single chunk. Line numbers count lines the way
+    text mode does, where a lone `\r` also ends a line.
+    """
+    size = os.stat(env_file).st_size
+    if size < PARALLEL_MIN_BYTES:
+        return [(0, size, 1)]
+    chunks: List[Tuple[int, int, int]] = []
+    with open(env_file, "rb") as f:
+        start = 0
+        line_number = 1
+        while start < size:
+            f.seek(max(start + size // count, start + 1) - 1)
+            f.readline()
+            end = min(f.tell(), size)
+            chunks.append((start, end, line_number))
+            f.seek(start)
+            data = f.read(end - start)
+            line_number += data.count(b"\n") + data.count(b"\r") - data.count(b"\r\n")
+            start = end
+    return chunks
+
+
+def _lex_env_chunk(
+    env_file: str, start: int, end: int, first_line_number: int, options: ParseOptions
+) -> Tuple[List[EnvEntry], List[Tuple[int, str, str]], Dict[str, int]]:
+    """Lex and filter one chunk of `_env_file_chunks` in a worker process.
+
+    Returns filtered entries, `(line_number, level, message)` tuples and message counts.
+    """
+    import io
+
+    with open(env_file, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    parser = EnvParser(options)
+    # universal newlines, as in `load_env_file`
+    lines = enumerate(io.StringIO(text, newline=None), first_line_number)
+    lexed = (parser._lex_line(line_number, line) for line_number, line in lines)  # noqa: SLF001
+    entries = list(parser.filter_entries(entry for entry in lexed if entry is not None))
+    messages = [(message.line_number, message.level, message.message) for message in parser.messages]
+    return entries, messages, parser.message_counts
+
+
+def _resolve_keys(
+    compiled_environ: Dict[str, CompiledValue],
+    dependencies: Dict[str, Set[str]],
+    raw_environ: Dict[str, str],
+    external: Dict[str, str],
+) -> Tuple[Dict[str, str], List[List[str]], List[List[str]]]:
+    """Resolve keys closed under `dependencies` in a worker process, see `EnvParser._resolve_parallel`.
+
+    Returns resolved values, strongly connected components and cycle paths.
+    """
+    components = _strongly_connected_components(dependencies)
+    cycles: List[List[str]] = []
+    scope = dict(external)
+    scope.update(raw_environ)
+    for component in components:
+        if _is_cyclic(component, dependencies):
+            cycles.extend(_component_cycles(component, dependencies))
+            scope.update({key: render_value(compiled_environ[key], scope) for key in component})
+        else:
+            key = component[0]
+            scope[key] = render_value(compiled_environ[key], scope)
+    return {key: scope[key] for key in raw_environ}, components, cycles
+
+
+def compile_value(value: str) -> CompiledValue:
+    """Split *value* into literal and ``${VAR}`` reference parts.
+
+    Literals are at even and referenced names at odd indexes, so a value without
+    references compiles to a one element tuple.
+    """
+    return tuple(VARIABLE_REFERENCE_REGEX.split(value))
+
+
+def render_value(parts: CompiledValue, env_vars: Dict[str, str]) -> str:
+    """Join compiled *parts*, resolving references as `substitute_variables` does."""
+    if len(parts) == 1:
+        return parts[0]
+    resolved = list(parts)
+    for index in range(1, len(parts), 2):
+        value = env_vars.get(parts[index])
+        resolved[index] = os.environ.get(parts[index], "") if value is None else str(value)
+    return "".join(resolved)
+
+
 def substitute_variables(value: str, env_vars: Dict[str, str]) -> str:
     """Resolve ``${VAR}`` references in *value*.
 
@@ -283,24 +970,69 @@ def substitute_variables(value: str, env_vars: Dict[str, str]) -> str:
     variable to be redeclared inside the file.  If you want strict behaviour
     (error on undefined refs) use ``--strict`` once that flag is implemented.
     """
+    logger.debug("VALUE: %s , type %s", value, type(value))
+    return render_value(compile_value(str(value)), env_vars)
 
-    def replace_match(match: re.Match[str]) -> str:
-        var_name = match.group(1)
-        return str(env_vars.get(var_name, os.environ.get(var_name, "")))
 
-    # Replace all occurrences of ${VAR_NAME} in the value
-    logger.debug(f"VALUE: {value} , type {type(value)}")
-    return VARIABLE_REFERENCE_REGEX.sub(replace_match, str(value))
+def parse_env_file(
+    env_file: Union[str, Path],
+    options: ParseOptions,
+    cache_dir: Union[str, Path, None] = None,
+) -> Dict[str, str]:
+    """Parse `env_file` into resolved environ dictionary.
 
+    When `cache_dir` (or the `RUNENV_CACHE_DIR` environment variable) is set, the result
+    is stored on disk and reused until the file or the options change, see `runenv.cache`.
+    """
+    cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV)
+    if cache_dir:
+        from runenv.cache import cached_parse_env_file
 
-def parse_env_file(env_file: Union[str, Path], options: ParseOptions) -> Dict[str, str]:
+        return cached_parse_env_file(env_file, options, cache_dir)[0]
     return EnvParser(options).parse(env_file).final_environ
 
 
+def parse_env_files(
+    env_files: Sequence[Union[str, Path]], options: ParseOptions, max_workers: int = 1
+) -> Dict[str, str]:
+    """Parse layered `env_files` into a single resolved environ dictionary, see `EnvParser.parse_files`."""
+    return EnvParser(options).parse_files(env_files, max_workers=max_workers).final_environ
+
+
+def _report_failure(parser: EnvParser, error: ValueError) -> None:
+    """Report `error` raised by a parse, e.g. a JSON/TOML decode error, unless it was reported already."""
+    if not parser.message_counts.get("error"):
+        parser._report(getattr(error, "lineno", None) or 1, "error", "%s", error)  # noqa: SLF001
+
+
+def parse_and_lint_env_files(
+    env_files: Sequence[Union[str, Path]], options: ParseOptions, max_workers: int = 1
+) -> Tuple[Dict[str, str], List[ParseMessage]]:
+    """Parse layered `env_files` once and return the resolved environ and the lint messages."""
+    parser = EnvParser(options)
+    try:
+        parser.parse_files(env_files, max_workers=max_workers)
+    except ValueError:
+        return {}, parser.messages
+    return parser.final_environ, parser.messages
+
+
 def lint_env_file(env_file: Union[str, Path], options: ParseOptions) -> List[ParseMessage]:
+    return parse_and_lint_env_file(env_file, options)[1]
+
+
+def parse_and_lint_env_file(
+    env_file: Union[str, Path], options: ParseOptions
+) -> Tuple[Dict[str, str], List[ParseMessage]]:
+    """Parse `env_file` once and return both the resolved environ and the lint messages.
+
+    Unlike `parse_env_file` a structurally invalid file does not raise; the problem is
+    reported as an `error` message and the returned environ is empty.
+    """
     parser = EnvParser(options)
     try:
         parser.parse(env_file)
-    except ValueError:
-        pass
-    return parser.messages
+    except ValueError as e:
+        _report_failure(parser, e)
+        return {}, parser.messages
+    return parser.final_environ, parser.messages
@@ -0,0 +1,205 @@
+# SPDX-FileCopyrightText: 2015-present Marek Wywiał <onjinx@gmail.com>
+#
+# SPDX-License-Identifier: MIT
+"""Resolved environments published in shared memory for many local consumers.
+
+`runenv serve` parses an env file once, writes the resolved variables in the snapshot
+format of `runenv.snapshot` to a `multiprocessing.shared_memory` segment and writes them
+again whenever the file changes. Consumers read them with `load_env(source="shm://NAME")`
+without parsing anything. Segment layout, big-endian:
+
+    magic (8 bytes) | sequence (uint64) | payload length (uint64) | snapshot payload
+
+The sequence works as a seqlock: it is odd while the server writes, and readers retry
+until it is even and unchanged across their copy of the payload. A payload outgrowing the
+segment moves to a new, larger segment under the same name; the old one is left with an
+odd sequence so readers still attached to it retry and attach the new one.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import struct
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set, Union
+
+from runenv.parser import ParseOptions
+from runenv.snapshot import Snapshot, build_snapshot, check_snapshot, dump_snapshot, parse_snapshot
+from runenv.watch import EnvWatcher
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SHM_SCHEME = "shm://"
+SHM_MAGIC = b"RUNENVSH"
+MIN_SEGMENT_SIZE = 64 * 1024
+# reads retried while the server writes the segment, about a second in total, and while
+# it replaces an outgrown one, which is a short window unlike a server which is not running
+READ_ATTEMPTS = 1000
+MISSING_ATTEMPTS = 10
+READ_RETRY_DELAY = 0.001
+
+_HEADER = struct.Struct(">8sQQ")
+_UINT64 = struct.Struct(">Q")
+_SEQUENCE_OFFSET = 8
+_LENGTH_OFFSET = 16
+
+# names of segments created by `EnvPublisher` in this process
+_published: Set[str] = set()
+
+
+def _shared_memory() -> Any:
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        raise ValueError("Shared memory environments need Python 3.8+") from None
+    return shared_memory
+
+
+def shm_name(source: str) -> str:
+    """Return segment name of `shm://NAME` `source`."""
+    if not source.startswith(SHM_SCHEME) or len(source) == len(SHM_SCHEME):
+        raise ValueError(f"Unsupported env source {source!r}, expected {SHM_SCHEME}NAME")
+    return source[len(SHM_SCHEME) :]
+
+
+def _attach(name: str) -> Any:
+    shared_memory = _shared_memory()
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    segment = shared_memory.SharedMemory(name=name)
+    if os.name == "posix" and name not in _published:
+        # before Python 3.13 attaching registers the segment with the resource tracker,
+        # which would unlink it, under the server's feet, when this process exits; the
+        # registration of a segment created here is the publisher's and must stay
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(segment._name, "shared_memory")  # noqa: SLF001
+    return segment
+
+
+def _read_payload(buf: memoryview) -> Optional[bytes]:
+    """Return a consistent copy of the payload in `buf`, or `None` when it is being written."""
+    magic, sequence, length = _HEADER.unpack_from(buf, 0)
+    if magic != SHM_MAGIC or sequence % 2 or not 0 < length <= len(buf) - _HEADER.size:
+        return None
+    payload = bytes(buf[_HEADER.size : _HEADER.size + length])
+    if _UINT64.unpack_from(buf, _SEQUENCE_OFFSET)[0] != sequence:
+        return None
+    return payload
+
+
+def read_shared_snapshot(name: str) -> Snapshot:
+    """Return `Snapshot` published in segment `name`, raising ValueError when there is none."""
+    missing = 0
+    for attempt in range(READ_ATTEMPTS):
+        if attempt:
+            time.sleep(READ_RETRY_DELAY)
+        try:
+            segment = _attach(name)
+        except FileNotFoundError:
+            missing += 1
+            if missing == MISSING_ATTEMPTS:
+                break
+            continue
+        try:
+            payload = _read_payload(segment.buf)
+        finally:
+            segment.close()
+        if payload is not None:
+            return parse_snapshot(payload)
+    raise ValueError(f"No environment published in shared memory {name!r}, is `runenv serve` running?")
+
+
+def load_shared_env(source: str, options: Optional[ParseOptions] = None) -> Dict[str, str]:
+    """Return variables published by `runenv serve` for `shm://NAME` `source`.
+
+    Validated like `load_snapshot`, except the source file is not hashed again: the server
+    publishes its changes itself.
+    """
+    return check_snapshot(read_shared_snapshot(shm_name(source)), source, options, check_source=False)
+
+
+class EnvPublisher:
+    """Publish variables resolved from `env_file` to the shared memory segment `name`.
+
+    The segment is created, and fails with ValueError when it already exists, on
+    construction. Call `poll()` periodically or `serve_forever()` to publish changes of the
+    file, and `close()` to remove the segment.
+    """
+
+    def __init__(
+        self,
+        env_file: Union[str, Path],
+        name: str,
+        options: Optional[ParseOptions] = None,
+        interval: float = 1.0,
+    ) -> None:
+        self.env_file = env_file
+        self.name = name
+        self.options: ParseOptions = options or ParseOptions(diagnostics="none")
+        self.watcher = EnvWatcher(env_file, lambda _diff: self.publish(), options=self.options, interval=interval)
+        self._segment: Any = None
+        self._sequence = 0
+        self.publish()
+
+    def publish(self) -> None:
+        """Write current variables to the segment, replacing it by a larger one when needed."""
+        payload = dump_snapshot(build_snapshot(self.env_file, self.watcher.parser))
+        if self._segment is None or len(payload) > self._segment.size - _HEADER.size:
+            self._replace_segment(len(payload))
+        buf = self._segment.buf
+        self._sequence += 1
+        _UINT64.pack_into(buf, _SEQUENCE_OFFSET, self._sequence)
+        buf[_HEADER.size : _HEADER.size + len(payload)] = payload
+        _UINT64.pack_into(buf, _LENGTH_OFFSET, len(payload))
+        self._sequence += 1
+        _UINT64.pack_into(buf, _SEQUENCE_OFFSET, self._sequence)
+        logger.debug("published %s bytes to shared memory %s", len(payload), self.name)
+
+    def _retire_segment(self) -> None:
+        if self._segment is None:
+            return
+        # left odd, readers still attached retry and attach the segment's successor by name
+        _UINT64.pack_into(self._segment.buf, _SEQUENCE_OFFSET, self._sequence + 1)
+        self._segment.close()
+        self._segment.unlink()
+        self._segment = None
+        _published.discard(self.name)
+
+    def _replace_segment(self, payload_size: int) -> None:
+        self._retire_segment()
+        size = _HEADER.size + max(2 * payload_size, MIN_SEGMENT_SIZE)
+        try:
+            self._segment = _shared_memory().SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            msg = f"Shared memory {self.name!r} already exists, is another `runenv serve` running?"
+            raise ValueError(msg) from None
+        _published.add(self.name)
+        _HEADER.pack_into(self._segment.buf, 0, SHM_MAGIC, self._sequence, 0)
+
+    def poll(self) -> None:
+        """Check the env file once and publish its variables if they changed."""
+        self.watcher.poll()
+
+    def serve_forever(self) -> None:
+        """Poll every `interval` seconds until interrupted, e.g. by KeyboardInterrupt."""
+        while True:
+            time.sleep(self.watcher.interval)
+            self.poll()
+
+    def close(self) -> None:
+        """Remove the segment; consumers fail to load until it is published again."""
+        self._retire_segment()
+
+    def __enter__(self) -> EnvPublisher:  # noqa: PYI034
+        """Return the publisher, its segment is removed on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Remove the segment, see `close`."""
+        self.close()
@@ -0,0 +1,219 @@
+# SPDX-FileCopyrightText: 2015-present Marek Wywiał <onjinx@gmail.com>
+#
+# SPDX-License-Identifier: MIT
+"""Pre-resolved environment snapshots written by `runenv compile`.
+
+A snapshot holds variables after prefix filtering and `${VAR}` substitution, so loading
+it is a single read and a dict build without any format parser. Layout, with strings
+stored as a big-endian `uint32` length followed by UTF-8 bytes (length `0xFFFFFFFF`
+stands for a missing value):
+
+    magic | source path | source sha256 | prefix | strip_prefix (1 byte)
+    | count | count * (external name, value at compile time)
+    | count | count * (key, value)
+
+A snapshot is stale, and refused, when its source file still exists but its content
+changed, or when a variable resolved from `os.environ` has a different value now.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import struct
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from runenv.parser import EnvParser, ParseOptions
+
+SNAPSHOT_MAGIC = b"RUNENV\x00\x01"
+SNAPSHOT_SUFFIX = ".snapshot"
+
+_UINT32 = struct.Struct(">I")
+_MISSING = 0xFFFFFFFF
+
+
+@dataclass
+class Snapshot:
+    source: str
+    source_sha256: str
+    prefix: Optional[str] = None
+    strip_prefix: bool = True
+    external: Dict[str, Optional[str]] = field(default_factory=dict)
+    environ: Dict[str, str] = field(default_factory=dict)
+
+
+def is_snapshot(env_file: Union[str, Path]) -> bool:
+    return str(env_file).endswith(SNAPSHOT_SUFFIX)
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _pack(value: Optional[str]) -> bytes:
+    if value is None:
+        return _UINT32.pack(_MISSING)
+    data = value.encode("utf-8", "surrogateescape")
+    return _UINT32.pack(len(data)) + data
+
+
+def dump_snapshot(snapshot: Snapshot) -> bytes:
+    chunks: List[bytes] = [
+        SNAPSHOT_MAGIC,
+        _pack(snapshot.source),
+        _pack(snapshot.source_sha256),
+        _pack(snapshot.prefix),
+        b"\x01" if snapshot.strip_prefix else b"\x00",
+        _UINT32.pack(len(snapshot.external)),
+    ]
+    for name, value in snapshot.external.items():
+        chunks += [_pack(name), _pack(value)]
+    chunks.append(_UINT32.pack(len(snapshot.environ)))
+    for key, value in snapshot.environ.items():
+        chunks += [_pack(key), _pack(value)]
+    return b"".join(chunks)
+
+
+def _read(view: memoryview, offset: int) -> Tuple[Optional[str], int]:
+    (length,) = _UINT32.unpack_from(view, offset)
+    offset += 4
+    if length == _MISSING:
+        return None, offset
+    end = offset + length
+    if end > len(view):
+        raise ValueError("Truncated runenv snapshot")
+    return str(view[offset:end], "utf-8", "surrogateescape"), end
+
+
+def _read_pairs(data: bytes, offset: int) -> Tuple[Dict[str, Optional[str]], int]:
+    (count,) = _UINT32.unpack_from(data, offset)
+    offset += 4
+    # `_read` inlined twice on bytes, which slice and decode faster than a memoryview;
+    # this loop is most of the work of loading a snapshot
+    unpack_from = _UINT32.unpack_from
+    size = len(data)
+    pairs: Dict[str, Optional[str]] = {}
+    for _ in range(count):
+        (length,) = unpack_from(data, offset)
+        offset += 4
+        key = ""
+        if length != _MISSING:
+            end = offset + length
+            if end > size:
+                raise ValueError("Truncated runenv snapshot")
+            key = data[offset:end].decode("utf-8", "surrogateescape")
+            offset = end
+        (length,) = unpack_from(data, offset)
+        offset += 4
+        value = None
+        if length != _MISSING:
+            end = offset + length
+            if end > size:
+                raise ValueError("Truncated runenv snapshot")
+            value = data[offset:end].decode("utf-8", "surrogateescape")
+            offset = end
+        pairs[key] = value
+    return pairs, offset
+
+
+def parse_snapshot(data: bytes) -> Snapshot:
+    """Decode snapshot `data`; raises ValueError when it is not a valid snapshot."""
+    if not data.startswith(SNAPSHOT_MAGIC):
+        raise ValueError("Not a runenv snapshot or unsupported snapshot version")
+    view = memoryview(data)
+    try:
+        source, offset = _read(view, len(SNAPSHOT_MAGIC))
+        source_sha256, offset = _read(view, offset)
+        prefix, offset = _read(view, offset)
+        strip_prefix = view[offset] == 1
+        external, offset = _read_pairs(data, offset + 1)
+        environ, offset = _read_pairs(data, offset)
+    except (IndexError, struct.error):
+        raise ValueError("Truncated runenv snapshot") from None
+    return Snapshot(
+        source=source or "",
+        source_sha256=source_sha256 or "",
+        prefix=prefix,
+        strip_prefix=strip_prefix,
+        external=external,
+        environ={key: value or "" for key, value in environ.items()},
+    )
+
+
+def read_snapshot(snapshot_file: Union[str, Path]) -> Snapshot:
+    with open(snapshot_file, "rb") as f:
+        return parse_snapshot(f.read())
+
+
+def load_snapshot(
+    snapshot_file: Union[str, Path],
+    options: Optional[ParseOptions] = None,
+    check_source: bool = True,  # noqa: FBT001,FBT002
+) -> Dict[str, str]:
+    """Return variables stored in `snapshot_file`, raising ValueError when it is stale.
+
+    When `options` are given they must match the prefix options the snapshot was compiled
+    with. The source check is skipped when the source file is not present, e.g. when only
+    the snapshot is shipped in a container image.
+    """
+    return check_snapshot(read_snapshot(snapshot_file), str(snapshot_file), options, check_source=check_source)
+
+
+def check_snapshot(
+    snapshot: Snapshot,
+    label: str,
+    options: Optional[ParseOptions] = None,
+    check_source: bool = True,  # noqa: FBT001,FBT002
+) -> Dict[str, str]:
+    """Return variables of `snapshot` loaded from `label`, raising ValueError as `load_snapshot` does."""
+    if (
+        options is not None
+        and options.prefix is not None
+        and (options.prefix, options.strip_prefix) != (snapshot.prefix, snapshot.strip_prefix)
+    ):
+        raise ValueError(
+            f"Snapshot {label} was compiled with prefix={snapshot.prefix!r}, strip_prefix={snapshot.strip_prefix}"
+        )
+    if check_source and Path(snapshot.source).is_file() and file_sha256(snapshot.source) != snapshot.source_sha256:
+        raise ValueError(f"Snapshot {label} is stale, {snapshot.source} changed since it was compiled")
+    for name, value in snapshot.external.items():
+        if os.environ.get(name) != value:
+            raise ValueError(f"Snapshot {label} is stale, ${{{name}}} changed since it was compiled")
+    return snapshot.environ
+
+
+def build_snapshot(env_file: Union[str, Path], parser: EnvParser) -> Snapshot:
+    """Return `Snapshot` of variables resolved by `parser` from `env_file`."""
+    return Snapshot(
+        source=os.path.abspath(env_file),
+        source_sha256=file_sha256(env_file),
+        prefix=parser.options.prefix,
+        strip_prefix=parser.options.strip_prefix,
+        external={name: os.environ.get(name) for name in sorted(parser.external_references)},
+        environ=parser.final_environ,
+    )
+
+
+def compile_snapshot(env_file: Union[str, Path], snapshot_file: Union[str, Path], parser: EnvParser) -> Snapshot:
+    """Write variables resolved by `parser` from `env_file` to `snapshot_file` atomically."""
+    snapshot = build_snapshot(env_file, parser)
+    directory = os.path.dirname(os.path.abspath(snapshot_file))
+    fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=SNAPSHOT_SUFFIX)
+    tmp_file = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dump_snapshot(snapshot))
+        # `mkstemp` creates the file owner only, give it the mode `open()` would
+        umask = os.umask(0)
+        os.umask(umask)
+        tmp_file.chmod(0o666 & ~umask)
+        tmp_file.replace(snapshot_file)
+    except BaseException:
+        tmp_file.unlink()
+        raise
+    return snapshot
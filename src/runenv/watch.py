@@ -0,0 +1,143 @@
+# SPDX-FileCopyrightText: 2015-present Marek Wywiał <onjinx@gmail.com>
+#
+# SPDX-License-Identifier: MIT
+"""Watch an env file and report changes of its resolved variables.
+
+The file is polled with a single `stat()` per interval; it is read again only when its
+`mtime_ns`, size or inode change, and only variables affected by changed raw values are
+resolved again (see `EnvParser.reparse`). Callbacks receive an `EnvDiff` of the resolved
+variables instead of the whole new environ.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, MutableMapping, Optional, Tuple, Union
+
+from runenv.parser import EnvParser, ParseOptions
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EnvDiff:
+    added: Dict[str, str] = field(default_factory=dict)
+    removed: Dict[str, str] = field(default_factory=dict)
+    changed: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        """Return whether any variable was added, removed or changed."""
+        return bool(self.added or self.removed or self.changed)
+
+    def apply(self, environ: MutableMapping[str, str]) -> None:
+        """Apply the diff to `environ`, e.g. `os.environ`."""
+        for key in self.removed:
+            environ.pop(key, None)
+        environ.update(self.added)
+        environ.update({key: new for key, (_, new) in self.changed.items()})
+
+
+def diff_environ(old: Dict[str, str], new: Dict[str, str]) -> EnvDiff:
+    """Return `EnvDiff` turning `old` into `new`; `changed` holds `(old, new)` value pairs."""
+    return EnvDiff(
+        added={key: value for key, value in new.items() if key not in old},
+        removed={key: value for key, value in old.items() if key not in new},
+        changed={key: (old[key], value) for key, value in new.items() if key in old and old[key] != value},
+    )
+
+
+def _fingerprint(env_file: Union[str, Path]) -> Optional[List[int]]:
+    try:
+        st = os.stat(env_file)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+class EnvWatcher:
+    """Poll `env_file` and call `callback` with an `EnvDiff` whenever resolved variables change.
+
+    Call `poll()` from an existing loop, or `start()` a daemon thread polling every
+    `interval` seconds until `stop()`. Files which disappear or fail to parse keep the
+    last good variables.
+    """
+
+    def __init__(
+        self,
+        env_file: Union[str, Path],
+        callback: Callable[[EnvDiff], None],
+        options: Optional[ParseOptions] = None,
+        interval: float = 1.0,
+    ) -> None:
+        self.env_file = env_file
+        self.callback = callback
+        self.options: ParseOptions = options or ParseOptions()
+        self.interval = interval
+        self._fingerprint = _fingerprint(env_file)
+        self.parser = EnvParser(self.options).parse(env_file)
+        self.environ: Dict[str, str] = dict(self.parser.final_environ)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll(self) -> Optional[EnvDiff]:
+        """Check `env_file` once and return the diff passed to `callback`, if any."""
+        fingerprint = _fingerprint(self.env_file)
+        if fingerprint == self._fingerprint:
+            return None
+        if fingerprint is None:
+            logger.warning("env file %s disappeared, keeping previous variables", self.env_file)
+            self._fingerprint = None
+            return None
+        try:
+            affected = self.parser.reparse(self.env_file)
+        except Exception as e:  # noqa: BLE001
+            # any loader error, e.g. `yaml.YAMLError`, is retried on the next poll, the file may
+            # still be in the middle of a write
+            logger.warning("cannot reload env file %s: %s", self.env_file, e)
+            return None
+        self._fingerprint = fingerprint
+        final_environ = self.parser.final_environ
+        diff = diff_environ(
+            {key: self.environ[key] for key in affected if key in self.environ},
+            {key: final_environ[key] for key in affected if key in final_environ},
+        )
+        diff.apply(self.environ)
+        if not diff:
+            return None
+        logger.debug("env file %s changed: %s", self.env_file, diff)
+        self.callback(diff)
+        return diff
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:  # noqa: PERF203
+                logger.exception("env watcher poll of %s failed", self.env_file)
+
+    def start(self) -> EnvWatcher:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="runenv-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> EnvWatcher:  # noqa: PYI034
+        """Start polling in a thread, see `start`."""
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Stop polling, see `stop`."""
+        self.stop()
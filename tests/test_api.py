@@ -1,9 +1,21 @@
 import os
+import sys
 from unittest import mock
 
 import pytest
 
 from runenv import create_env, load_env
+from runenv.api import (
+    EnvIndex,
+    async_create_env,
+    async_create_envs,
+    async_load_env,
+    clear_env_file_cache,
+    create_env_and_lint,
+    create_layered_env,
+    create_layered_env_and_lint,
+    find_env_file,
+)
 
 from . import TESTS_DIR
 
@@ -175,3 +187,280 @@ class TestApi:
         load_env(env_file=env_file, search_parent=2)
         assert "GRAND_PARENT" in os.environ
         assert os.environ.get("GRAND_PARENT") == "3"
+
+    @mock.patch.dict(os.environ, {}, clear=True)
+    def test_create_env_and_lint(self, tmp_path) -> None:
+        env_file = tmp_path / ".env"
+        env_file.write_text("TEST=3\nTEST=2\nDERIVED=${TEST}\n")
+
+        environ, messages = create_env_and_lint(str(env_file))
+        assert environ == {"TEST": "2", "DERIVED": "2"}
+        assert any("last value wins" in m.message for m in messages)
+
+    def test_create_env_and_lint_reports_errors_instead_of_raising(self, tmp_path) -> None:
+        env_file = tmp_path / "test.json"
+        env_file.write_text("[1,2,3]")
+
+        environ, messages = create_env_and_lint(str(env_file))
+        assert environ == {}
+        assert [m.level for m in messages] == ["error"]
+
+
+class TestEnvIndex:
+    CONTENT = (
+        "SVC_A_HOST=a.local\n"
+        "SVC_B_HOST=b.local\n"
+        "SVC_A_URL=http://${HOST}:${SVC_A_PORT}\n"
+        "SVC_A_PORT=1\n"
+        "SVC_A_PORT=2\n"
+        "SVC_AB=ab\n"
+        "SVC_B_URL=${SVC_B_HOST}/${HOME}\n"
+        "OTHER=${SVC_A_HOST}\n"
+    )
+
+    @pytest.mark.parametrize("prefix", [None, "", "SVC_", "SVC_A", "SVC_A_", "SVC_B_", "MISSING_", "OTHER"])
+    @pytest.mark.parametrize("strip_prefix", [True, False])
+    @mock.patch.dict(os.environ, {"HOME": "/home/test", "HOST": "outer"}, clear=True)
+    def test_slice_matches_create_env(self, tmp_path, prefix, strip_prefix) -> None:
+        env_file = tmp_path / ".env"
+        env_file.write_text(self.CONTENT)
+
+        index = EnvIndex.load(str(env_file))
+        assert index.slice(prefix, strip_prefix=strip_prefix) == create_env(
+            str(env_file), prefix=prefix, strip_prefix=strip_prefix
+        )
+
+    def test_keys(self, tmp_path) -> None:
+        env_file = tmp_path / ".env"
+        env_file.write_text(self.CONTENT)
+
+        index = EnvIndex.load(str(env_file))
+        assert index.keys("SVC_A_") == ["SVC_A_HOST", "SVC_A_PORT", "SVC_A_URL"]
+        assert index.keys("NOPE") == []
+
+    @mock.patch.dict(os.environ, {}, clear=True)
+    def test_load_reads_file_once(self, tmp_path) -> None:
+        env_file = tmp_path / ".env"
+        env_file.write_text(self.CONTENT)
+
+        index = EnvIndex.load(str(env_file))
+        env_file.unlink()
+        assert index.slice("SVC_A_") == {"HOST": "a.local", "URL": "http://a.local:", "PORT": "2"}
+
+    def test_load_missing_file(self, tmp_path) -> None:
+        with pytest.raises(ValueError, match="No env file found"):
+            EnvIndex.load(str(tmp_path / "missing.env"))
+
+
+class TestLayeredEnv:
+    @pytest.fixture
+    def layers(self, tmp_path):
+        base = tmp_path / ".env"
+        base.write_text("HOST=base.local\nPORT=80\nURL=http://${HOST}:${PORT}/${DB}\nPORT=8080\n")
+        local = tmp_path / ".env.local.json"
+        local.write_text('{"HOST": "local.host", "DB": "${NAME}"}')
+        prod = tmp_path / ".env.prod.toml"
+        prod.write_text('NAME = "prod"\nPORT = 443\n')
+        return [str(base), str(local), str(prod)]
+
+    @pytest.mark.parametrize("max_workers", [1, 4])
+    @mock.patch.dict(os.environ, {}, clear=True)
+    def test_later_files_override_and_resolve_across_files(self, layers, max_workers) -> None:
+        environ = create_layered_env(layers, max_workers=max_workers)
+        assert environ == {
+            "HOST": "local.host",
+            "PORT": "443",
+            "URL": "http://local.host:443/prod",
+            "DB": "prod",
+            "NAME": "prod",
+        }
+
+    def test_messages_carry_source(self, layers) -> None:
+        environ, messages = create_layered_env_and_lint(layers)
+        assert environ["PORT"] == "443"
+        # overriding a variable from another file is not a duplicate
+        assert [(m.source, m.line_number, m.level) for m in messages] == [(layers[0], 4, "warning")]
+
+    @mock.patch.dict(os.environ, {}, clear=True)
+    def test_prefix(self, tmp_path) -> None:
+        (tmp_path / "a.env").write_text("APP_A=1\nAPP_B=${C}\nOTHER=x\n")
+        (tmp_path / "b.env").write_text("APP_C=3\n")
+        environ = create_layered_env([str(tmp_path / "a.env"), str(tmp_path / "b.env")], prefix="APP_")
+        assert environ == {"A": "1", "B": "3", "C": "3"}
+
+    def test_circular_reference_across_files(self, tmp_path) -> None:
+        (tmp_path / "a.env").write_text("A=${B}\n")
+        (tmp_path / "b.env").write_text("B=${A}\n")
+        _, messages = create_layered_env_and_lint([str(tmp_path / "a.env"), str(tmp_path / "b.env")])
+        assert [m.message for m in messages] == ["circular reference: A -> B -> A"]
+
+    def test_invalid_file_reported_with_source(self, tmp_path) -> None:
+        (tmp_path / "a.env").write_text("A=1\n")
+        (tmp_path / "b.json").write_text("[1]")
+        files = [str(tmp_path / "a.env"), str(tmp_path / "b.json")]
+
+        with pytest.raises(ValueError):
+            create_layered_env(files, max_workers=2)
+        environ, messages = create_layered_env_and_lint(files)
+        assert environ == {}
+        assert [(m.source, m.level) for m in messages] == [(files[1], "error")]
+
+    def test_undecodable_file_reported_with_source(self, tmp_path) -> None:
+        (tmp_path / "a.env").write_text("A=1\n")
+        (tmp_path / "b.json").write_text('{"B": "1",')
+        files = [str(tmp_path / "a.env"), str(tmp_path / "b.json")]
+
+        environ, messages = create_layered_env_and_lint(files)
+        assert environ == {}
+        assert [(m.source, m.level) for m in messages] == [(files[1], "error")]
+
+    def test_missing_file(self, tmp_path) -> None:
+        (tmp_path / ".env").write_text("A=1\n")
+        files = [str(tmp_path / ".env"), str(tmp_path / ".env.local")]
+
+        with pytest.raises(ValueError, match="No env file found"):
+            create_layered_env(files)
+        assert create_layered_env(files, ignore_missing=True) == {"A": "1"}
+
+
+class TestFindEnvFile:
+    @pytest.fixture
+    def tree(self, tmp_path):
+        deepest = tmp_path / "a" / "b" / "c" / "d" / "e"
+        deepest.mkdir(parents=True)
+        (tmp_path / ".env.toml").write_text("A = 1\n")
+        (tmp_path / ".env.yaml").write_text("A: 1\n")
+        (tmp_path / "a" / ".env").mkdir()  # directories named like env files are skipped
+        return tmp_path, deepest
+
+    @pytest.fixture
+    def syscalls(self, monkeypatch):
+        calls = {"scandir": 0, "stat": 0}
+        original_scandir = os.scandir
+        original_stat = os.stat
+
+        def scandir(*args, **kwargs):
+            calls["scandir"] += 1
+            return original_scandir(*args, **kwargs)
+
+        def counting_stat(*args, **kwargs):
+            calls["stat"] += 1
+            return original_stat(*args, **kwargs)
+
+        monkeypatch.setattr(os, "scandir", scandir)
+        monkeypatch.setattr(os, "stat", counting_stat)
+        yield calls
+        clear_env_file_cache()
+
+    def test_one_listing_per_directory(self, tree, syscalls) -> None:
+        root, deepest = tree
+        assert find_env_file(deepest, search_parent=5) == root / ".env.toml"
+        assert syscalls == {"scandir": 6, "stat": 0}
+
+    def test_search_is_bounded(self, tree, syscalls) -> None:
+        _, deepest = tree
+        assert find_env_file(deepest, search_parent=4) is None
+        assert syscalls["scandir"] == 5
+
+    def test_explicit_filename_costs_one_stat_per_directory(self, tree, syscalls) -> None:
+        root, deepest = tree
+        assert find_env_file(deepest, search_parent=5, filename=".env.yaml") == root / ".env.yaml"
+        assert syscalls == {"scandir": 0, "stat": 6}
+
+    def test_cache(self, tree, syscalls) -> None:
+        root, deepest = tree
+        for _ in range(3):
+            assert find_env_file(deepest, search_parent=5, cache=True) == root / ".env.toml"
+            assert find_env_file(deepest, search_parent=0, cache=True) is None
+        assert syscalls["scandir"] == 7
+
+        (deepest / ".env").write_text("A=1\n")
+        assert find_env_file(deepest, search_parent=0, cache=True) is None
+        clear_env_file_cache()
+        assert find_env_file(deepest, search_parent=0, cache=True) == deepest / ".env"
+
+    def test_missing_directory(self, tmp_path) -> None:
+        assert find_env_file(tmp_path / "missing", search_parent=0) is None
+
+
+class TestAsyncApi:
+    @staticmethod
+    def run(coroutine):
+        import asyncio
+
+        return asyncio.run(coroutine)
+
+    @mock.patch.dict(os.environ, {"OUTER": "outer"}, clear=True)
+    def test_async_create_env_matches_create_env(self, tmp_path) -> None:
+        env_file = tmp_path / ".env"
+        env_file.write_text("APP_A=${OUTER}\nAPP_B=${A}-b\nOTHER=1\n")
+
+        result = self.run(async_create_env(str(env_file), prefix="APP_"))
+        assert result == create_env(str(env_file), prefix="APP_") == {"A": "outer", "B": "outer-b"}
+
+    def test_parsing_runs_off_the_event_loop_thread(self, tmp_path, monkeypatch) -> None:
+        import threading
+
+        from runenv.parser import EnvParser
+
+        env_file = tmp_path / ".env"
+        env_file.write_text("A=1\n")
+        threads = []
+        original_parse = EnvParser.parse
+
+        def parse(self, *args):
+            threads.append(threading.get_ident())
+            return original_parse(self, *args)
+
+        monkeypatch.setattr(EnvParser, "parse", parse)
+        assert self.run(async_create_env(str(env_file))) == {"A": "1"}
+        assert threads and threading.get_ident() not in threads
+
+    def test_async_create_envs_keeps_order(self, tmp_path) -> None:
+        for name in ("a", "b", "c"):
+            (tmp_path / f"{name}.env").write_text(f"NAME={name}\n")
+        files = [str(tmp_path / f"{name}.env") for name in ("c", "a", "b")]
+
+        assert self.run(async_create_envs(files)) == [{"NAME": "c"}, {"NAME": "a"}, {"NAME": "b"}]
+
+        missing = self.run(async_create_envs([files[0], str(tmp_path / "missing.env")], return_exceptions=True))
+        assert missing[0] == {"NAME": "c"}
+        assert isinstance(missing[1], ValueError)
+
+    @mock.patch.dict(os.environ, {}, clear=True)
+    def test_async_load_env(self, tmp_path) -> None:
+        env_file = tmp_path / ".env"
+        env_file.write_text("ASYNC_LOADED=1\n")
+
+        self.run(async_load_env(str(tmp_path / "missing.env")))
+        with pytest.raises(ValueError, match="No env file found"):
+            self.run(async_load_env(str(tmp_path / "missing.env"), require_env_file=True))
+
+        self.run(async_load_env(str(env_file)))
+        assert os.environ["ASYNC_LOADED"] == "1"
+
+        env_file.write_text("ASYNC_LOADED=2\n")
+        os.environ["_RUNENV_WRAPPED"] = "1"
+        self.run(async_load_env(str(env_file)))
+        assert os.environ["ASYNC_LOADED"] == "1"
+        self.run(async_load_env(str(env_file), force=True))
+        assert os.environ["ASYNC_LOADED"] == "2"
+
+    def test_large_yaml_is_parsed_in_process_pool(self, tmp_path, monkeypatch) -> None:
+        pytest.importorskip("yaml")
+        from runenv import api
+
+        env_file = tmp_path / ".env.yaml"
+        env_file.write_text("URL: http://${HOST}\n")
+        monkeypatch.setattr(api, "ASYNC_PROCESS_MIN_BYTES", 0)
+        monkeypatch.setenv("PYTHONPATH", os.pathsep.join(sys.path))
+        try:
+            for host in ("first", "second"):
+                # the pool is already running for the second value, it must come with the call
+                monkeypatch.setenv("HOST", host)
+                assert self.run(async_create_env(str(env_file))) == {"URL": f"http://{host}"}
+            assert api._process_pool is not None
+        finally:
+            if api._process_pool is not None:
+                api._process_pool.shutdown()
+                api._process_pool = None
@@ -0,0 +1,151 @@
+"""Performance regression checks.
+
+Timing budgets are deliberately generous so they only catch order-of-magnitude
+regressions. The startup budget is relative to the imports of a bare interpreter on the
+same machine; set `RUNENV_STARTUP_BUDGET_RATIO` to tighten it locally.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.benchmark
+
+# `import runenv.cli` takes about 6x the imports of `python -c pass`
+STARTUP_BUDGET_RATIO = float(os.environ.get("RUNENV_STARTUP_BUDGET_RATIO", "10"))
+
+
+def _import_lines(code: str) -> list:
+    """Return `(cumulative_us, name)` of `-X importtime` lines, nested imports indented in `name`."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    lines = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            lines.append((int(cumulative), name[1:]))
+    return lines
+
+
+def _import_times(module: str) -> dict:
+    return {name.strip(): cumulative for cumulative, name in _import_lines(f"import {module}")}
+
+
+def test_cli_import_skips_modules_not_needed_for_run() -> None:
+    times = _import_times("runenv.cli")
+    assert "runenv.cli" in times
+    for module in ("json", "subprocess", "shutil", "runenv.legacy", "runenv.cache", "yaml", "tomllib", "tomli"):
+        assert module not in times, f"{module} imported at runenv.cli startup"
+
+
+def test_cli_import_time_within_budget() -> None:
+    # best of a few runs, single imports are noisy
+    bare = min(
+        sum(cumulative for cumulative, name in _import_lines("pass") if not name.startswith(" ")) for _ in range(3)
+    )
+    cli = min(_import_times("runenv.cli")["runenv.cli"] for _ in range(3))
+    assert cli < bare * STARTUP_BUDGET_RATIO, f"runenv.cli imports in {cli / 1000:.1f}ms, bare startup {bare / 1000:.1f}ms"
+
+
+def _best_of(func, repeat: int = 3) -> float:
+    import time
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _assert_linear(timings: dict) -> None:
+    # 100x more keys must cost well under the 10_000x a quadratic algorithm would
+    small, large = min(timings), max(timings)
+    ratio = timings[large] / max(timings[small], 1e-9)
+    assert ratio < (large / small) * 10, timings
+
+
+@pytest.mark.parametrize("fmt", ["json", "toml"])
+def test_structured_line_numbers_scale_linearly(fmt: str) -> None:
+    from runenv.parser import _json_line_numbers, _toml_line_numbers
+
+    timings = {}
+    for size in (100, 1_000, 10_000, 100_000):
+        keys = [f"KEY_{i}" for i in range(size)]
+        if fmt == "json":
+            content = "{\n" + ",\n".join(f'  "{key}": "value"' for key in keys) + "\n}"
+            timings[size] = _best_of(lambda content=content, keys=keys: _json_line_numbers(content, keys))
+        else:
+            content = "\n".join(f'{key} = "value"' for key in keys)
+            timings[size] = _best_of(lambda content=content, keys=keys: _toml_line_numbers(content, keys))
+    del timings[100]  # too short to time reliably, kept to exercise the small case
+    _assert_linear(timings)
+
+
+def test_interpolation_heavy_file_parses_within_budget(tmp_path) -> None:
+    from runenv.parser import ParseOptions, parse_env_file
+
+    size = 20_000
+    env_file = tmp_path / ".env"
+    lines = ["HOST=localhost", "PORT=8080"]
+    lines += [f"URL_{i}=http://${{HOST}}:${{PORT}}/path_{i}?shell=${{RUNENV_BENCH_UNSET}}" for i in range(size)]
+    env_file.write_text("\n".join(lines) + "\n")
+
+    elapsed = _best_of(lambda: parse_env_file(env_file, ParseOptions()), repeat=2)
+    result = parse_env_file(env_file, ParseOptions())
+    assert result["URL_1"] == "http://localhost:8080/path_1?shell="
+    assert elapsed < 2.0, f"{size} interpolated values parsed in {elapsed:.3f}s"
+
+
+def test_env_file_lexer_throughput(tmp_path) -> None:
+    from runenv.parser import EnvParser, ParseOptions
+
+    certificate = "-----BEGIN CERTIFICATE-----" + "MIIDdzCCAl+gAwIBAgIE" * 200 + "-----END CERTIFICATE-----"
+    env_file = tmp_path / ".env"
+    with open(env_file, "w") as f:
+        for i in range(1_000):
+            f.write(f'CERT_{i}="{certificate}"  # quoted certificate\n')
+            f.write(f"PLAIN_{i}=   {'unquoted value ' * 50}   # trailing comment\n")
+    size_mb = env_file.stat().st_size / 1_000_000
+
+    elapsed = _best_of(lambda: sum(1 for _ in EnvParser(ParseOptions()).load_env_file(env_file)))
+    throughput = size_mb / elapsed
+    assert throughput > 5, f"env lexer throughput {throughput:.1f} MB/s"
+
+
+def test_benchmark_runner_emits_comparable_json(tmp_path) -> None:
+    import json
+
+    from . import PROJECT_DIR
+
+    runner = os.path.join(PROJECT_DIR, "benchmarks", "run.py")
+    baseline = tmp_path / "baseline.json"
+    subprocess.run(
+        [sys.executable, runner, "--sizes", "10", "--repeat", "1", "--only", "parse/env", "-o", str(baseline)],
+        capture_output=True,
+        check=True,
+    )
+    results = json.loads(baseline.read_text())
+    assert set(results["results"]) == {"parse/env/10"}
+    assert results["results"]["parse/env/10"]["keys"] == 10
+    assert results["meta"]["python"]
+
+    compared = subprocess.run(
+        [sys.executable, runner, "--sizes", "10", "--repeat", "1", "--only", "parse/env", "-o", str(tmp_path / "new.json")]
+        + ["--compare", str(baseline), "--threshold", "1000"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert compared.stdout.startswith("parse/env/10")
+    assert compared.stdout.rstrip().endswith("x")
@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+
+import pytest
+
+from runenv.cache import cache_file_path, cached_parse_env_file
+from runenv.parser import EnvParser, ParseOptions, parse_env_file
+
+
+def _age(path, seconds: float = 60) -> None:
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+@pytest.fixture
+def count_parses(monkeypatch: pytest.MonkeyPatch):
+    calls = []
+    original_parse = EnvParser.parse
+
+    def _counting_parse(self, path):
+        calls.append(path)
+        return original_parse(self, path)
+
+    monkeypatch.setattr(EnvParser, "parse", _counting_parse)
+    return calls
+
+
+class TestCache:
+    def test_second_parse_is_served_from_cache(self, tmp_path, count_parses):
+        env_file = tmp_path / ".env"
+        env_file.write_text("FOO=bar\nFOO=baz\n")
+        _age(env_file)
+
+        first = cached_parse_env_file(env_file, ParseOptions(), tmp_path / "cache")
+        second = cached_parse_env_file(env_file, ParseOptions(), tmp_path / "cache")
+
+        assert len(count_parses) == 1
+        assert first == second
+        assert second[0] == {"FOO": "baz"}
+        assert any("last value wins" in m.message for m in second[1])
+
+    def test_changed_file_invalidates_cache(self, tmp_path, count_parses):
+        env_file = tmp_path / ".env"
+        env_file.write_text("FOO=bar\n")
+        _age(env_file, 120)
+        cached_parse_env_file(env_file, ParseOptions(), tmp_path / "cache")
+
+        env_file.write_text("FOO=changed\n")
+        _age(env_file, 60)
+        environ, _ = cached_parse_env_file(env_file, ParseOptions(), tmp_path / "cache")
+
+        assert len(count_parses) == 2
+        assert environ == {"FOO": "changed"}
+
+    def test_options_are_part_of_cache_key(self, tmp_path):
+        env_file = tmp_path / ".env"
+        assert cache_file_path(tmp_path, env_file, ParseOptions()) != cache_file_path(
+            tmp_path, env_file, ParseOptions(prefix="APP_")
+        )
+
+    def test_changed_external_variable_invalidates_cache(self, tmp_path, monkeypatch, count_parses):
+        monkeypatch.setenv("RUNENV_CACHE_EXTERNAL", "one")
+        env_file = tmp_path / ".env"
+        env_file.write_text("FOO=${RUNENV_CACHE_EXTERNAL}\n")
+        _age(env_file)
+        cached_parse_env_file(env_file, ParseOptions(), tmp_path / "cache")
+
+        monkeypatch.setenv("RUNENV_CACHE_EXTERNAL", "two")
+        environ, _ = cached_parse_env_file(env_file, ParseOptions(), tmp_path / "cache")
+
+        assert len(count_parses) == 2
+        assert environ == {"FOO": "two"}
+
+    def test_recently_modified_file_is_not_cached(self, tmp_path, count_parses):
+        env_file = tmp_path / ".env"
+        env_file.write_text("FOO=bar\n")
+
+        cached_parse_env_file(env_file, ParseOptions(), tmp_path / "cache")
+        cached_parse_env_file(env_file, ParseOptions(), tmp_path / "cache")
+
+        assert len(count_parses) == 2
+
+    def test_corrupted_cache_entry_is_ignored(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text("FOO=bar\n")
+        cache_file = cache_file_path(tmp_path / "cache", env_file, ParseOptions())
+        cache_file.parent.mkdir()
+        cache_file.write_text("{not json")
+
+        environ, _ = cached_parse_env_file(env_file, ParseOptions(), tmp_path / "cache")
+        assert environ == {"FOO": "bar"}
+
+    def test_parse_env_file_uses_cache_dir_from_environment(self, tmp_path, monkeypatch, count_parses):
+        monkeypatch.setenv("RUNENV_CACHE_DIR", str(tmp_path / "cache"))
+        env_file = tmp_path / ".env"
+        env_file.write_text("FOO=bar\n")
+        _age(env_file)
+
+        assert parse_env_file(env_file, ParseOptions()) == {"FOO": "bar"}
+        assert parse_env_file(env_file, ParseOptions()) == {"FOO": "bar"}
+        assert len(count_parses) == 1
+
+    def test_cache_hit_does_not_import_yaml(self, tmp_path):
+        pytest.importorskip("yaml")
+        import subprocess
+
+        env_file = tmp_path / "env.yaml"
+        env_file.write_text("FOO: bar\n")
+        _age(env_file)
+        code = (
+            "import sys; from runenv.parser import ParseOptions, parse_env_file; "
+            f"env = parse_env_file({str(env_file)!r}, ParseOptions(), cache_dir={str(tmp_path / 'cache')!r}); "
+            "print(env['FOO'], 'yaml' in sys.modules)"
+        )
+        run_env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+        outputs = [
+            subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=run_env, check=True).stdout
+            for _ in range(2)
+        ]
+        assert outputs == ["bar True\n", "bar False\n"]
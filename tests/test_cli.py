@@ -1,6 +1,8 @@
 import json
 import os
 import sys
+import threading
+import time
 from textwrap import dedent
 
 import pytest
@@ -214,6 +216,7 @@ def test_lint_as_json_outputs_valid_json(
     assert isinstance(data, list)
     assert len(data) >= 1
     assert all("level" in item and "message" in item and "line_number" in item for item in data)
+    assert all(set(item) == {"line_number", "level", "message"} for item in data)
 
 
 def test_lint_none_level_fail_on_error_suppresses_output_but_exits_nonzero(
@@ -286,3 +289,224 @@ def test_value_error_from_api_caught_at_cli_boundary(
     assert exc_info.value.code == 1
     out = capsys.readouterr().out
     assert "No env file found" in out
+
+
+@pytest.mark.parametrize("subcommand", ["run", "list"])
+def test_lint_flags_parse_env_file_once(
+    subcommand: str,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    from runenv.parser import EnvParser
+
+    env_file = tmp_path / ".env"
+    env_file.write_text("TEST=3\nTEST=2\n")
+    monkeypatch.chdir(tmp_path)
+
+    calls = []
+    original_parse = EnvParser.parse
+
+    def _counting_parse(self, path):
+        calls.append(path)
+        return original_parse(self, path)
+
+    monkeypatch.setattr(EnvParser, "parse", _counting_parse)
+    argv = [subcommand, "--lint-level", "warning", "--fail-on", "error"]
+    ret = run([*argv, sys.executable, "-c", ""] if subcommand == "run" else argv)
+    assert ret == 0
+    assert len(calls) == 1
+
+
+def test_run_lint_level_on_invalid_file_still_fails(
+    capsys: pytest.CaptureFixture[str],
+    tmp_path,
+) -> None:
+    env_file = tmp_path / "test.json"
+    env_file.write_text("[1,2,3]")
+    with pytest.raises(SystemExit) as exc_info:
+        run(["run", "--env-file", str(env_file), "--lint-level", "error", sys.executable, "-c", ""])
+    assert exc_info.value.code == 1
+    captured = capsys.readouterr()
+    assert "[error]" in captured.err
+    assert "mapping" in captured.out
+
+
+def test_lint_flags_on_undecodable_file_fail(tmp_path) -> None:
+    env_file = tmp_path / "test.json"
+    env_file.write_text('{"A": "1",')
+    with pytest.raises(SystemExit) as exc_info:
+        run(["run", "--env-file", str(env_file), "--lint-level", "warning", sys.executable, "-c", ""])
+    assert exc_info.value.code == 1
+    assert run(["list", "--env-file", str(env_file), "--fail-on", "error"]) == 1
+
+
+def test_run_exec_replaces_process_with_resolved_env(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    env_file = tmp_path / ".env"
+    env_file.write_text("EXEC_VAR=exec-value\n")
+    monkeypatch.chdir(tmp_path)
+
+    calls = []
+
+    def _execve(path, args, env):
+        calls.append((path, args, dict(env)))
+        raise SystemExit(0)
+
+    monkeypatch.setattr(os, "execve", _execve)
+    with pytest.raises(SystemExit):
+        run(["run", "--exec", "--", sys.executable, "-c", "pass"])
+
+    assert len(calls) == 1
+    path, args, env = calls[0]
+    assert path == sys.executable
+    assert args == [sys.executable, "-c", "pass"]
+    assert env["EXEC_VAR"] == "exec-value"
+    assert env["_RUNENV_WRAPPED"] == "1"
+
+
+def test_run_reload_restarts_command_when_resolved_env_changes(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    env_file = tmp_path / ".env"
+    env_file.write_text("BASE=1\nRELOAD_VAR=${BASE}\n")
+    started = tmp_path / "started"
+    monkeypatch.chdir(tmp_path)
+    # the child records every start and exits on its own once it sees the second value
+    script = (
+        "import os, sys, time\n"
+        f"open({str(started)!r}, 'a').write(os.environ['RELOAD_VAR'] + '\\n')\n"
+        "sys.exit(7) if os.environ['RELOAD_VAR'] == '2' else time.sleep(30)\n"
+    )
+
+    def rewrite(content: str, tick: int) -> None:
+        env_file.write_text(content)
+        st = os.stat(env_file)
+        os.utime(env_file, ns=(st.st_atime_ns, st.st_mtime_ns + tick * 1_000_000_000))
+
+    def edit_env_file() -> None:
+        deadline = time.monotonic() + 10
+        while not started.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # same resolved values, must not restart
+        rewrite("# comment\nBASE=1\n\nRELOAD_VAR=${BASE}   # same\n", tick=1)
+        time.sleep(0.3)
+        rewrite("BASE=2\nRELOAD_VAR=${BASE}\n", tick=2)
+
+    editor = threading.Thread(target=edit_env_file)
+    editor.start()
+    try:
+        ret = run(
+            ["run", "--reload", "--reload-interval", "0.02", "--reload-grace", "5", "--", sys.executable, "-c", script]
+        )
+    finally:
+        editor.join()
+
+    assert ret == 7
+    assert started.read_text().split() == ["1", "2"]
+
+
+def test_run_reload_parses_env_file_once_at_startup(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    from runenv.parser import EnvParser
+
+    (tmp_path / ".env").write_text("TEST=3\nTEST=2\n")
+    monkeypatch.chdir(tmp_path)
+
+    calls = []
+    original_parse = EnvParser.parse
+
+    def _counting_parse(self, path):
+        calls.append(path)
+        return original_parse(self, path)
+
+    monkeypatch.setattr(EnvParser, "parse", _counting_parse)
+    script = "import os, sys; sys.exit(0 if os.environ['TEST'] == '2' else 1)"
+    ret = run(["run", "--reload", "--lint-level", "warning", "--fail-on", "error", "--", sys.executable, "-c", script])
+    assert ret == 0
+    assert len(calls) == 1
+
+
+def test_run_reload_stops_command_when_supervisor_fails(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    from runenv.watch import EnvWatcher
+
+    (tmp_path / ".env").write_text("A=1\n")
+    pid_file = tmp_path / "pid"
+    monkeypatch.chdir(tmp_path)
+    script = f"import os, time; open({str(pid_file)!r}, 'w').write(str(os.getpid())); time.sleep(30)"
+
+    def interrupt(self):
+        if pid_file.exists() and pid_file.read_text():
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(EnvWatcher, "poll", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        run(["run", "--reload", "--reload-interval", "0.02", "--", sys.executable, "-c", script])
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+
+@pytest.mark.parametrize(
+    ("argv", "error"),
+    [
+        (["--reload", "--exec"], "--reload cannot be used with --exec"),
+        (["--reload", "--reload-signal", "NOPE"], "Unknown signal `NOPE`"),
+    ],
+)
+def test_run_reload_invalid_options(
+    monkeypatch: pytest.MonkeyPatch, tmp_path, capsys: pytest.CaptureFixture, argv: list, error: str
+) -> None:
+    (tmp_path / ".env").write_text("A=1\n")
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(SystemExit) as exc_info:
+        run(["run", *argv, "--", sys.executable, "-c", ""])
+    assert exc_info.value.code == 2
+    assert error in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(("name", "expected"), [("TERM", 15), ("SIGHUP", 1), ("int", 2), ("9", 9)])
+def test_signal_number(name: str, expected: int) -> None:
+    from runenv.cli import signal_number
+
+    assert signal_number(name) == expected
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--", "x"],
+        ["-p", "A", ".env", "cmd"],
+        ["--pre", "A", ".env"],
+        ["-pA", ".env"],
+        ["--prefix=A", ".env"],
+        ["-s", ".env", "cmd", "-x"],
+        ["--foo", ".env"],
+        ["run", "--env-file", "x"],
+        ["-v", "2", "x"],
+        ["-sv", "2", "x"],
+        ["--search-parent", "1", "--dry-run", ".env", "cmd"],
+        ["--exec", ".env", "cmd"],
+        ["-s"],
+        [],
+    ],
+)
+def test_legacy_detection_matches_legacy_parser(argv: list) -> None:
+    from runenv.cli import LEGACY_FLAG_OPTIONS, LEGACY_VALUE_OPTIONS, _first_positional
+    from runenv.legacy import run_legacy_parser
+
+    _, l_argv = run_legacy_parser(argv, only_params=True)
+    expected = l_argv[0] if l_argv else None
+    assert _first_positional(argv, LEGACY_FLAG_OPTIONS, LEGACY_VALUE_OPTIONS) == expected
+
+
+def test_legacy_usage_still_detected(capsys: pytest.CaptureFixture[str]) -> None:
+    with pytest.raises(SystemExit):
+        run(["--dry-run", TEST_FILE, "true"])
+    assert "[legacy] Dry run mode" in capsys.readouterr().out
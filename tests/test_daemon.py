@@ -0,0 +1,193 @@
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from runenv.cli import run
+from runenv.daemon import DaemonClient, LaunchDaemon
+from runenv.parser import EnvParser
+
+pytestmark = pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="Unix sockets needed")
+
+SRC_DIR = str(Path(__file__).resolve().parent.parent / "src")
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are limited to about 100 characters, pytest's tmp_path may be longer
+    directory = tempfile.mkdtemp(prefix="runenv-")
+    yield os.path.join(directory, "daemon.sock")
+    shutil.rmtree(directory)
+
+
+@pytest.fixture
+def daemon(socket_path):
+    daemon = LaunchDaemon(socket_path)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    yield daemon
+    daemon.shutdown()
+    thread.join()
+    daemon.close()
+
+
+@pytest.fixture
+def env_file(tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text("HOST=db\nURL=pg://${HOST}/${DB_USER}\n")
+    return env_file
+
+
+def _run(socket_path, tmp_path, script, **kwargs):
+    """Run python `script` through the daemon and return its exit code and stdout."""
+    with open(tmp_path / "stdout", "w+") as stdout:
+        kwargs.setdefault("cwd", str(tmp_path))
+        returncode = DaemonClient(socket_path).run(
+            [sys.executable, "-c", script], stdio=(0, stdout.fileno(), 2), **kwargs
+        )
+        stdout.seek(0)
+        return returncode, stdout.read()
+
+
+def _touch(env_file, content):
+    env_file.write_text(content)
+    st = os.stat(env_file)
+    os.utime(env_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_run_command_with_env(daemon, env_file, tmp_path) -> None:
+    script = "import os, sys; print(os.environ['URL'], os.environ['_RUNENV_WRAPPED']); sys.exit(3)"
+    returncode, stdout = _run(daemon.socket_path, tmp_path, script, environ={"DB_USER": "app"})
+    assert returncode == 3
+    assert stdout == "pg://db/app 1\n"
+
+
+def test_profile_is_parsed_once_and_reloaded_on_change(daemon, env_file, tmp_path) -> None:
+    script = "import os; print(os.environ['HOST'])"
+    assert _run(daemon.socket_path, tmp_path, script) == (0, "db\n")
+    with mock.patch.object(EnvParser, "parse", side_effect=AssertionError("parsed")):
+        assert _run(daemon.socket_path, tmp_path, script) == (0, "db\n")
+        _touch(env_file, "HOST=cache\n")
+        assert _run(daemon.socket_path, tmp_path, script) == (0, "cache\n")
+
+
+def test_external_references_use_client_environ(daemon, env_file, tmp_path) -> None:
+    script = "import os; print(os.environ['URL'])"
+    assert _run(daemon.socket_path, tmp_path, script, environ={"DB_USER": "a"}) == (0, "pg://db/a\n")
+    assert _run(daemon.socket_path, tmp_path, script, environ={"DB_USER": "b"}) == (0, "pg://db/b\n")
+    assert _run(daemon.socket_path, tmp_path, script, environ={}) == (0, "pg://db/\n")
+
+
+def test_prefix_and_env_file_options(daemon, tmp_path) -> None:
+    (tmp_path / ".env.dev").write_text("APP_NAME=x\nOTHER=y\n")
+    script = "import os; print(os.environ.get('NAME'), os.environ.get('OTHER'))"
+    result = _run(daemon.socket_path, tmp_path, script, env_file=".env.dev", prefix="APP_", strip_prefix=True, environ={})
+    assert result == (0, "x None\n")
+
+
+@pytest.mark.parametrize(
+    ("kwargs", "message"),
+    [
+        ({"env_file": ".env.missing"}, "Environment file `.env.missing` does not exist"),
+        ({"command": ["runenv-no-such-command"]}, "File `runenv-no-such-command` does not exist"),
+    ],
+)
+def test_errors(daemon, env_file, tmp_path, kwargs, message) -> None:
+    command = kwargs.pop("command", ["true"])
+    with pytest.raises(ValueError, match=message):
+        DaemonClient(daemon.socket_path).run(command, cwd=str(tmp_path), **kwargs)
+
+
+def test_socket_is_owner_only(daemon) -> None:
+    assert os.stat(daemon.socket_path).st_mode & 0o777 == 0o600
+
+
+@pytest.mark.skipif(not hasattr(socket, "SO_PEERCRED"), reason="SO_PEERCRED needed")
+def test_other_users_are_refused(daemon, env_file, tmp_path) -> None:
+    with mock.patch("os.getuid", return_value=os.getuid() + 1):
+        with pytest.raises(ValueError, match="only runs commands of uid"):
+            DaemonClient(daemon.socket_path).run(["true"], cwd=str(tmp_path))
+
+
+def test_client_without_daemon(socket_path) -> None:
+    with pytest.raises(ValueError, match="Cannot connect to runenv daemon"):
+        DaemonClient(socket_path).run(["true"])
+
+
+def test_second_daemon_is_refused_and_stale_socket_replaced(daemon, socket_path) -> None:
+    with pytest.raises(ValueError, match="Another runenv daemon"):
+        LaunchDaemon(socket_path)
+    stale = socket_path + ".stale"
+    LaunchDaemon(stale)._server.server_close()
+    assert os.path.exists(stale)
+    LaunchDaemon(stale).close()
+    assert not os.path.exists(stale)
+
+
+def _client(socket_path, tmp_path, script):
+    cmd = [sys.executable, "-m", "runenv.daemon", "--socket", socket_path, "--", sys.executable, "-c", script]
+    return subprocess.Popen(cmd, cwd=tmp_path, env={**os.environ, "PYTHONPATH": SRC_DIR})
+
+
+def _wait_for(path, deadline):
+    while not path.exists() or not path.read_text():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    return int(path.read_text())
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # a zombie still accepts signals, ask the kernel about its state
+    stat = Path(f"/proc/{pid}/stat")
+    return not stat.exists() or stat.read_text().split(") ")[-1][0] != "Z"
+
+
+SLEEPER = "import os, time; open('pid', 'w').write(str(os.getpid())); time.sleep(60)"
+
+
+def test_signals_are_forwarded(daemon, env_file, tmp_path) -> None:
+    client = _client(daemon.socket_path, tmp_path, SLEEPER)
+    deadline = time.monotonic() + 20
+    child = _wait_for(tmp_path / "pid", deadline)
+    client.send_signal(signal.SIGTERM)
+    assert client.wait(timeout=20) != 0
+    assert not _alive(child)
+
+
+def test_command_is_terminated_when_client_disconnects(daemon, env_file, tmp_path) -> None:
+    client = _client(daemon.socket_path, tmp_path, SLEEPER)
+    deadline = time.monotonic() + 20
+    child = _wait_for(tmp_path / "pid", deadline)
+    client.kill()
+    client.wait()
+    while _alive(child):
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+class TestRunCommand:
+    def test_run_with_daemon(self, daemon, env_file, tmp_path, monkeypatch, capfd) -> None:
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("DB_USER", "cli")
+        script = "import os; print(os.environ['URL'])"
+        assert run(["run", "--daemon", daemon.socket_path, "--", sys.executable, "-c", script]) == 0
+        assert capfd.readouterr().out == "pg://db/cli\n"
+
+    @pytest.mark.parametrize("option", [["--exec"], ["--reload"], ["--fail-on", "error"]])
+    def test_incompatible_options(self, socket_path, option) -> None:
+        with pytest.raises(SystemExit) as exc_info:
+            run(["run", "--daemon", socket_path, *option, "--", "true"])
+        assert exc_info.value.code == 2
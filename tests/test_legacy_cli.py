@@ -45,3 +45,15 @@ class TestLegacyCli:
         monkeypatch.chdir(child_dir)
         ret = run_legacy(["--search-parent", "1", env_file_name, "true"])
         assert ret == 0
+
+    def test_exec_replaces_process(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        calls = []
+
+        def _execve(path, args, env):
+            calls.append((path, args, env.get("_RUNENV_WRAPPED")))
+            raise SystemExit(0)
+
+        monkeypatch.setattr(os, "execve", _execve)
+        with pytest.raises(SystemExit):
+            run_legacy(["--exec", TEST_FILE, sys.executable, "-c", ""])
+        assert calls == [(sys.executable, [sys.executable, "-c", ""], "1")]
@@ -1,14 +1,23 @@
+import os
+import random
+import sys
+
 import pytest
 
 from runenv.parser import (
+    MAX_CYCLES_PER_COMPONENT,
+    VARIABLE_LINE_REGEX,
     EnvParser,
     ParseOptions,
     _json_line_numbers,
     _normalize_structured_value,
     _toml_line_numbers,
     _yaml_line_numbers,
+    compile_value,
+    lex_env_line,
     lint_env_file,
     parse_env_file,
+    render_value,
     substitute_variables,
 )
 
@@ -57,6 +66,124 @@ class TestPosixNameValidation:
         assert "foo.bar" in warnings[0].message
 
 
+class TestIterEntries:
+    def test_entries_are_yielded_lazily(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text("OTHER=1\nAPP_A=2\napp.x=3\nAPP_A=4\nAPP_B=5\n")
+        parser = EnvParser(ParseOptions(prefix="APP_"))
+        entries = parser.iter_entries(env_file)
+
+        assert next(entries) == (2, "A", "2")
+        assert [m.line_number for m in parser.messages] == [1]
+        assert list(entries) == [(4, "A", "4"), (5, "B", "5")]
+        assert [m.line_number for m in parser.messages] == [1, 3]
+        assert parser.raw_environ == {}
+
+    def test_streaming_memory_does_not_grow_with_file_size(self, tmp_path):
+        import tracemalloc
+
+        env_file = tmp_path / ".env"
+        with open(env_file, "w") as f:
+            for i in range(20_000):
+                f.write(f"KEY_{i}=value_{i}_{'x' * 40}\n")
+        parser = EnvParser(ParseOptions())
+
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in parser.iter_entries(env_file))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert count == 20_000
+        assert peak < env_file.stat().st_size / 10
+
+
+def _regex_env_line(line):
+    match = VARIABLE_LINE_REGEX.match(line)
+    if not match:
+        return None
+    return match.group(1), next(g for g in match.groups()[1:] if g is not None)
+
+
+class TestLexEnvLine:
+    @pytest.mark.parametrize(
+        "line",
+        [
+            "KEY=value",
+            "KEY = value # comment",
+            'KEY="quoted # hash" # comment',
+            "KEY='single' ",
+            'KEY="unterminated',
+            'KEY="a" trailing',
+            'KEY="a#b" x',
+            "KEY=",
+            'KEY=""',
+            "app.debug=1",
+            "1FOO=bar",
+            "KÉY=ünïcode",
+            "KEY-DASH=1",
+            "KEY",
+            "=value",
+            "KEY==value",
+            "KEY=a=b",
+            "KEY\t=\tvalue\t#\tcomment",
+            "KEY=\u00a0value\u00a0",
+        ],
+    )
+    def test_matches_regex(self, line):
+        line = line.strip()
+        assert lex_env_line(line) == _regex_env_line(line)
+
+    def test_differential_fuzz_against_regex(self):
+        import random
+
+        rng = random.Random(20240516)
+        alphabet = ["A", "z", "_", ".", "1", "=", '"', "'", "#", " ", "\t", "-", "é", "\u0663", "$", "{", "}", "\u00a0"]
+        for _ in range(20_000):
+            line = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 16))).strip()
+            if not line or line.startswith("#"):
+                continue
+            assert lex_env_line(line) == _regex_env_line(line), repr(line)
+
+
+class TestBytesLoader:
+    def _entries(self, env_file, prefix, monkeypatch, use_bytes):
+        import runenv.parser
+
+        monkeypatch.setattr(runenv.parser, "_default_encoding_is_utf8", lambda: use_bytes)
+        parser = EnvParser(ParseOptions(prefix=prefix))
+        entries = list(parser.iter_entries(env_file))
+        return entries, [(m.line_number, m.level, m.message) for m in parser.messages]
+
+    def test_same_results_as_text_loader(self, tmp_path, monkeypatch):
+        import random
+
+        rng = random.Random(1234)
+        fragments = ["APP_", "APP", "OTHER", "app.x", "=", "val", '"q#"', "'s'", " ", "\t", "#", "\u00a0", "\x1c", "é"]
+        separators = ["\n", "\r\n", "\r"]
+        for _ in range(200):
+            content = "".join(
+                "".join(rng.choice(fragments) for _ in range(rng.randint(0, 6))) + rng.choice(separators)
+                for _ in range(rng.randint(0, 12))
+            )
+            env_file = tmp_path / ".env"
+            env_file.write_bytes(content.encode("utf-8"))
+            expected = self._entries(env_file, "APP_", monkeypatch, use_bytes=False)
+            assert self._entries(env_file, "APP_", monkeypatch, use_bytes=True) == expected, repr(content)
+
+    def test_skipped_values_are_not_decoded(self, tmp_path, monkeypatch):
+        env_file = tmp_path / ".env"
+        env_file.write_bytes(b"OTHER=\xff\xfe not utf-8\nAPP_KEY=value\n")
+        entries, messages = self._entries(env_file, "APP_", monkeypatch, use_bytes=True)
+        assert entries == [(2, "KEY", "value")]
+        assert messages == [(1, "info", "skip OTHER without prefix APP_")]
+
+    def test_empty_file(self, tmp_path, monkeypatch):
+        env_file = tmp_path / ".env"
+        env_file.write_bytes(b"")
+        assert self._entries(env_file, "APP_", monkeypatch, use_bytes=True) == ([], [])
+
+
 class TestQuotedValues:
     def test_double_quoted_value_parsed_without_quotes(self, tmp_path):
         env_file = tmp_path / ".env"
@@ -128,6 +255,12 @@ class TestStructuredLoaders:
         with pytest.raises(ValueError, match="mapping"):
             parse_env_file(env_file, ParseOptions())
 
+    def test_json_decode_error_is_linted(self, tmp_path):
+        env_file = tmp_path / "test.json"
+        env_file.write_text('{"A": "1",')
+        messages = lint_env_file(env_file, ParseOptions())
+        assert [(m.line_number, m.level) for m in messages] == [(1, "error")]
+
     def test_json_null_value_becomes_empty_string(self, tmp_path):
         env_file = tmp_path / "test.json"
         env_file.write_text('{"KEY": null}')
@@ -339,11 +472,51 @@ class TestStructuredLoaderLineNumbers:
         result = _toml_line_numbers(content, ["FOO", "BAZ"])
         assert result == {"FOO": 1, "BAZ": 2}
 
+    def test_json_line_numbers_ignore_nested_keys(self):
+        content = '{\n  "NESTED": {\n    "FOO": 1\n  },\n  "FOO": "bar",\n  "ESC\\"APED": "[{"\n}'
+        result = _json_line_numbers(content, ["NESTED", "FOO", 'ESC"APED'])
+        assert result == {"NESTED": 2, "FOO": 5, 'ESC"APED': 6}
+
+    def test_toml_line_numbers_quoted_keys_tables_and_multiline_strings(self):
+        content = (
+            '"app.debug" = "1"\n'
+            'TEXT = """\n'
+            'FAKE = 1\n'
+            '"""\n'
+            'REAL = 2\n'
+            '[section]\n'
+            'INNER = 3\n'
+        )
+        result = _toml_line_numbers(content, ["app.debug", "TEXT", "FAKE", "REAL", "section", "INNER"])
+        assert result == {"app.debug": 1, "TEXT": 2, "REAL": 5, "section": 6}
+
     def test_yaml_line_numbers_helper(self):
         content = "FOO: bar\nBAZ: 42\n"
         result = _yaml_line_numbers(content)
         assert result == {"FOO": 1, "BAZ": 2}
 
+    def test_yaml_file_composed_once(self, tmp_path, monkeypatch):
+        yaml = pytest.importorskip("yaml")
+        env_file = tmp_path / "test.yaml"
+        env_file.write_text("A: hello\nB: ~\n")
+
+        def _fail(*args, **kwargs):
+            raise AssertionError("YAML document parsed twice")
+
+        monkeypatch.setattr(yaml, "compose", _fail)
+        monkeypatch.setattr(yaml, "safe_load", _fail)
+        messages = lint_env_file(env_file, ParseOptions())
+        assert [m.line_number for m in messages if "null value" in m.message] == [2]
+
+    def test_yaml_pure_python_loader_fallback(self, tmp_path, monkeypatch):
+        yaml = pytest.importorskip("yaml")
+        env_file = tmp_path / "test.yaml"
+        env_file.write_text("A: hello\nB: 8080\nC: true\n")
+        expected = parse_env_file(env_file, ParseOptions())
+
+        monkeypatch.delattr(yaml, "CSafeLoader", raising=False)
+        assert parse_env_file(env_file, ParseOptions()) == expected == {"A": "hello", "B": "8080", "C": "true"}
+
     def test_yaml_line_numbers_empty_returns_empty(self):
         assert _yaml_line_numbers("") == {}
 
@@ -378,6 +551,27 @@ class TestVariableSubstitution:
         result = parse_env_file(env_file, ParseOptions())
         assert result["CHILD"] == ""
 
+    def test_nested_references_resolved_recursively(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text("URL=${BASE}/api\nBASE=http://${HOST}:${PORT}\nHOST=localhost\nPORT=8080\n")
+        result = parse_env_file(env_file, ParseOptions())
+        assert result["BASE"] == "http://localhost:8080"
+        assert result["URL"] == "http://localhost:8080/api"
+        assert list(result) == ["URL", "BASE", "HOST", "PORT"]
+
+    def test_nested_reference_falls_back_to_os_environ(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("PARENT_VAR", "from-shell")
+        env_file = tmp_path / ".env"
+        env_file.write_text("A=${B}!\nB=${PARENT_VAR}\n")
+        result = parse_env_file(env_file, ParseOptions())
+        assert result["A"] == "from-shell!"
+
+    def test_circular_references_expand_one_level(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text("A=${B}\nB=${A}\nC=x${A}\nD=${D}\n")
+        result = parse_env_file(env_file, ParseOptions())
+        assert result == {"A": "${A}", "B": "${B}", "C": "x${A}", "D": "${D}"}
+
     def test_substitute_variables_directly(self):
         env_vars = {"FOO": "bar"}
         assert substitute_variables("${FOO}", env_vars) == "bar"
@@ -385,6 +579,19 @@ class TestVariableSubstitution:
         assert substitute_variables("no-refs", env_vars) == "no-refs"
 
 
+class TestCompiledValues:
+    def test_compile_value_splits_literals_and_references(self):
+        assert compile_value("http://${HOST}:${PORT}/") == ("http://", "HOST", ":", "PORT", "/")
+        assert compile_value("${A}${B}") == ("", "A", "", "B", "")
+        assert compile_value("plain $HOME {x}") == ("plain $HOME {x}",)
+
+    def test_render_value_matches_substitute_variables(self, monkeypatch):
+        monkeypatch.setenv("FROM_SHELL", "shell")
+        env_vars = {"HOST": "localhost", "EMPTY": ""}
+        for value in ["${HOST}:${MISSING}", "${EMPTY}-${FROM_SHELL}", "no refs", "${HOST}${HOST}"]:
+            assert render_value(compile_value(value), env_vars) == substitute_variables(value, env_vars)
+
+
 class TestCircularReferences:
     def test_direct_cycle_reported_as_warning(self, tmp_path):
         env_file = tmp_path / ".env"
@@ -417,8 +624,300 @@ class TestCircularReferences:
         circular = [m for m in messages if "circular" in m.message]
         assert circular == []
 
+    def test_cycle_message_shows_path(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text("C=${A}\nB=${C}\nA=${B}\nX=${X}\n")
+        messages = lint_env_file(env_file, ParseOptions())
+        circular = [m.message for m in messages if "circular" in m.message]
+        assert circular == ["circular reference: A -> B -> C -> A", "circular reference: X -> X"]
+
+    def test_separate_cycles_reported_once_each(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text("A=${B}\nB=${A}\nC=${D}${A}\nD=${C}\n")
+        messages = lint_env_file(env_file, ParseOptions())
+        circular = [m for m in messages if "circular" in m.message]
+        assert len(circular) == 2
+
+    def test_every_cycle_of_a_component_is_reported(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text("A=${B}\nB=${A}${C}\nC=${B}\n")
+        messages = lint_env_file(env_file, ParseOptions())
+        circular = [m.message for m in messages if "circular" in m.message]
+        assert circular == ["circular reference: A -> B -> A", "circular reference: B -> C -> B"]
+
+    def test_very_deep_reference_chain(self, tmp_path):
+        depth = 100_000
+        env_file = tmp_path / ".env"
+        lines = ["K0=bottom"] + [f"K{i}=${{K{i - 1}}}" for i in range(1, depth)]
+        env_file.write_text("\n".join(lines) + "\n")
+        parser = EnvParser(ParseOptions()).parse(env_file)
+        assert parser.final_environ[f"K{depth - 1}"] == "bottom"
+        assert not [m for m in parser.messages if "circular" in m.message]
+
+    def test_very_long_cycle(self, tmp_path):
+        depth = 100_000
+        env_file = tmp_path / ".env"
+        lines = [f"K{i}=${{K{(i + 1) % depth}}}" for i in range(depth)]
+        env_file.write_text("\n".join(lines) + "\n")
+        messages = lint_env_file(env_file, ParseOptions())
+        circular = [m.message for m in messages if "circular" in m.message]
+        assert len(circular) == 1
+        assert circular[0].startswith("circular reference: K0 -> K1 -> K2")
+        assert circular[0].endswith(f"K{depth - 1} -> K0")
+
+    def test_very_dense_cycle(self, tmp_path):
+        depth = 100_000
+        env_file = tmp_path / ".env"
+        # every key closes a cycle back to K0, one back edge per key
+        lines = [f"K{i}=${{K{(i + 1) % depth}}}${{K0}}" for i in range(depth)]
+        env_file.write_text("\n".join(lines) + "\n")
+        messages = lint_env_file(env_file, ParseOptions())
+        circular = [m.message for m in messages if "circular" in m.message]
+        assert circular[0] == "circular reference: K0 -> K0"
+        assert len(circular) == MAX_CYCLES_PER_COMPONENT
+
     def test_parse_still_succeeds_despite_cycle(self, tmp_path):
         env_file = tmp_path / ".env"
         env_file.write_text("A=${B}\nB=${A}\nSAFE=ok\n")
         result = parse_env_file(env_file, ParseOptions())
         assert result["SAFE"] == "ok"
+
+
+class TestIncrementalUpdate:
+    @staticmethod
+    def _full(raw):
+        return EnvParser(ParseOptions()).parse_entries((0, key, value) for key, value in raw.items())
+
+    @staticmethod
+    def _assert_same(parser, expected):
+        assert parser.final_environ == expected.final_environ
+        assert parser.messages == expected.messages
+        assert parser.external_references == expected.external_references
+        assert parser.dependencies == expected.dependencies
+
+    def test_matches_full_parse_on_random_changes(self, monkeypatch):
+        import random
+
+        monkeypatch.setenv("EXT1", "outer")
+        rng = random.Random(1234)
+        keys = [f"K{i}" for i in range(12)] + ["EXT1", "EXT2"]
+
+        def random_value():
+            return "".join(rng.choice(["x", "-", "${" + rng.choice(keys) + "}"]) for _ in range(rng.randint(0, 3)))
+
+        raw = {key: random_value() for key in keys[:8]}
+        parser = self._full(raw)
+        for _ in range(300):
+            changes = {}
+            for key in rng.sample(keys, rng.randint(1, 3)):
+                changes[key] = None if key in raw and rng.random() < 0.3 else random_value()
+            for key, value in changes.items():
+                if value is None:
+                    raw.pop(key)
+                else:
+                    raw[key] = value
+            parser.update(changes)
+            self._assert_same(parser, self._full(raw))
+
+    def test_only_reverse_dependencies_are_resolved(self, monkeypatch):
+        size = 20_000
+        raw = {"ROOT": "r"}
+        raw.update({f"K{i}": f"${{ROOT}}-{i}" if i % 1000 == 0 else f"v{i}" for i in range(size)})
+        parser = self._full(raw)
+
+        calls = []
+        original_render = render_value
+        monkeypatch.setattr("runenv.parser.render_value", lambda *args: calls.append(args) or original_render(*args))
+        affected = parser.update({"ROOT": "changed"})
+        assert affected == {"ROOT"} | {f"K{i}" for i in range(0, size, 1000)}
+        assert len(calls) == len(affected)
+        assert parser.final_environ["K1000"] == "changed-1000"
+
+    def test_undefined_reference_becomes_defined(self, monkeypatch):
+        monkeypatch.setenv("LATER", "outer")
+        parser = self._full({"A": "${LATER}"})
+        assert parser.final_environ == {"A": "outer"}
+        assert parser.external_references == {"LATER"}
+
+        assert parser.update({"LATER": "inner"}) == {"A", "LATER"}
+        assert parser.final_environ == {"A": "inner", "LATER": "inner"}
+        assert parser.external_references == set()
+
+        parser.update({"LATER": None})
+        assert parser.final_environ == {"A": "outer"}
+
+    def test_cycle_messages_follow_changes(self):
+        parser = self._full({"A": "${B}", "B": "b", "X": "${X}"})
+        assert [m.message for m in parser.messages] == ["circular reference: X -> X"]
+
+        parser.update({"B": "${A}"})
+        assert [m.message for m in parser.messages] == [
+            "circular reference: A -> B -> A",
+            "circular reference: X -> X",
+        ]
+        parser.update({"X": "x", "B": "b"})
+        assert parser.messages == []
+
+    def test_reparse(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text("A=1\nB=${A}\nC=3\nC=3\n")
+        parser = EnvParser(ParseOptions()).parse(env_file)
+
+        env_file.write_text("A=2\nB=${A}\nC=3\nD=${C}\n")
+        assert parser.reparse(env_file) == {"A", "B", "D"}
+        expected = EnvParser(ParseOptions()).parse(env_file)
+        self._assert_same(parser, expected)
+
+
+class TestResolveWith:
+    def test_externals_come_from_given_environ(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("USER_NAME", "shell")
+        env_file = tmp_path / ".env"
+        env_file.write_text("A=${USER_NAME}\nB=${A}-x\nC=${D}\nD=${C}\n")
+        parser = EnvParser(ParseOptions()).parse(env_file)
+        assert parser.resolve_with({"USER_NAME": "other"}) == {"A": "other", "B": "other-x", "C": "${C}", "D": "${D}"}
+        assert parser.resolve_with(os.environ) == parser.final_environ
+        assert parser.final_environ["B"] == "shell-x"
+
+
+class TestDiagnostics:
+    CONTENT = "APP_A=1\nAPP_A=2\nOTHER=x\nAPP_B.C=${APP_X}\nnot a line\nAPP_X=${APP_Y}\nAPP_Y=${APP_X}\n"
+
+    @pytest.fixture
+    def env_file(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text(self.CONTENT)
+        return env_file
+
+    @pytest.mark.parametrize("prefix", [None, "APP_"])
+    def test_modes_resolve_the_same_environ(self, env_file, prefix):
+        parsers = {
+            mode: EnvParser(ParseOptions(prefix=prefix, strip_prefix=False, diagnostics=mode)).parse(env_file)
+            for mode in ("full", "counts", "none")
+        }
+        assert parsers["full"].final_environ == parsers["counts"].final_environ == parsers["none"].final_environ
+
+        full = parsers["full"]
+        expected_counts = {}
+        for message in full.messages:
+            expected_counts[message.level] = expected_counts.get(message.level, 0) + 1
+        assert full.message_counts == expected_counts
+        assert parsers["counts"].message_counts == expected_counts
+        assert parsers["counts"].messages == []
+        assert parsers["none"].message_counts == {}
+        assert parsers["none"].messages == []
+
+    def test_full_messages(self, env_file):
+        parser = EnvParser(ParseOptions(prefix="APP_", strip_prefix=False)).parse(env_file)
+        assert [(m.line_number, m.level, m.message) for m in parser.messages] == [
+            (2, "warning", "duplicated 'APP_A' variable, last value wins"),
+            (3, "info", "skip OTHER without prefix APP_"),
+            (4, "warning", "'APP_B.C' is not a valid POSIX env var name"),
+            (5, "warning", "line not matched"),
+            (0, "warning", "circular reference: APP_X -> APP_Y -> APP_X"),
+        ]
+
+    def test_none_skips_unprefixed_lines_undecoded(self, env_file, monkeypatch):
+        monkeypatch.setattr(EnvParser, "_lex_key", lambda *args: pytest.fail("key decoded"))
+        parser = EnvParser(ParseOptions(prefix="APP_", diagnostics="none")).parse(env_file)
+        assert parser.final_environ["A"] == "2"
+
+    @pytest.mark.parametrize(("suffix", "content"), [(".json", '{"A": "1"}'), (".toml", 'A = "1"\n')])
+    def test_none_skips_structured_line_numbers(self, tmp_path, monkeypatch, suffix, content):
+        env_file = tmp_path / f".env{suffix}"
+        env_file.write_text(content)
+        fail = lambda *args: pytest.fail("line numbers computed")  # noqa: E731
+        monkeypatch.setattr("runenv.parser._json_line_numbers", fail)
+        monkeypatch.setattr("runenv.parser._toml_line_numbers", fail)
+        assert EnvParser(ParseOptions(diagnostics="none")).parse(env_file).final_environ == {"A": "1"}
+
+    def test_errors_still_raise_without_diagnostics(self, tmp_path):
+        env_file = tmp_path / ".env.json"
+        env_file.write_text("[1]")
+        with pytest.raises(ValueError, match="JSON root must be a mapping"):
+            EnvParser(ParseOptions(diagnostics="none")).parse(env_file)
+
+    def test_invalid_mode(self):
+        with pytest.raises(ValueError, match="diagnostics must be one of"):
+            ParseOptions(diagnostics="some")
+
+    @pytest.mark.skipif(sys.version_info < (3, 10), reason="dataclass slots need Python 3.10")
+    def test_messages_are_slotted(self, env_file):
+        message = EnvParser(ParseOptions()).parse(env_file).messages[0]
+        assert not hasattr(message, "__dict__")
+
+    def test_counts_follow_incremental_update(self, env_file):
+        parser = EnvParser(ParseOptions(diagnostics="counts")).parse(env_file)
+        assert parser.message_counts == {"warning": 4}
+        parser.update({"APP_Y": "y"})
+        assert parser.message_counts == {"warning": 3}
+
+
+class TestParallelParse:
+    @pytest.fixture(autouse=True)
+    def no_thresholds(self, monkeypatch):
+        monkeypatch.setattr("runenv.parser.PARALLEL_MIN_BYTES", 0)
+        monkeypatch.setattr("runenv.parser.PARALLEL_MIN_KEYS", 0)
+
+    @pytest.fixture
+    def env_file(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("EXT1", "outer")
+        rng = random.Random(7)
+        keys = [f"APP_K{index}" for index in range(40)] + ["OTHER", "APP_B.C"]
+        lines = []
+        for index in range(600):
+            kind = rng.random()
+            if kind < 0.05:
+                lines.append("not a line")
+            elif kind < 0.1:
+                lines.append("# comment")
+            else:
+                refs = rng.sample(keys + ["EXT1", "MISSING"], rng.randint(0, 2))
+                lines.append(f"{rng.choice(keys)}=v{index}" + "".join(f"-${{{ref}}}" for ref in refs))
+        # separate cycles end up in different components, possibly resolved by different workers
+        lines += ["CYC_A=${CYC_B}", "CYC_B=${CYC_A}", "SELF=${SELF}", "TAIL=${APP_K1}"]
+        content = "".join(line + rng.choice(["\n", "\r\n", "\r"]) for line in lines)
+        env_file = tmp_path / ".env"
+        env_file.write_bytes(content.encode("utf-8"))
+        return env_file
+
+    @pytest.mark.parametrize("prefix", [None, "APP_"])
+    @pytest.mark.parametrize("diagnostics", ["full", "counts", "none"])
+    def test_matches_sequential_parse(self, env_file, prefix, diagnostics):
+        sequential = EnvParser(ParseOptions(prefix=prefix, diagnostics=diagnostics)).parse(env_file)
+        parallel = EnvParser(ParseOptions(prefix=prefix, diagnostics=diagnostics, jobs=3)).parse(env_file)
+        assert list(parallel.final_environ.items()) == list(sequential.final_environ.items())
+        assert parallel.messages == sequential.messages
+        assert parallel.message_counts == sequential.message_counts
+        assert parallel.cycles == sequential.cycles
+        assert parallel.external_references == sequential.external_references
+        assert sorted(map(sorted, parallel.components)) == sorted(map(sorted, sequential.components))
+
+    def test_file_is_split_into_newline_aligned_chunks(self, env_file):
+        from runenv.parser import _env_file_chunks
+
+        chunks = _env_file_chunks(env_file, 8)
+        assert len(chunks) > 1
+        data = env_file.read_bytes()
+        assert chunks[0][0] == 0
+        assert chunks[-1][1] == len(data)
+        for (_, end, _), (start, _, _) in zip(chunks, chunks[1:]):
+            assert end == start
+            assert data[end - 1 : end] == b"\n"
+
+    def test_incremental_update_after_parallel_parse(self, env_file):
+        parser = EnvParser(ParseOptions(jobs=2)).parse(env_file)
+        parser.update({"CYC_B": "b"})
+        assert parser.final_environ["CYC_A"] == "b"
+        assert ["CYC_A", "CYC_B", "CYC_A"] not in parser.cycles
+
+    def test_small_files_are_not_split(self, env_file, monkeypatch):
+        monkeypatch.setattr("runenv.parser.PARALLEL_MIN_BYTES", 1 << 30)
+        monkeypatch.setattr("runenv.parser._lex_env_chunk", lambda *args: pytest.fail("chunk lexed"))
+        monkeypatch.setattr("runenv.parser.PARALLEL_MIN_KEYS", 1 << 30)
+        monkeypatch.setattr("runenv.parser._resolve_keys", lambda *args: pytest.fail("keys resolved"))
+        assert EnvParser(ParseOptions(jobs=4)).parse(env_file).final_environ
+
+    def test_invalid_jobs(self):
+        with pytest.raises(ValueError, match="jobs must be at least 1"):
+            ParseOptions(jobs=0)
@@ -0,0 +1,133 @@
+import os
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from runenv import create_env, load_env
+from runenv.parser import EnvParser
+from runenv.shm import EnvPublisher, _attach, read_shared_snapshot, shm_name
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 8), reason="shared_memory needs Python 3.8")
+
+SRC_DIR = str(Path(__file__).resolve().parent.parent / "src")
+
+
+@pytest.fixture
+def name():
+    return f"runenv-test-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture
+def env_file(tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text("HOST=db\nURL=pg://${HOST}\n")
+    return env_file
+
+
+def _touch(env_file, content):
+    env_file.write_text(content)
+    st = os.stat(env_file)
+    os.utime(env_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_shm_name() -> None:
+    assert shm_name("shm://env") == "env"
+    for source in ("env", "shm://", "file://env"):
+        with pytest.raises(ValueError, match="Unsupported env source"):
+            shm_name(source)
+
+
+def test_publish_and_load(env_file, name) -> None:
+    with EnvPublisher(env_file, name):
+        assert create_env(source=f"shm://{name}") == {"HOST": "db", "URL": "pg://db"}
+        with mock.patch.object(EnvParser, "parse", side_effect=AssertionError("parsed")), mock.patch.dict(os.environ):
+            load_env(source=f"shm://{name}", force=True)
+            assert os.environ["URL"] == "pg://db"
+
+
+def test_republish_on_change(env_file, name) -> None:
+    with EnvPublisher(env_file, name) as publisher:
+        _touch(env_file, "HOST=cache\nURL=pg://${HOST}\n")
+        publisher.poll()
+        assert create_env(source=f"shm://{name}") == {"HOST": "cache", "URL": "pg://cache"}
+
+
+def test_outgrown_segment_is_replaced(env_file, name) -> None:
+    with EnvPublisher(env_file, name) as publisher:
+        size = publisher._segment.size
+        _touch(env_file, "".join(f"KEY_{index}={'x' * 100}\n" for index in range(1000)))
+        publisher.poll()
+        assert publisher._segment.size > size
+        assert len(create_env(source=f"shm://{name}")) == 1000
+
+
+def test_prefix_must_match(env_file, name) -> None:
+    from runenv.parser import ParseOptions
+
+    with EnvPublisher(env_file, name, ParseOptions(prefix="HO", diagnostics="none")):
+        assert create_env(source=f"shm://{name}", prefix="HO") == {"ST": "db"}
+        with pytest.raises(ValueError, match="was compiled with prefix='HO'"):
+            create_env(source=f"shm://{name}", prefix="URL")
+
+
+def test_second_publisher_is_refused(env_file, name) -> None:
+    with EnvPublisher(env_file, name):
+        with pytest.raises(ValueError, match="already exists"):
+            EnvPublisher(env_file, name)
+
+
+def test_missing_segment(name) -> None:
+    with pytest.raises(ValueError, match="is `runenv serve` running"):
+        create_env(source=f"shm://{name}")
+
+
+def test_segment_being_written_is_not_read(env_file, name, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("runenv.shm.READ_ATTEMPTS", 3)
+    with EnvPublisher(env_file, name) as publisher:
+        # a sequence left odd by a writer in the middle of an update
+        publisher._segment.buf[15] |= 1
+        with pytest.raises(ValueError, match="No environment published"):
+            read_shared_snapshot(name)
+
+
+def test_closed_segment_is_removed(env_file, name) -> None:
+    EnvPublisher(env_file, name).close()
+    with pytest.raises(FileNotFoundError):
+        _attach(name)
+
+
+def test_consumer_exit_keeps_segment(env_file, name) -> None:
+    with EnvPublisher(env_file, name):
+        script = f"from runenv import create_env; print(create_env(source='shm://{name}')['URL'])"
+        env = {**os.environ, "PYTHONPATH": SRC_DIR}
+        for _ in range(2):
+            result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+            assert result.stdout.strip() == "pg://db"
+
+
+def test_serve_command(env_file, name) -> None:
+    script = "import sys; from runenv.cli import run; sys.exit(run(sys.argv[1:]))"
+    cmd = [sys.executable, "-c", script, "serve", "--env-file", str(env_file), "--name", name, "--interval", "0.05"]
+    process = subprocess.Popen(cmd, env={**os.environ, "PYTHONPATH": SRC_DIR})
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                assert create_env(source=f"shm://{name}") == {"HOST": "db", "URL": "pg://db"}
+                break
+            except ValueError:
+                assert time.monotonic() < deadline
+        _touch(env_file, "HOST=cache\nURL=pg://${HOST}\n")
+        while create_env(source=f"shm://{name}")["HOST"] != "cache":
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        assert process.wait(timeout=10) == 0
+    with pytest.raises(FileNotFoundError):
+        _attach(name)
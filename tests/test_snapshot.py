@@ -0,0 +1,141 @@
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+from runenv import create_env, load_env
+from runenv.api import create_env_and_lint
+from runenv.cli import run
+from runenv.parser import EnvParser, ParseOptions
+from runenv.snapshot import Snapshot, compile_snapshot, dump_snapshot, load_snapshot, parse_snapshot, read_snapshot
+
+
+def _compile(env_file, snapshot_file, **options):
+    parser = EnvParser(ParseOptions(**options)).parse(env_file)
+    return compile_snapshot(env_file, snapshot_file, parser)
+
+
+def test_roundtrip() -> None:
+    snapshot = Snapshot(
+        source="/app/.env",
+        source_sha256="ab" * 32,
+        prefix=None,
+        strip_prefix=False,
+        external={"HOME": "/root", "MISSING": None},
+        environ={"A": "", "B": "zażółć\n${X}", "C": "\udcff"},
+    )
+    assert parse_snapshot(dump_snapshot(snapshot)) == snapshot
+
+
+@pytest.mark.parametrize("data", [b"", b"not a snapshot", dump_snapshot(Snapshot("src", "sha", environ={"A": "1"}))[:-1]])
+def test_invalid_data(data: bytes) -> None:
+    with pytest.raises(ValueError):
+        parse_snapshot(data)
+
+
+@mock.patch.dict(os.environ, {"OUTER": "outer"}, clear=True)
+def test_snapshot_matches_create_env(tmp_path) -> None:
+    env_file = tmp_path / ".env.yaml"
+    env_file.write_text("APP_HOST: example.com\nAPP_URL: https://${HOST}/${OUTER}\nOTHER: x\n")
+    snapshot_file = tmp_path / "env.snapshot"
+
+    snapshot = _compile(env_file, snapshot_file, prefix="APP_", strip_prefix=True)
+    assert snapshot.external == {"OUTER": "outer"}
+    expected = create_env(str(env_file), prefix="APP_", strip_prefix=True)
+    assert load_snapshot(snapshot_file) == expected
+    assert create_env(str(snapshot_file)) == expected
+    assert create_env(str(snapshot_file), prefix="APP_") == expected
+    assert create_env_and_lint(str(snapshot_file)) == (expected, [])
+
+    with pytest.raises(ValueError, match="compiled with prefix='APP_'"):
+        create_env(str(snapshot_file), prefix="OTHER_")
+
+
+def test_stale_source(tmp_path) -> None:
+    env_file = tmp_path / ".env"
+    env_file.write_text("A=1\n")
+    snapshot_file = tmp_path / "env.snapshot"
+    _compile(env_file, snapshot_file)
+
+    env_file.write_text("A=2\n")
+    with pytest.raises(ValueError, match="is stale"):
+        load_snapshot(snapshot_file)
+    assert load_snapshot(snapshot_file, check_source=False) == {"A": "1"}
+
+    # only the snapshot is shipped
+    env_file.unlink()
+    assert load_snapshot(snapshot_file) == {"A": "1"}
+
+
+def test_stale_external_reference(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    env_file = tmp_path / ".env"
+    env_file.write_text("A=${OUTER}\n")
+    snapshot_file = tmp_path / "env.snapshot"
+    monkeypatch.setenv("OUTER", "1")
+    _compile(env_file, snapshot_file)
+
+    monkeypatch.setenv("OUTER", "2")
+    with pytest.raises(ValueError, match=r"\$\{OUTER\} changed"):
+        load_snapshot(snapshot_file)
+
+
+def test_loading_does_not_parse(tmp_path) -> None:
+    env_file = tmp_path / ".env"
+    env_file.write_text("A=1\nB=${A}\n")
+    snapshot_file = tmp_path / "env.snapshot"
+    _compile(env_file, snapshot_file)
+
+    with mock.patch.object(EnvParser, "parse", side_effect=AssertionError("parsed")), mock.patch.dict(os.environ):
+        load_env(env_file=str(snapshot_file), force=True)
+        assert os.environ["B"] == "1"
+
+
+class TestCompileCommand:
+    def test_compile_and_run(self, tmp_path, monkeypatch: pytest.MonkeyPatch, capfd: pytest.CaptureFixture) -> None:
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / ".env.toml").write_text('HOST = "db"\nURL = "pg://${HOST}"\n')
+
+        assert run(["compile", "-o", "prod.snapshot"]) == 0
+        assert read_snapshot(tmp_path / "prod.snapshot").environ == {"HOST": "db", "URL": "pg://db"}
+
+        script = "import os; print(os.environ['URL'])"
+        assert run(["run", "--env-file", "prod.snapshot", "--", sys.executable, "-c", script]) == 0
+        assert capfd.readouterr().out.strip() == "pg://db"
+
+    def test_compile_fail_on(self, tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / ".env").write_text("A=1\nA=2\n")
+
+        assert run(["compile", "--fail-on", "warning"]) == 1
+        assert not (tmp_path / "env.snapshot").exists()
+
+    def test_reload_with_snapshot_is_rejected(self, tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / ".env").write_text("A=1\n")
+        run(["compile"])
+
+        with pytest.raises(SystemExit) as exc_info:
+            run(["run", "--reload", "--env-file", "env.snapshot", "--", sys.executable, "-c", ""])
+        assert exc_info.value.code == 2
+
+    @pytest.mark.skipif(os.name != "posix", reason="POSIX file modes needed")
+    def test_compiled_file_mode_follows_umask(self, tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / ".env").write_text("A=1\n")
+        umask = os.umask(0o022)
+        try:
+            assert run(["compile"]) == 0
+        finally:
+            os.umask(umask)
+        assert os.stat(tmp_path / "env.snapshot").st_mode & 0o777 == 0o644
+
+    def test_lint_snapshot_is_rejected(self, tmp_path, monkeypatch: pytest.MonkeyPatch, capsys) -> None:
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / ".env").write_text("A=1\n")
+        run(["compile"])
+
+        with pytest.raises(SystemExit) as exc_info:
+            run(["lint", "--env-file", "env.snapshot"])
+        assert exc_info.value.code == 1
+        assert "is a snapshot" in capsys.readouterr().out
@@ -0,0 +1,141 @@
+import os
+import threading
+from unittest import mock
+
+import pytest
+
+from runenv.api import watch_env
+from runenv.parser import EnvParser, ParseOptions
+from runenv.watch import EnvDiff, EnvWatcher, diff_environ
+
+
+def write(env_file, content: str, tick: int) -> None:
+    """Write `content` and move mtime forward so the change is seen regardless of clock resolution."""
+    env_file.write_text(content)
+    st = os.stat(env_file)
+    os.utime(env_file, ns=(st.st_atime_ns, st.st_mtime_ns + tick * 1_000_000_000))
+
+
+def test_diff_environ() -> None:
+    diff = diff_environ({"A": "1", "B": "2", "C": "3"}, {"A": "1", "B": "20", "D": "4"})
+    assert diff == EnvDiff(added={"D": "4"}, removed={"C": "3"}, changed={"B": ("2", "20")})
+    assert not diff_environ({"A": "1"}, {"A": "1"})
+
+    environ = {"A": "1", "B": "2", "C": "3"}
+    diff.apply(environ)
+    assert environ == {"A": "1", "B": "20", "D": "4"}
+
+
+class TestEnvWatcher:
+    def test_poll_reports_diff_of_resolved_values(self, tmp_path) -> None:
+        env_file = tmp_path / ".env"
+        env_file.write_text("HOST=a\nURL=http://${HOST}\nOLD=1\n")
+        diffs = []
+        watcher = EnvWatcher(env_file, diffs.append)
+        assert watcher.environ == {"HOST": "a", "URL": "http://a", "OLD": "1"}
+
+        write(env_file, "HOST=b\nURL=http://${HOST}\nNEW=2\n", tick=1)
+        diff = watcher.poll()
+        assert diffs == [diff]
+        assert diff == EnvDiff(
+            added={"NEW": "2"},
+            removed={"OLD": "1"},
+            changed={"HOST": ("a", "b"), "URL": ("http://a", "http://b")},
+        )
+        assert watcher.poll() is None
+        assert len(diffs) == 1
+
+    def test_unchanged_file_costs_one_stat(self, tmp_path) -> None:
+        env_file = tmp_path / ".env"
+        env_file.write_text("A=1\n")
+        watcher = EnvWatcher(env_file, mock.Mock())
+
+        with mock.patch("runenv.watch.os.stat", wraps=os.stat) as stat, mock.patch.object(
+            watcher.parser, "reparse", wraps=watcher.parser.reparse
+        ) as reparse:
+            for _ in range(10):
+                assert watcher.poll() is None
+        assert stat.call_count == 10
+        reparse.assert_not_called()
+        watcher.callback.assert_not_called()
+
+    def test_touch_without_changes_does_not_call_callback(self, tmp_path) -> None:
+        env_file = tmp_path / ".env"
+        env_file.write_text("A=1\n")
+        callback = mock.Mock()
+        watcher = EnvWatcher(env_file, callback)
+
+        write(env_file, "A=1\n", tick=1)
+        assert watcher.poll() is None
+        callback.assert_not_called()
+
+    def test_missing_or_broken_file_keeps_previous_values(self, tmp_path) -> None:
+        env_file = tmp_path / ".env.json"
+        env_file.write_text('{"A": "1"}')
+        callback = mock.Mock()
+        watcher = EnvWatcher(env_file, callback)
+
+        env_file.unlink()
+        assert watcher.poll() is None
+        write(env_file, "[1, 2]", tick=1)
+        assert watcher.poll() is None
+        assert watcher.environ == {"A": "1"}
+
+        write(env_file, '{"A": "2"}', tick=2)
+        assert watcher.poll() == EnvDiff(changed={"A": ("1", "2")})
+        assert callback.call_count == 1
+
+    def test_invalid_yaml_keeps_previous_values(self, tmp_path) -> None:
+        pytest.importorskip("yaml")
+        env_file = tmp_path / ".env.yaml"
+        env_file.write_text("A: '1'\n")
+        watcher = EnvWatcher(env_file, mock.Mock())
+
+        write(env_file, "A: [1\n", tick=1)
+        assert watcher.poll() is None
+        assert watcher.environ == {"A": "1"}
+
+    def test_prefix_options(self, tmp_path) -> None:
+        env_file = tmp_path / ".env"
+        env_file.write_text("APP_A=1\nB=2\n")
+        watcher = EnvWatcher(env_file, mock.Mock(), options=ParseOptions(prefix="APP_"))
+
+        write(env_file, "APP_A=1\nB=3\n", tick=1)
+        assert watcher.poll() is None
+        write(env_file, "APP_A=2\nB=3\n", tick=2)
+        assert watcher.poll() == EnvDiff(changed={"A": ("1", "2")})
+
+    @mock.patch.dict(os.environ, {}, clear=True)
+    def test_reload_matches_full_parse(self, tmp_path) -> None:
+        env_file = tmp_path / ".env"
+        env_file.write_text("A=1\nB=${A}\nC=${D}\n")
+        watcher = EnvWatcher(env_file, mock.Mock())
+
+        write(env_file, "A=2\nB=${A}\nD=${B}\nC=${D}\n", tick=1)
+        assert watcher.poll() == EnvDiff(added={"D": "2"}, changed={"A": ("1", "2"), "B": ("1", "2"), "C": ("", "2")})
+        assert watcher.environ == EnvParser(ParseOptions()).parse(env_file).final_environ
+
+
+@mock.patch.dict(os.environ, {}, clear=True)
+def test_watch_env_thread_updates_environ(tmp_path) -> None:
+    env_file = tmp_path / ".env"
+    env_file.write_text("A=1\n")
+    changed = threading.Event()
+    diffs = []
+
+    def callback(diff: EnvDiff) -> None:
+        diffs.append((diff, os.environ.get("A")))
+        changed.set()
+
+    watcher = watch_env(str(env_file), callback, interval=0.01, update_environ=True)
+    try:
+        write(env_file, "A=2\n", tick=1)
+        assert changed.wait(5)
+    finally:
+        watcher.stop()
+    assert diffs == [(EnvDiff(changed={"A": ("1", "2")}), "2")]
+
+
+def test_watch_env_missing_file(tmp_path) -> None:
+    with pytest.raises(ValueError, match="No env file found"):
+        watch_env(str(tmp_path / ".env.missing"), mock.Mock())